@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.exports import (
+    COLUMNAR_FORMATS,
+    EXPORT_FORMATS,
+    FORMAT_CSV,
+    FORMAT_NDJSON,
+    ExportUnavailable,
+    get_export_queryset,
+    iter_csv,
+    iter_ndjson,
+    write_columnar,
+)
+from analytics.services import get_reporting_window
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError as exc:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD.') from exc
+
+
+class Command(BaseCommand):
+    help = 'Export booking requests for offline analysis as CSV, NDJSON, Parquet or Arrow IPC.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default=FORMAT_CSV)
+        parser.add_argument('--start', help='Earliest booking date (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Latest booking date (YYYY-MM-DD).')
+        parser.add_argument('--status', default='')
+        parser.add_argument('--output', '-o', help='Destination file. Text formats default to stdout.')
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        start_date, end_date = get_reporting_window(_parse_date(options['start']), _parse_date(options['end']))
+        queryset = get_export_queryset(start_date=start_date, end_date=end_date, status=options['status'])
+        output = options['output']
+
+        if export_format in COLUMNAR_FORMATS:
+            if not output:
+                raise CommandError(f'--output is required for {export_format} exports.')
+            try:
+                with open(output, 'wb') as handle:
+                    write_columnar(queryset, export_format, handle)
+            except ExportUnavailable as exc:
+                raise CommandError(str(exc)) from exc
+        else:
+            rows = iter_ndjson(queryset) if export_format == FORMAT_NDJSON else iter_csv(queryset)
+            if output:
+                with open(output, 'w', newline='', encoding='utf-8') as handle:
+                    handle.writelines(rows)
+            else:
+                for chunk in rows:
+                    self.stdout.write(chunk, ending='')
+                return
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {export_format} export for {start_date} to {end_date} to {output}.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analytics.services import rebuild_daily_usage
+
+
+class Command(BaseCommand):
+    help = 'Recompute the FacilityDailyUsage rollup from approved bookings.'
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_usage()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily usage rollup: {rows} hour buckets.'))
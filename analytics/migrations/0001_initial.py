@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:21
+
+from collections import defaultdict
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_daily_usage(apps, schema_editor):
+    BookingRequest = apps.get_model('bookings', 'BookingRequest')
+    FacilityDailyUsage = apps.get_model('analytics', 'FacilityDailyUsage')
+    totals = defaultdict(lambda: [0, 0])
+    approved = BookingRequest.objects.filter(status='approved').values_list(
+        'facility_id', 'start_datetime', 'end_datetime',
+    )
+    for facility_id, start_datetime, end_datetime in approved.iterator(chunk_size=2000):
+        cursor, counted = start_datetime, False
+        while cursor < end_datetime:
+            local = timezone.localtime(cursor)
+            bucket_end = min(local.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), end_datetime)
+            total = totals[(facility_id, local.date(), local.hour)]
+            total[0] += int((bucket_end - cursor).total_seconds())
+            if not counted:
+                total[1] += 1
+                counted = True
+            cursor = bucket_end
+    FacilityDailyUsage.objects.bulk_create(
+        [
+            FacilityDailyUsage(
+                facility_id=facility_id, date=date, hour=hour, booked_seconds=seconds, booking_count=count,
+            )
+            for (facility_id, date, hour), (seconds, count) in totals.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('bookings', '0004_recurringrule'),
+        ('facilities', '0007_remove_facility_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilityDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('booked_seconds', models.PositiveIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='facilities.facility')),
+            ],
+            options={
+                'verbose_name': 'Facility Daily Usage',
+                'verbose_name_plural': 'Facility Daily Usage',
+                'ordering': ['date', 'hour'],
+                'indexes': [models.Index(fields=['date', 'facility'], name='analytics_f_date_5d116a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('facility', 'date', 'hour'), name='unique_facility_usage_hour')],
+            },
+        ),
+        migrations.RunPython(populate_daily_usage, migrations.RunPython.noop),
+    ]
@@ -1,2 +1,75 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
 
-# Create your models here.
+from bookings.models import BookingRequest
+from facilities.models import Facility
+
+# Saves that touch none of these fields cannot change approved usage.
+USAGE_FIELDS = frozenset({'facility', 'facility_id', 'status', 'start_datetime', 'end_datetime'})
+
+
+class FacilityDailyUsage(models.Model):
+    """
+    Approved usage per facility and local hour, maintained as bookings change.
+
+    `booked_seconds` spreads each approved booking over the hours it covers;
+    `booking_count` counts the booking once, in the hour it starts. Rebuild
+    from scratch with `manage.py rebuild_daily_usage`.
+    """
+
+    facility = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        related_name='daily_usage',
+    )
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    booked_seconds = models.PositiveIntegerField(default=0)
+    booking_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'hour']
+        verbose_name = 'Facility Daily Usage'
+        verbose_name_plural = 'Facility Daily Usage'
+        constraints = [
+            models.UniqueConstraint(fields=['facility', 'date', 'hour'], name='unique_facility_usage_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'facility']),
+        ]
+
+    def __str__(self):
+        return f'{self.facility_id} {self.date} {self.hour:02d}:00 — {self.booked_seconds}s'
+
+
+@receiver(pre_save, sender=BookingRequest)
+@receiver(pre_delete, sender=BookingRequest)
+def snapshot_stored_usage(sender, instance, update_fields=None, **kwargs):
+    """
+    Read the stored state of a booking saved or deleted without a snapshot,
+    e.g. one loaded with `.only()`/`.defer()` or built by hand with a pk.
+    """
+    if update_fields is not None and not USAGE_FIELDS & update_fields:
+        return
+    if instance.loaded_state is None and instance.pk is not None:
+        instance.load_stored_state()
+
+
+@receiver(post_save, sender=BookingRequest)
+def update_daily_usage(sender, instance, created, update_fields=None, **kwargs):
+    """Apply the change in approved usage caused by saving a booking."""
+    from .services import apply_usage_change
+
+    if update_fields is not None and not USAGE_FIELDS & update_fields:
+        return
+    apply_usage_change(previous=instance.loaded_state, current=instance)
+    instance.remember_loaded_state()
+
+
+@receiver(post_delete, sender=BookingRequest)
+def remove_daily_usage(sender, instance, **kwargs):
+    """Withdraw a deleted booking's approved usage."""
+    from .services import apply_usage_change
+
+    apply_usage_change(previous=instance.loaded_state, current=None)
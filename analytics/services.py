@@ -1,12 +1,19 @@
+from collections import defaultdict
 from datetime import timedelta
 
-from django.db import models
-from django.db.models import Count, DurationField, ExpressionWrapper, Sum
-from django.db.models.functions import ExtractHour
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 from bookings.models import BookingRequest
+from core.profiling import profile_span
 from facilities.models import Facility
+from facilities.services import filter_visible_facilities
+
+from .models import FacilityDailyUsage
+
+REBUILD_CHUNK_SIZE = 2000
 
 
 def get_reporting_window(start_date=None, end_date=None):
@@ -17,30 +24,128 @@ def get_reporting_window(start_date=None, end_date=None):
     return start_date, end_date
 
 
-def get_facility_utilization(*, start_date=None, end_date=None, user=None):
-    """Calculate booked-vs-available hours per facility for the reporting window."""
-    start_date, end_date = get_reporting_window(start_date, end_date)
-    duration_expression = ExpressionWrapper(
-        models.F('end_datetime') - models.F('start_datetime'),
-        output_field=DurationField(),
+def usage_buckets(start_datetime, end_datetime):
+    """
+    Split a booking window into `((date, hour), seconds)` pieces by local hour.
+
+    The first piece is the bucket the booking is counted in.
+    """
+    buckets = []
+    cursor = start_datetime
+    while cursor < end_datetime:
+        local = timezone.localtime(cursor)
+        hour_start = local.replace(minute=0, second=0, microsecond=0)
+        bucket_end = min(hour_start + timedelta(hours=1), end_datetime)
+        buckets.append(((local.date(), local.hour), int((bucket_end - cursor).total_seconds())))
+        cursor = bucket_end
+    return buckets
+
+
+def _add_usage(deltas, facility_id, start_datetime, end_datetime, sign):
+    for index, (bucket, seconds) in enumerate(usage_buckets(start_datetime, end_datetime)):
+        delta = deltas[(facility_id, *bucket)]
+        delta[0] += sign * seconds
+        if index == 0:
+            delta[1] += sign
+
+
+def apply_usage_change(*, previous, current):
+    """
+    Move approved usage from a booking's previous state to its current one.
+
+    `previous` is a `BookingRequest.loaded_state` tuple (or None) and
+    `current` a booking instance (or None once deleted). Each affected row is
+    adjusted with `F()` arithmetic in a single UPDATE, so concurrent approvals
+    that share an hour bucket cannot overwrite each other. Totals are clamped
+    at zero, so a rollup that has drifted cannot make a booking save fail;
+    `rebuild_daily_usage` puts it right.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    if previous is not None:
+        facility_id, status, start_datetime, end_datetime = previous
+        if status == BookingRequest.STATUS_APPROVED:
+            _add_usage(deltas, facility_id, start_datetime, end_datetime, -1)
+    if current is not None and current.status == BookingRequest.STATUS_APPROVED:
+        _add_usage(deltas, current.facility_id, current.start_datetime, current.end_datetime, 1)
+
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    growing = [key for key, (seconds, count) in deltas.items() if seconds > 0 or count > 0]
+    if growing:
+        FacilityDailyUsage.objects.bulk_create(
+            [FacilityDailyUsage(facility_id=facility_id, date=date, hour=hour) for facility_id, date, hour in growing],
+            ignore_conflicts=True,
+        )
+
+    matches = [
+        Q(facility_id=facility_id, date=date, hour=hour)
+        for facility_id, date, hour in deltas
+    ]
+    bucket_filter = matches.pop()
+    for match in matches:
+        bucket_filter |= match
+
+    def adjustment(position):
+        return Case(
+            *[
+                When(Q(facility_id=facility_id, date=date, hour=hour), then=Value(delta[position]))
+                for (facility_id, date, hour), delta in deltas.items()
+            ],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    FacilityDailyUsage.objects.filter(bucket_filter).update(
+        booked_seconds=Greatest(F('booked_seconds') + adjustment(0), Value(0)),
+        booking_count=Greatest(F('booking_count') + adjustment(1), Value(0)),
     )
-    bookings = BookingRequest.objects.filter(
-        status=BookingRequest.STATUS_APPROVED,
-        start_datetime__date__gte=start_date,
-        start_datetime__date__lte=end_date,
+
+
+def rebuild_daily_usage():
+    """Recompute the whole usage rollup from approved bookings. Returns the row count."""
+    totals = defaultdict(lambda: [0, 0])
+    approved = (
+        BookingRequest.objects
+        .filter(status=BookingRequest.STATUS_APPROVED)
+        .order_by()
+        .values_list('facility_id', 'start_datetime', 'end_datetime')
     )
+    for facility_id, start_datetime, end_datetime in approved.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+        _add_usage(totals, facility_id, start_datetime, end_datetime, 1)
+
+    rows = [
+        FacilityDailyUsage(
+            facility_id=facility_id,
+            date=date,
+            hour=hour,
+            booked_seconds=seconds,
+            booking_count=count,
+        )
+        for (facility_id, date, hour), (seconds, count) in totals.items()
+    ]
+    with transaction.atomic():
+        FacilityDailyUsage.objects.all().delete()
+        FacilityDailyUsage.objects.bulk_create(rows, batch_size=REBUILD_CHUNK_SIZE)
+    return len(rows)
+
+
+def _usage_queryset(start_date, end_date, user):
+    queryset = FacilityDailyUsage.objects.filter(date__gte=start_date, date__lte=end_date)
     if user:
-        if user.profile.is_sys_admin():
-            pass
-        elif user.profile.is_dept_admin():
-            bookings = bookings.filter(facility__department=user.profile.department)
-        else:
-            bookings = bookings.filter(facility__managers=user)
-            
+        queryset = filter_visible_facilities(queryset, user)
+    return queryset
+
+
+@profile_span('analytics.utilization')
+def get_facility_utilization(*, start_date=None, end_date=None, user=None):
+    """Calculate booked-vs-available hours per facility for the reporting window."""
+    start_date, end_date = get_reporting_window(start_date, end_date)
     booked_hours = {
         row['facility_id']: row
-        for row in bookings.values('facility_id', 'facility__name').annotate(
-            total_duration=Sum(duration_expression), total_bookings=Count('id')
+        for row in _usage_queryset(start_date, end_date, user).values('facility_id').annotate(
+            total_seconds=Sum('booked_seconds'), total_bookings=Sum('booking_count')
         )
     }
 
@@ -48,16 +153,10 @@ def get_facility_utilization(*, start_date=None, end_date=None, user=None):
     results = []
     facilities = Facility.objects.filter(is_active=True).order_by('name')
     if user:
-        if user.profile.is_sys_admin():
-            pass
-        elif user.profile.is_dept_admin():
-            facilities = facilities.filter(department=user.profile.department)
-        else:
-            facilities = facilities.filter(managers=user)
+        facilities = filter_visible_facilities(facilities, user, field='pk')
 
     for facility in facilities:
-        booked_duration = booked_hours.get(facility.pk, {}).get('total_duration') or timedelta()
-        booked_hours_value = booked_duration.total_seconds() / 3600
+        booked_hours_value = (booked_hours.get(facility.pk, {}).get('total_seconds') or 0) / 3600
         available_hours = facility.daily_open_hours * total_days
         utilization = (booked_hours_value / available_hours) if available_hours else 0
         results.append({
@@ -71,48 +170,27 @@ def get_facility_utilization(*, start_date=None, end_date=None, user=None):
     return sorted(results, key=lambda item: item['utilization'], reverse=True)
 
 
+@profile_span('analytics.most_booked')
 def get_most_booked_facilities(*, start_date=None, end_date=None, limit=5, user=None):
     """Return facilities ranked by approved booking count."""
     start_date, end_date = get_reporting_window(start_date, end_date)
-    queryset = BookingRequest.objects.filter(
-        status=BookingRequest.STATUS_APPROVED,
-        start_datetime__date__gte=start_date,
-        start_datetime__date__lte=end_date,
-    )
-    if user:
-        if user.profile.is_sys_admin():
-            pass
-        elif user.profile.is_dept_admin():
-            queryset = queryset.filter(facility__department=user.profile.department)
-        else:
-            queryset = queryset.filter(facility__managers=user)
-            
     return list(
-        queryset.values('facility_id', 'facility__name')
-        .annotate(total_bookings=Count('id'))
+        _usage_queryset(start_date, end_date, user)
+        .values('facility_id', 'facility__name')
+        .annotate(total_bookings=Sum('booking_count'))
+        .filter(total_bookings__gt=0)
         .order_by('-total_bookings', 'facility__name')[:limit]
     )
 
 
+@profile_span('analytics.peak_hours')
 def get_peak_booking_hours(*, start_date=None, end_date=None, user=None):
     """Return booking counts grouped by the local start hour."""
     start_date, end_date = get_reporting_window(start_date, end_date)
-    queryset = BookingRequest.objects.filter(
-        status=BookingRequest.STATUS_APPROVED,
-        start_datetime__date__gte=start_date,
-        start_datetime__date__lte=end_date,
-    )
-    if user:
-        if user.profile.is_sys_admin():
-            pass
-        elif user.profile.is_dept_admin():
-            queryset = queryset.filter(facility__department=user.profile.department)
-        else:
-            queryset = queryset.filter(facility__managers=user)
-
     return list(
-        queryset.annotate(hour=ExtractHour('start_datetime'))
+        _usage_queryset(start_date, end_date, user)
         .values('hour')
-        .annotate(total_bookings=Count('id'))
+        .annotate(total_bookings=Sum('booking_count'))
+        .filter(total_bookings__gt=0)
         .order_by('-total_bookings', 'hour')
     )
@@ -1,16 +1,42 @@
+import importlib.util
+import io
+import json
+import tempfile
+import unittest
 from datetime import datetime, time, timedelta
+from pathlib import Path
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
-from bookings.services import approve_booking_request, submit_booking_request
+from bookings.models import BookingRequest
+from bookings.services import (
+    approve_booking_request,
+    reject_booking_request,
+    submit_booking_request,
+    withdraw_booking_request,
+)
+from core.seeding import seed_campus
+from core.testing import QueryCheckingClient
 from facilities.models import Facility
 
-from .services import get_facility_utilization, get_most_booked_facilities, get_peak_booking_hours
+from .models import FacilityDailyUsage
+from .services import (
+    get_facility_utilization,
+    get_most_booked_facilities,
+    get_peak_booking_hours,
+    rebuild_daily_usage,
+)
 
 
 class AnalyticsServiceTests(TestCase):
+    client_class = QueryCheckingClient
+
     def setUp(self):
         self.manager = User.objects.create_user(username='manager', password='test123')
         self.requester = User.objects.create_user(username='requester', password='test123')
@@ -59,3 +85,220 @@ class AnalyticsServiceTests(TestCase):
         self.assertEqual(most_booked[0]['total_bookings'], 2)
         self.assertEqual(peak_hours[0]['hour'], 9)
         self.assertGreater(utilization[0]['booked_hours'], 0)
+
+    def test_export_streams_csv_rows(self):
+        booking = submit_booking_request(
+            user=self.requester,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 9),
+            end_datetime=self.make_datetime(1, 10),
+            purpose='Morning, with a comma',
+        )
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('analytics:export'))
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['ID', 'Facility'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{booking.pk},Seminar Hall,Seminar Hall,'))
+        self.assertIn('"Morning, with a comma"', lines[1])
+
+    def test_export_streams_ndjson_records(self):
+        booking = submit_booking_request(
+            user=self.requester,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 9),
+            end_datetime=self.make_datetime(1, 11),
+            purpose='Morning session',
+        )
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('analytics:export'), {'format': 'ndjson'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['id'], booking.pk)
+        self.assertEqual(records[0]['start_time'], '09:00:00')
+        self.assertEqual(records[0]['duration_hours'], 2.0)
+        self.assertEqual(records[0]['status'], 'Pending')
+
+    def test_export_rejects_unknown_format(self):
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('analytics:export'), {'format': 'xlsx'})
+
+        self.assertRedirects(response, reverse('analytics:dashboard'))
+
+    def test_export_command_writes_ndjson_to_stdout(self):
+        submit_booking_request(
+            user=self.requester,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 9),
+            end_datetime=self.make_datetime(1, 10),
+            purpose='Morning session',
+        )
+        out = io.StringIO()
+
+        call_command('export_bookings', format='ndjson', stdout=out)
+
+        self.assertEqual(json.loads(out.getvalue())['facility'], 'Seminar Hall')
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_export_command_writes_parquet_and_arrow(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        for hour in (9, 11):
+            submit_booking_request(
+                user=self.requester,
+                facility=self.facility,
+                start_datetime=self.make_datetime(1, hour),
+                end_datetime=self.make_datetime(1, hour + 1),
+                purpose='Session',
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_path = Path(directory) / 'bookings.parquet'
+            arrow_path = Path(directory) / 'bookings.arrow'
+            call_command('export_bookings', format='parquet', output=str(parquet_path), stdout=io.StringIO())
+            call_command('export_bookings', format='arrow', output=str(arrow_path), stdout=io.StringIO())
+
+            table = pyarrow.parquet.read_table(parquet_path)
+            self.assertEqual(table.num_rows, 2)
+            self.assertEqual(table.column('facility').to_pylist(), ['Seminar Hall', 'Seminar Hall'])
+            with pyarrow.ipc.open_file(arrow_path) as reader:
+                self.assertEqual(reader.read_all().column('duration_hours').to_pylist(), [1.0, 1.0])
+
+
+class DailyUsageRollupTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.requester = User.objects.create_user(username='requester', password='test123')
+        self.facility = Facility.objects.create(
+            name='Seminar Hall',
+            facility_type='hall',
+            capacity=100,
+            open_time='08:00',
+            close_time='18:00',
+        )
+        self.facility.managers.add(self.manager)
+        self.policy = self.facility.booking_policy
+        self.policy.max_bookings_per_user = 10
+        self.policy.save()
+        self.booking_date = timezone.localdate() + timedelta(days=1)
+
+    def make_datetime(self, hour, minute=0):
+        return timezone.make_aware(
+            datetime.combine(self.booking_date, time(hour=hour, minute=minute)),
+            timezone.get_current_timezone(),
+        )
+
+    def submit(self, start, end):
+        return submit_booking_request(
+            user=self.requester,
+            facility=self.facility,
+            start_datetime=start,
+            end_datetime=end,
+            purpose='Session',
+        )
+
+    def usage(self):
+        return list(
+            FacilityDailyUsage.objects.order_by('hour').values_list('hour', 'booked_seconds', 'booking_count')
+        )
+
+    def test_rollup_follows_bookings_into_and_out_of_approved(self):
+        booking = self.submit(self.make_datetime(9, 30), self.make_datetime(11))
+        self.assertEqual(self.usage(), [])
+
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+        self.assertEqual(self.usage(), [(9, 1800, 1), (10, 3600, 0)])
+
+        booking = BookingRequest.objects.get(pk=booking.pk)
+        booking.end_datetime = self.make_datetime(10)
+        booking.save()
+        self.assertEqual(self.usage(), [(9, 1800, 1), (10, 0, 0)])
+
+        booking.delete()
+        self.assertEqual(self.usage(), [(9, 0, 0), (10, 0, 0)])
+
+    def test_rollup_follows_deferred_and_hand_built_instances(self):
+        booking = self.submit(self.make_datetime(9), self.make_datetime(10))
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+
+        deferred = BookingRequest.objects.only('pk', 'status').get(pk=booking.pk)
+        deferred.status = BookingRequest.STATUS_WITHDRAWN
+        deferred.save()
+        self.assertEqual(self.usage(), [(9, 0, 0)])
+
+        stored = BookingRequest.objects.values().get(pk=booking.pk)
+        BookingRequest(**{**stored, 'status': BookingRequest.STATUS_APPROVED}).save()
+        self.assertEqual(self.usage(), [(9, 3600, 1)])
+
+        BookingRequest(**BookingRequest.objects.values().get(pk=booking.pk)).delete()
+        self.assertEqual(self.usage(), [(9, 0, 0)])
+
+    def test_drifted_rollup_is_clamped_at_zero(self):
+        booking = self.submit(self.make_datetime(9), self.make_datetime(10))
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+        FacilityDailyUsage.objects.update(booked_seconds=600, booking_count=0)
+
+        BookingRequest.objects.get(pk=booking.pk).delete()
+
+        self.assertEqual(self.usage(), [(9, 0, 0)])
+
+    def test_rejected_and_withdrawn_bookings_do_not_count(self):
+        rejected = self.submit(self.make_datetime(9), self.make_datetime(10))
+        withdrawn = self.submit(self.make_datetime(11), self.make_datetime(12))
+        reject_booking_request(booking_request=rejected, acting_user=self.manager, reason='Closed')
+        withdraw_booking_request(booking_request=withdrawn, acting_user=self.requester)
+
+        self.assertFalse(FacilityDailyUsage.objects.filter(booking_count__gt=0).exists())
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for start_hour, end_hour in ((9, 10), (10, 12), (14, 15)):
+            booking = self.submit(self.make_datetime(start_hour, 15), self.make_datetime(end_hour))
+            approve_booking_request(booking_request=booking, acting_user=self.manager)
+        incremental = self.usage()
+
+        FacilityDailyUsage.objects.all().delete()
+        call_command('rebuild_daily_usage', stdout=io.StringIO())
+
+        self.assertEqual(self.usage(), incremental)
+        self.assertEqual(rebuild_daily_usage(), len(incremental))
+
+    def test_dashboard_queries_do_not_touch_bookings(self):
+        booking = self.submit(self.make_datetime(9), self.make_datetime(11))
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+
+        with CaptureQueriesContext(connection) as queries:
+            utilization = get_facility_utilization(user=self.manager)
+            most_booked = get_most_booked_facilities(user=self.manager)
+            peak_hours = get_peak_booking_hours(user=self.manager)
+
+        self.assertFalse(any('bookings_bookingrequest' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(utilization[0]['booked_hours'], 2.0)
+        self.assertEqual(utilization[0]['total_bookings'], 1)
+        self.assertEqual(most_booked[0]['total_bookings'], 1)
+        self.assertEqual(peak_hours, [{'hour': 9, 'total_bookings': 1}])
+
+
+class AnalyticsViewQueryTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        campus = seed_campus(departments=2, facilities=6, users=12, bookings=200, seed=5)
+        self.client.force_login(User.objects.get(username=campus.sys_admin))
+
+    def test_analytics_pages_do_not_query_per_row(self):
+        for url in (reverse('analytics:dashboard'), reverse('analytics:utilization')):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+        for export_format in ('csv', 'ndjson'):
+            response = self.client.get(reverse('analytics:export'), {'format': export_format})
+            # The repeated-query check runs once the streamed body has been consumed.
+            self.assertGreater(len(b''.join(response.streaming_content).splitlines()), 10)
@@ -1,11 +1,25 @@
-import csv
 from datetime import datetime
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 
+from users.permissions import get_permission_context
+
+from .exports import (
+    COLUMNAR_FORMATS,
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    FILE_EXTENSIONS,
+    FORMAT_CSV,
+    FORMAT_NDJSON,
+    ExportUnavailable,
+    export_to_file,
+    get_export_queryset,
+    iter_csv,
+    iter_ndjson,
+)
 from .services import (
     get_facility_utilization,
     get_most_booked_facilities,
@@ -24,7 +38,7 @@ def _parse_date(value):
 
 
 def _require_analytics_access(request):
-    if request.user.profile.can_view_analytics():
+    if get_permission_context(request.user).can_view_analytics:
         return None
     messages.error(request, 'You do not have permission to view analytics.')
     return redirect('core:home')
@@ -70,70 +84,51 @@ def utilization_report(request):
 @login_required
 def export_data(request):
     """
-    Export booking requests as a CSV file.
+    Export booking requests as CSV, NDJSON, Parquet or Arrow IPC.
 
     Query params:
         start (YYYY-MM-DD) — earliest booking date   (default: 30 days ago)
         end   (YYYY-MM-DD) — latest booking date      (default: 30 days ahead)
         status             — filter by status string  (optional)
+        format             — csv, ndjson, parquet or arrow (default: csv)
     """
     denial = _require_analytics_access(request)
     if denial:
         return denial
 
-    from bookings.models import BookingRequest
+    export_format = request.GET.get('format', FORMAT_CSV).strip().lower() or FORMAT_CSV
+    if export_format not in EXPORT_FORMATS:
+        messages.error(request, f'Unsupported export format "{export_format}".')
+        return redirect('analytics:dashboard')
 
     start_date = _parse_date(request.GET.get('start'))
     end_date = _parse_date(request.GET.get('end'))
     start_date, end_date = get_reporting_window(start_date, end_date)
-    filter_status = request.GET.get('status', '').strip()
-
-    queryset = (
-        BookingRequest.objects
-        .filter(
-            start_datetime__date__gte=start_date,
-            start_datetime__date__lte=end_date,
-        )
-        .select_related('user', 'facility', 'reviewed_by')
-        .order_by('start_datetime')
+    queryset = get_export_queryset(
+        start_date=start_date,
+        end_date=end_date,
+        status=request.GET.get('status', '').strip(),
+        user=request.user,
     )
-    if request.user.profile.is_sys_admin():
-        pass
-    elif request.user.profile.is_dept_admin():
-        queryset = queryset.filter(facility__department=request.user.profile.department)
-    else:
-        queryset = queryset.filter(facility__managers=request.user)
-    if filter_status:
-        queryset = queryset.filter(status=filter_status)
-
-    filename = f'bookings_{start_date}_{end_date}.csv'
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    # Header row
-    writer.writerow([
-        'ID', 'Facility', 'Facility Type', 'Date',
-        'Start Time', 'End Time', 'Duration (hrs)',
-        'Status', 'User', 'Purpose',
-        'Reviewed By', 'Reviewed At', 'Rejection Reason',
-    ])
-
-    for br in queryset:
-        writer.writerow([
-            br.pk,
-            br.facility.name,
-            br.facility.get_facility_type_display(),
-            br.date,
-            br.start_time.strftime('%H:%M'),
-            br.end_time.strftime('%H:%M'),
-            round(br.duration_hours, 2),
-            br.get_status_display(),
-            br.user.username,
-            br.purpose,
-            br.reviewed_by.username if br.reviewed_by else '',
-            br.reviewed_at.strftime('%Y-%m-%d %H:%M') if br.reviewed_at else '',
-            br.rejection_reason,
-        ])
+    filename = f'bookings_{start_date}_{end_date}.{FILE_EXTENSIONS[export_format]}'
+
+    if export_format in COLUMNAR_FORMATS:
+        # Columnar files need their footer written before they can be read, so
+        # they are built in a temporary file and then streamed from disk.
+        try:
+            handle = export_to_file(queryset, export_format)
+        except ExportUnavailable as exc:
+            messages.error(request, str(exc))
+            return redirect('analytics:dashboard')
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename=filename,
+            content_type=CONTENT_TYPES[export_format],
+        )
 
+    # Text formats are streamed as they are read so memory stays flat for large exports.
+    rows = iter_ndjson(queryset) if export_format == FORMAT_NDJSON else iter_csv(queryset)
+    response = StreamingHttpResponse(rows, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
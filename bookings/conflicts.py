@@ -0,0 +1,112 @@
+"""
+Interval index used for booking conflict detection.
+
+Active (pending + approved) bookings are indexed per facility and local day.
+Each day index keeps its intervals sorted by start time together with the
+longest interval length, so an overlap lookup only bisects into the sorted
+starts and inspects the few candidates that can still reach the window.
+
+Indexes are built from one query per facility-day (or one range query for a
+whole recurring series) and are not kept between requests: a cached copy
+would be stale in every other worker process, and conflict checks on write
+paths must be confirmed by the database under lock anyway.
+"""
+
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.utils import local_date_bounds
+
+from .models import BookingRequest
+
+ACTIVE_STATUSES = (BookingRequest.STATUS_PENDING, BookingRequest.STATUS_APPROVED)
+
+IndexedBooking = namedtuple('IndexedBooking', ['pk', 'start_datetime', 'end_datetime', 'status'])
+
+
+class ConflictSummary(namedtuple('ConflictSummary', ['approved', 'pending'])):
+    """Overlapping active bookings for a window, split by status."""
+
+    __slots__ = ()
+
+    @property
+    def approved_conflict(self):
+        """Return the earliest approved overlap, or None."""
+        return self.approved[0] if self.approved else None
+
+    @property
+    def pending_count(self):
+        return len(self.pending)
+
+    @property
+    def pending_pks(self):
+        return [booking.pk for booking in self.pending]
+
+
+class IntervalIndex:
+    """Sorted-endpoint index over a set of booking intervals, e.g. one facility-day."""
+
+    def __init__(self, bookings=()):
+        self._bookings = sorted(bookings, key=lambda booking: (booking.start_datetime, booking.pk))
+        self._starts = [booking.start_datetime for booking in self._bookings]
+        self._max_span = max(
+            (booking.end_datetime - booking.start_datetime for booking in self._bookings),
+            default=timedelta(),
+        )
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def overlapping(self, start_datetime, end_datetime, exclude_pk=None):
+        """Return indexed bookings overlapping `[start_datetime, end_datetime)`."""
+        if not self._bookings:
+            return []
+
+        # Nothing starting before `start - max_span` can still be running at `start`.
+        lower = bisect_left(self._starts, start_datetime - self._max_span)
+        upper = bisect_left(self._starts, end_datetime)
+        return [
+            booking
+            for booking in self._bookings[lower:upper]
+            if booking.end_datetime > start_datetime and booking.pk != exclude_pk
+        ]
+
+    def classify(self, start_datetime, end_datetime, exclude_pk=None):
+        """Split the overlapping bookings into approved and pending conflicts."""
+        approved, pending = [], []
+        for booking in self.overlapping(start_datetime, end_datetime, exclude_pk=exclude_pk):
+            if booking.status == BookingRequest.STATUS_APPROVED:
+                approved.append(booking)
+            else:
+                pending.append(booking)
+        return ConflictSummary(approved=approved, pending=pending)
+
+
+def load_day_index(facility_id, booking_date, lock_queryset=None):
+    """Fetch a facility-day's active bookings in one query and index them."""
+    day_start, day_end = local_date_bounds(booking_date)
+    queryset = BookingRequest.objects.filter(
+        facility_id=facility_id,
+        status__in=ACTIVE_STATUSES,
+        start_datetime__lt=day_end,
+        end_datetime__gt=day_start,
+    ).order_by()
+    if lock_queryset is not None:
+        queryset = lock_queryset(queryset)
+    rows = queryset.values_list('pk', 'start_datetime', 'end_datetime', 'status')
+    return IntervalIndex(IndexedBooking(*row) for row in rows)
+
+
+def find_conflicts(*, facility_id, start_datetime, end_datetime, exclude_pk=None, lock_queryset=None):
+    """
+    Classify active bookings overlapping a window in a single lookup.
+
+    The facility-day is read from the database, under lock when `lock_queryset`
+    is supplied, so the answer is always current.
+    """
+    booking_date = timezone.localtime(start_datetime).date()
+    index = load_day_index(facility_id, booking_date, lock_queryset=lock_queryset)
+    return index.classify(start_datetime, end_datetime, exclude_pk=exclude_pk)
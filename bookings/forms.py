@@ -2,6 +2,7 @@ from django import forms
 from django.utils import timezone
 
 from .models import BookingRequest
+from .services import REVIEW_APPROVE, REVIEW_REJECT
 
 
 class BookingRequestForm(forms.ModelForm):
@@ -69,3 +70,30 @@ class RejectRequestForm(forms.Form):
         }),
         label='Rejection Reason',
     )
+
+
+class BatchReviewForm(forms.Form):
+    """Approve or reject several pending requests from the manager dashboard."""
+
+    ACTION_CHOICES = [
+        (REVIEW_APPROVE, 'Approve selected'),
+        (REVIEW_REJECT, 'Reject selected'),
+    ]
+
+    request_ids = forms.ModelMultipleChoiceField(
+        queryset=BookingRequest.objects.all(),
+        error_messages={'required': 'Select at least one request to review.'},
+    )
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm w-auto'}),
+    )
+    reason = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control form-control-sm w-auto flex-fill',
+            'placeholder': 'Optional: rejection reason',
+        }),
+    )
+    # The dashboard's filters and page cursors, so the manager lands back where they were.
+    dashboard_query = forms.CharField(required=False, widget=forms.HiddenInput)
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_recurringrule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingrequest',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='bookings_bo_status_0b3a9b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingrequest',
+            index=models.Index(fields=['created_at', 'id'], name='bookings_bo_created_75e37e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_dashboard_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingrequest',
+            name='series',
+            field=models.ForeignKey(blank=True, help_text='The recurring rule this request was expanded from, if any.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='bookings.recurringrule'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -60,6 +60,14 @@ class BookingRequest(models.Model):
         blank=True,
         related_name='reviewed_requests',
     )
+    series = models.ForeignKey(
+        'RecurringRule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences',
+        help_text='The recurring rule this request was expanded from, if any.',
+    )
     rejection_reason = models.TextField(blank=True)
 
     class Meta:
@@ -70,8 +78,39 @@ class BookingRequest(models.Model):
             models.Index(fields=['facility', 'status', 'start_datetime']),
             models.Index(fields=['facility', 'status', 'end_datetime']),
             models.Index(fields=['user', 'status', 'start_datetime']),
+            # Keyset pagination of the manager dashboard queues (bookings/pagination.py).
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
+    # Fields whose loaded values are remembered so post_save receivers can
+    # tell what a save changed (see analytics.models).
+    TRACKED_FIELDS = ('facility_id', 'status', 'start_datetime', 'end_datetime')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_state()
+        return instance
+
+    def remember_loaded_state(self):
+        """Snapshot the tracked fields as they are stored in the database."""
+        if all(attname in self.__dict__ for attname in self.TRACKED_FIELDS):
+            self._loaded_state = tuple(self.__dict__[attname] for attname in self.TRACKED_FIELDS)
+        else:
+            self._loaded_state = None
+
+    def load_stored_state(self):
+        """Snapshot the tracked fields from the stored row (None if there is no row)."""
+        self._loaded_state = (
+            type(self)._base_manager.filter(pk=self.pk).values_list(*self.TRACKED_FIELDS).first()
+        )
+
+    @property
+    def loaded_state(self):
+        """Tracked field values as last loaded or saved, or None if unknown."""
+        return getattr(self, '_loaded_state', None)
+
     def __str__(self):
         return (
             f'[{self.get_status_display().upper()}] '
@@ -236,8 +275,8 @@ class ApprovalStep(models.Model):
         )
 
 
-# ── Recurring Bookings (future feature stub) ───────────────────────────────────
-# Uncomment and run migrations when recurring booking support is needed.
+# ── Recurring Bookings ─────────────────────────────────────────────────────────
+# Rules are expanded into individual requests by bookings/recurrence.py.
 # See settings/base.py RECURRENCE_SETTINGS for configuration options.
 
 class RecurringRule(models.Model):
@@ -263,3 +302,23 @@ def ensure_booking_policy(sender, instance, created, **kwargs):
     """Create a default booking policy for every facility."""
     if created:
         BookingPolicy.objects.get_or_create(facility=instance)
+
+
+# Saves that change none of these leave the cached availability untouched.
+AVAILABILITY_FIELDS = frozenset({'facility', 'facility_id', 'status', 'start_datetime', 'end_datetime'})
+
+
+@receiver(post_save, sender=BookingRequest)
+@receiver(post_delete, sender=BookingRequest)
+def refresh_availability(sender, instance, update_fields=None, **kwargs):
+    """
+    Rebuild the cached day bitmaps a booking write touched, whether it came from
+    a service, the admin site or a script. Queryset updates and bulk_create skip
+    this receiver, so their callers refresh the affected days themselves.
+    """
+    from facilities.services import schedule_availability_refresh
+
+    if update_fields is not None and not AVAILABILITY_FIELDS & update_fields:
+        return
+    schedule_availability_refresh(instance)
+
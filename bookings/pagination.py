@@ -0,0 +1,95 @@
+"""
+Keyset (seek) pagination for the manager dashboard queues.
+
+Requests are listed newest first on `(created_at, id)`. A page is fetched
+with a `WHERE (created_at, id) < cursor ... LIMIT n` seek on the
+`(status, created_at, id)` and `(created_at, id)` indexes instead of an
+OFFSET, so every page costs the same as the first. Cursors are opaque
+URL-safe tokens; a malformed one falls back to the first page.
+
+Queue sizes are capped counts: at most `COUNT_LIMIT + 1` rows are counted,
+and anything above the limit is shown as "1000+" rather than paying for a
+full `COUNT(*)` over the scope.
+"""
+
+from collections import namedtuple
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+DEFAULT_DASHBOARD_SETTINGS = {
+    'PAGE_SIZE': 20,
+    'COUNT_LIMIT': 1000,
+}
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'previous_cursor'])
+
+
+class CountEstimate(namedtuple('CountEstimate', ['value', 'exact'])):
+    """A row count that stops at a limit; `exact` is False when the limit was passed."""
+
+    def __str__(self):
+        return str(self.value) if self.exact else f'{self.value}+'
+
+    def __add__(self, other):
+        return CountEstimate(self.value + other.value, self.exact and other.exact)
+
+
+def get_dashboard_settings():
+    return {**DEFAULT_DASHBOARD_SETTINGS, **getattr(settings, 'ADMIN_DASHBOARD', {})}
+
+
+def encode_cursor(booking_request):
+    created_at = booking_request.created_at.astimezone(UTC).isoformat()
+    return urlsafe_base64_encode(f'{created_at}|{booking_request.pk}'.encode())
+
+
+def decode_cursor(token):
+    """Return `(created_at, id)` for a cursor token, or None if it is malformed."""
+    try:
+        created_at, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, *, after=None, before=None, per_page=DEFAULT_DASHBOARD_SETTINGS['PAGE_SIZE']):
+    """
+    Return the `KeysetPage` of `queryset` that follows the `after` cursor,
+    precedes the `before` cursor, or the first page when neither is given.
+    """
+    before_key = decode_cursor(before) if before else None
+    after_key = None if before_key else (decode_cursor(after) if after else None)
+
+    if before_key:
+        created_at, pk = before_key
+        rows = list(
+            queryset
+            .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'pk')[:per_page + 1]
+        )
+        if len(rows) <= per_page:
+            # Back at the top; show a full first page rather than a short one.
+            return keyset_page(queryset, per_page=per_page)
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, encode_cursor(items[-1]), encode_cursor(items[0]))
+
+    if after_key:
+        created_at, pk = after_key
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = list(queryset.order_by('-created_at', '-pk')[:per_page + 1])
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > per_page else None
+    previous_cursor = encode_cursor(items[0]) if after_key and items else None
+    return KeysetPage(items, next_cursor, previous_cursor)
+
+
+def estimate_count(queryset, *, limit=DEFAULT_DASHBOARD_SETTINGS['COUNT_LIMIT']):
+    """Count `queryset` up to `limit` rows; a `limit` of None counts exactly."""
+    if limit is None:
+        return CountEstimate(queryset.count(), True)
+    counted = queryset.order_by()[:limit + 1].count()
+    return CountEstimate(min(counted, limit), counted <= limit)
@@ -0,0 +1,215 @@
+"""
+Expansion of recurring booking rules into individual booking requests.
+
+A recurring request is validated once against the facility policy, expanded
+into its occurrences, checked for conflicts with a single range query over the
+whole series, and written with `bulk_create` together with the level-1
+approval steps and audit entries.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import ActivityLog
+from core.services import bulk_log_activity
+from facilities.models import Facility
+from facilities.services import schedule_availability_refresh
+from notifications import events as notification_events
+from notifications.service import send_booking_notification
+
+from .conflicts import ACTIVE_STATUSES, IndexedBooking, IntervalIndex
+from .models import ApprovalStep, BookingRequest, RecurringRule
+from .services import _validate_booking_window
+
+Occurrence = namedtuple('Occurrence', ['start_datetime', 'end_datetime'])
+Collision = namedtuple('Collision', ['start_datetime', 'end_datetime', 'code', 'reason'])
+
+# Why an occurrence was skipped; `Collision.reason` is the matching message for people.
+COLLISION_ADVANCE_WINDOW = 'advance_window'
+COLLISION_BOOKED = 'booked'
+COLLISION_QUEUE_FULL = 'queue_full'
+COLLISION_USER_LIMIT = 'user_limit'
+RecurringExpansion = namedtuple('RecurringExpansion', ['rule', 'created', 'collisions'])
+
+
+def _shift_date(first_date, frequency, steps):
+    """Return the date `steps` periods after `first_date`, or None if it does not exist."""
+    if frequency == RecurringRule.DAILY:
+        return first_date + timedelta(days=steps)
+    if frequency == RecurringRule.WEEKLY:
+        return first_date + timedelta(weeks=steps)
+
+    years, month_index = divmod(first_date.month - 1 + steps, 12)
+    try:
+        return date(first_date.year + years, month_index + 1, first_date.day)
+    except ValueError:
+        # e.g. the 31st in a 30-day month: that month has no occurrence.
+        return None
+
+
+def generate_occurrences(*, start_datetime, end_datetime, frequency, interval=1, until_date, max_count=None):
+    """
+    Return the occurrences of a rule, starting with the supplied window.
+
+    The local wall-clock times of the first occurrence are kept for every
+    repetition. At most `RECURRENCE_SETTINGS['MAX_OCCURRENCES']` are produced.
+    """
+    recurrence_settings = getattr(settings, 'RECURRENCE_SETTINGS', {})
+    limit = recurrence_settings.get('MAX_OCCURRENCES', 52)
+    if max_count:
+        limit = min(limit, max_count)
+
+    local_start = timezone.localtime(start_datetime)
+    local_end = timezone.localtime(end_datetime)
+    current_timezone = timezone.get_current_timezone()
+
+    occurrences = []
+    steps = 0
+    while len(occurrences) < limit:
+        occurrence_date = _shift_date(local_start.date(), frequency, steps * interval)
+        steps += 1
+        if occurrence_date is None:
+            continue
+        if occurrence_date > until_date:
+            break
+        occurrences.append(Occurrence(
+            timezone.make_aware(datetime.combine(occurrence_date, local_start.time()), current_timezone),
+            timezone.make_aware(datetime.combine(occurrence_date, local_end.time()), current_timezone),
+        ))
+    return occurrences
+
+
+def _validate_rule(frequency, interval, until_date, start_datetime):
+    recurrence_settings = getattr(settings, 'RECURRENCE_SETTINGS', {})
+    if not recurrence_settings.get('ENABLED', False):
+        raise ValidationError('Recurring bookings are not enabled.')
+    if frequency not in recurrence_settings.get('ALLOWED_FREQUENCIES', []):
+        raise ValidationError(f'Recurring frequency "{frequency}" is not allowed.')
+    if interval < 1:
+        raise ValidationError('The recurrence interval must be at least 1.')
+    if until_date < timezone.localtime(start_datetime).date():
+        raise ValidationError('The recurrence end date must be on or after the first booking date.')
+
+
+def submit_recurring_booking_request(
+    *, user, facility, start_datetime, end_datetime, purpose,
+    frequency, interval=1, until_date, max_count=None,
+):
+    """
+    Create pending booking requests for every available occurrence of a rule.
+
+    The first occurrence is validated against the facility policy exactly like a
+    single submission, and every created occurrence counts towards the
+    requester's active booking limit. Occurrences that overlap an approved
+    booking, hit the pending queue limit, fall outside the advance-booking
+    window or would take the requester over their limit are skipped and
+    reported as collisions, each with a `COLLISION_*` code. Every created
+    request is linked to the rule through `series`. Returns a
+    `RecurringExpansion`.
+    """
+    _validate_rule(frequency, interval, until_date, start_datetime)
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            Facility.objects.select_for_update().filter(pk=facility.pk).values_list('pk').get()
+
+        snapshot = _validate_booking_window(BookingRequest(
+            user=user,
+            facility=facility,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            purpose=purpose,
+        ))
+        occurrences = generate_occurrences(
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            frequency=frequency,
+            interval=interval,
+            until_date=until_date,
+            max_count=max_count,
+        )
+
+        # One range query covers the conflicts of every occurrence.
+        rows = BookingRequest.objects.filter(
+            facility=facility,
+            status__in=ACTIVE_STATUSES,
+            start_datetime__lt=occurrences[-1].end_datetime,
+            end_datetime__gt=occurrences[0].start_datetime,
+        ).order_by().values_list('pk', 'start_datetime', 'end_datetime', 'status')
+        index = IntervalIndex(IndexedBooking(*row) for row in rows)
+
+        latest_allowed_date = timezone.localdate() + timedelta(days=snapshot['max_advance_days'])
+        # The first occurrence passed the limit check, so at least one slot is left.
+        remaining_bookings = snapshot['max_bookings_per_user'] - snapshot['active_user_bookings']
+        bookings, collisions = [], []
+        for occurrence in occurrences:
+            conflicts = index.classify(occurrence.start_datetime, occurrence.end_datetime)
+            if timezone.localtime(occurrence.start_datetime).date() > latest_allowed_date:
+                code = COLLISION_ADVANCE_WINDOW
+                reason = f'Beyond the {snapshot["max_advance_days"]} day advance-booking window.'
+            elif conflicts.approved:
+                code = COLLISION_BOOKED
+                reason = 'Already booked.'
+            elif facility.max_pending_requests and conflicts.pending_count >= facility.max_pending_requests:
+                code = COLLISION_QUEUE_FULL
+                reason = 'The pending queue for this slot is full.'
+            elif len(bookings) >= remaining_bookings:
+                code = COLLISION_USER_LIMIT
+                reason = f'Over your limit of {snapshot["max_bookings_per_user"]} active booking(s).'
+            else:
+                bookings.append(BookingRequest(
+                    user=user,
+                    facility=facility,
+                    start_datetime=occurrence.start_datetime,
+                    end_datetime=occurrence.end_datetime,
+                    purpose=purpose,
+                    status=BookingRequest.STATUS_PENDING,
+                ))
+                continue
+            collisions.append(Collision(occurrence.start_datetime, occurrence.end_datetime, code, reason))
+
+        if not bookings:
+            raise ValidationError('None of the requested occurrences are available.')
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            BookingRequest.objects.bulk_create(bookings)
+        else:
+            for booking in bookings:
+                booking.save()
+
+        ApprovalStep.objects.bulk_create([
+            ApprovalStep(booking_request=booking, level=1, status=ApprovalStep.STATUS_PENDING)
+            for booking in bookings
+        ])
+        rule = RecurringRule.objects.create(
+            booking_request=bookings[0],
+            frequency=frequency,
+            interval=interval,
+            until_date=until_date,
+            max_count=max_count,
+        )
+        BookingRequest.objects.filter(pk__in=[booking.pk for booking in bookings]).update(series=rule)
+        for booking in bookings:
+            booking.series = rule
+        bulk_log_activity(
+            user=user,
+            action=ActivityLog.ACTION_BOOKING_CREATED,
+            model=BookingRequest,
+            object_ids=[booking.pk for booking in bookings],
+            metadata={
+                'facility_id': facility.pk,
+                'facility_name': facility.name,
+                'recurring_rule_id': rule.pk,
+            },
+        )
+        # bulk_create skips post_save, so refresh the availability bitmaps here.
+        for booking in bookings:
+            schedule_availability_refresh(booking)
+
+        send_booking_notification(bookings[0], notification_events.BOOKING_CREATED)
+        return RecurringExpansion(rule=rule, created=bookings, collisions=collisions)
@@ -1,14 +1,21 @@
+from collections import namedtuple
 from datetime import timedelta
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import connection, transaction
+from django.db.models import Count, F, FilteredRelation, Q
 from django.utils import timezone
 
 from core.models import ActivityLog
-from core.services import log_activity
+from core.profiling import profile_span
+from core.services import bulk_log_activity, log_activity
+from facilities.models import Facility
 from notifications import events as notification_events
-from notifications.service import send_booking_notification
+from notifications.service import send_booking_notification, send_booking_notifications
+from users.permissions import load_permission_context
 
+from .conflicts import find_conflicts
 from .models import ApprovalStep, BookingPolicy, BookingRequest
 
 
@@ -43,8 +50,73 @@ def get_overlapping_requests(*, facility, start_datetime, end_datetime, statuses
     return queryset
 
 
+def _get_submission_snapshot(booking_request):
+    """
+    Fetch the policy limits and booking counts a submission is validated against.
+
+    Everything comes back from one aggregate query: the facility's policy is
+    joined in, and the facility's active bookings are narrowed in the JOIN to the
+    ones that either overlap the requested window or belong to the requester, so
+    conditional counts can classify them without touching unrelated history.
+    """
+    now = timezone.now()
+    active_statuses = [BookingRequest.STATUS_PENDING, BookingRequest.STATUS_APPROVED]
+    relevant = Q(booking_requests__status__in=active_statuses) & (
+        Q(
+            booking_requests__start_datetime__lt=booking_request.end_datetime,
+            booking_requests__end_datetime__gt=booking_request.start_datetime,
+        )
+        | Q(booking_requests__user=booking_request.user, booking_requests__end_datetime__gte=now)
+    )
+    if booking_request.pk:
+        relevant &= ~Q(booking_requests__pk=booking_request.pk)
+
+    overlapping = Q(
+        window_bookings__start_datetime__lt=booking_request.end_datetime,
+        window_bookings__end_datetime__gt=booking_request.start_datetime,
+    )
+    snapshot = (
+        Facility.objects
+        .filter(pk=booking_request.facility_id)
+        .annotate(window_bookings=FilteredRelation('booking_requests', condition=relevant))
+        .values(
+            max_duration_hours=F('booking_policy__max_duration_hours'),
+            max_advance_days=F('booking_policy__max_advance_days'),
+            max_bookings_per_user=F('booking_policy__max_bookings_per_user'),
+        )
+        .annotate(
+            approved_conflicts=Count(
+                'window_bookings',
+                filter=overlapping & Q(window_bookings__status=BookingRequest.STATUS_APPROVED),
+            ),
+            pending_conflicts=Count(
+                'window_bookings',
+                filter=overlapping & Q(window_bookings__status=BookingRequest.STATUS_PENDING),
+            ),
+            active_user_bookings=Count(
+                'window_bookings',
+                filter=Q(window_bookings__user=booking_request.user, window_bookings__end_datetime__gte=now),
+            ),
+        )
+        .get()
+    )
+    if snapshot['max_duration_hours'] is None:
+        # Facilities created before policies existed get theirs lazily.
+        policy = get_or_create_policy(booking_request.facility)
+        snapshot.update(
+            max_duration_hours=policy.max_duration_hours,
+            max_advance_days=policy.max_advance_days,
+            max_bookings_per_user=policy.max_bookings_per_user,
+        )
+    return snapshot
+
+
 def _validate_booking_window(booking_request):
-    """Validate operating-hours and booking-policy constraints."""
+    """
+    Validate operating-hours and booking-policy constraints.
+
+    Returns the submission snapshot so the caller can reuse its conflict counts.
+    """
     if booking_request.end_datetime <= booking_request.start_datetime:
         raise ValidationError('End date and time must be after the start date and time.')
 
@@ -65,36 +137,35 @@ def _validate_booking_window(booking_request):
             f'{facility.open_time.strftime("%H:%M")} and {facility.close_time.strftime("%H:%M")}.'
         )
 
-    policy = get_or_create_policy(facility)
-    if booking_request.duration > timedelta(hours=policy.max_duration_hours):
+    snapshot = _get_submission_snapshot(booking_request)
+    if booking_request.duration > timedelta(hours=snapshot['max_duration_hours']):
         raise ValidationError(
-            f'Bookings for {facility.name} cannot exceed {policy.max_duration_hours} hour(s).'
+            f'Bookings for {facility.name} cannot exceed {snapshot["max_duration_hours"]} hour(s).'
         )
 
-    latest_allowed_date = timezone.localdate() + timedelta(days=policy.max_advance_days)
+    latest_allowed_date = timezone.localdate() + timedelta(days=snapshot['max_advance_days'])
     if local_start.date() > latest_allowed_date:
         raise ValidationError(
-            f'Bookings for {facility.name} can only be made {policy.max_advance_days} day(s) in advance.'
+            f'Bookings for {facility.name} can only be made {snapshot["max_advance_days"]} day(s) in advance.'
         )
 
-    active_user_bookings = BookingRequest.objects.filter(
-        facility=facility,
-        user=booking_request.user,
-        status__in=[BookingRequest.STATUS_PENDING, BookingRequest.STATUS_APPROVED],
-        end_datetime__gte=timezone.now(),
-    )
-    if booking_request.pk:
-        active_user_bookings = active_user_bookings.exclude(pk=booking_request.pk)
-    if active_user_bookings.count() >= policy.max_bookings_per_user:
+    if snapshot['active_user_bookings'] >= snapshot['max_bookings_per_user']:
         raise ValidationError(
-            f'You have reached the limit of {policy.max_bookings_per_user} active booking(s) '
+            f'You have reached the limit of {snapshot["max_bookings_per_user"]} active booking(s) '
             f'for {facility.name}.'
         )
+    return snapshot
 
 
+@profile_span('bookings.submit')
 def submit_booking_request(*, user, facility, start_datetime, end_datetime, purpose):
     """Create a booking request safely inside an atomic transaction."""
     with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # The aggregate below cannot take row locks, so serialise
+            # submissions per facility by locking the facility row instead.
+            Facility.objects.select_for_update().filter(pk=facility.pk).values_list('pk').get()
+
         booking_request = BookingRequest(
             user=user,
             facility=facility,
@@ -103,25 +174,22 @@ def submit_booking_request(*, user, facility, start_datetime, end_datetime, purp
             purpose=purpose,
             status=BookingRequest.STATUS_PENDING,
         )
-        _validate_booking_window(booking_request)
+        snapshot = _validate_booking_window(booking_request)
 
-        overlapping = _lock_queryset(
-            get_overlapping_requests(
+        if snapshot['approved_conflicts']:
+            approved_conflict = get_overlapping_requests(
                 facility=facility,
                 start_datetime=start_datetime,
                 end_datetime=end_datetime,
-                statuses=[BookingRequest.STATUS_PENDING, BookingRequest.STATUS_APPROVED],
-            )
-        )
-        approved_conflict = overlapping.filter(status=BookingRequest.STATUS_APPROVED).first()
-        if approved_conflict:
+                statuses=[BookingRequest.STATUS_APPROVED],
+            ).first()
             raise ValidationError(
                 'This facility is already booked from '
                 f'{approved_conflict.start_time.strftime("%H:%M")} to '
                 f'{approved_conflict.end_time.strftime("%H:%M")}. Please select another time slot.'
             )
 
-        pending_count = overlapping.filter(status=BookingRequest.STATUS_PENDING).count()
+        pending_count = snapshot['pending_conflicts']
         if facility.max_pending_requests and pending_count >= facility.max_pending_requests:
             raise ValidationError(
                 f'The pending queue limit ({facility.max_pending_requests}) for this facility and time slot '
@@ -154,140 +222,286 @@ def submit_booking_request(*, user, facility, start_datetime, end_datetime, purp
 
 def _require_facility_manager(booking_request, acting_user):
     """Ensure only the assigned facility manager can review a booking."""
-    if not booking_request.facility.is_managed_by(acting_user):
+    if not load_permission_context(acting_user).manages(booking_request.facility):
         raise PermissionDenied('Only the assigned facility manager can review this booking.')
 
 
-def approve_booking_request(*, booking_request, acting_user):
+AUTO_REJECTION_REASON = 'Another request for the same facility and time slot was approved.'
+
+
+def _auto_reject_conflicts(approved_request, *, conflict_pks, acting_user):
     """
-    Approve the current pending ApprovalStep.
+    Reject pending requests that overlap a newly approved booking.
 
-    Single-level (default): marks BookingRequest as APPROVED immediately.
-    Multi-level: advances the chain. Only marks BookingRequest as APPROVED
-    when the final level is reached.
+    The requests, their open approval steps and the audit entries are each
+    written with one statement, so the cost inside the locked transaction does
+    not grow with the size of the pending queue. Requesters are only notified
+    when `NOTIFY_AUTO_REJECTED_REQUESTS` is set; their messages are then
+    queued with one INSERT as well.
     """
-    with transaction.atomic():
-        locked_request = _lock_queryset(
-            BookingRequest.objects.select_related('facility', 'user').filter(pk=booking_request.pk)
-        ).get()
-        _require_facility_manager(locked_request, acting_user)
+    if not conflict_pks:
+        return 0
+
+    now = timezone.now()
+    rejected_count = BookingRequest.objects.filter(
+        pk__in=conflict_pks,
+        status=BookingRequest.STATUS_PENDING,
+    ).update(
+        status=BookingRequest.STATUS_REJECTED,
+        reviewed_by=acting_user,
+        reviewed_at=now,
+        rejection_reason=AUTO_REJECTION_REASON,
+    )
+    ApprovalStep.objects.filter(
+        booking_request_id__in=conflict_pks,
+        status=ApprovalStep.STATUS_PENDING,
+    ).update(
+        status=ApprovalStep.STATUS_REJECTED,
+        approver=acting_user,
+        comment=AUTO_REJECTION_REASON,
+        timestamp=now,
+    )
+    bulk_log_activity(
+        user=acting_user,
+        action=ActivityLog.ACTION_BOOKING_REJECTED,
+        model=BookingRequest,
+        object_ids=conflict_pks,
+        metadata={'reason': AUTO_REJECTION_REASON, 'auto_rejected': True},
+    )
+    # Queryset updates bypass post_save; the availability bitmap of this
+    # facility-day is refreshed by the approval's save.
+    # Auto-rejected requesters are not notified by default (Phase 5 spec).
+    if getattr(settings, 'NOTIFY_AUTO_REJECTED_REQUESTS', False):
+        send_booking_notifications(
+            BookingRequest.objects.filter(pk__in=conflict_pks, status=BookingRequest.STATUS_REJECTED)
+            .select_related('user', 'facility'),
+            notification_events.BOOKING_REJECTED,
+        )
+    return rejected_count
 
-        if locked_request.status != BookingRequest.STATUS_PENDING:
-            raise ValidationError(
-                f'Request #{locked_request.pk} is already {locked_request.get_status_display().lower()}.'
-            )
 
-        # Get the current (topmost) pending ApprovalStep.
-        current_step = (
-            locked_request.approval_steps
-            .filter(status=ApprovalStep.STATUS_PENDING)
-            .order_by('level')
-            .first()
+def _lock_booking_request(booking_request):
+    """Fetch and lock a booking request together with its facility and requester."""
+    return _lock_queryset(
+        BookingRequest.objects.select_related('facility', 'user').filter(pk=booking_request.pk)
+    ).get()
+
+
+def _ensure_pending(locked_request):
+    if locked_request.status != BookingRequest.STATUS_PENDING:
+        raise ValidationError(
+            f'Request #{locked_request.pk} is already {locked_request.get_status_display().lower()}.'
         )
-        if not current_step:
-            raise ValidationError('No pending approval step found for this request.')
 
-        # Record the approval on this step.
-        current_step.status = ApprovalStep.STATUS_APPROVED
-        current_step.approver = acting_user
-        current_step.timestamp = timezone.now()
-        current_step.save(update_fields=['status', 'approver', 'timestamp'])
 
-        policy = get_or_create_policy(locked_request.facility)
-        required_levels = policy.required_approval_levels
+def _approve_locked_request(locked_request, acting_user):
+    """
+    Approve the current step of a request the caller has already locked.
 
-        if current_step.level < required_levels:
-            # More levels to go — create the next step and leave as pending.
-            ApprovalStep.objects.create(
-                booking_request=locked_request,
-                level=current_step.level + 1,
-                status=ApprovalStep.STATUS_PENDING,
-            )
-            log_activity(
-                user=acting_user,
-                action=ActivityLog.ACTION_BOOKING_APPROVED,
-                obj=locked_request,
-                metadata={
-                    'step_level': current_step.level,
-                    'next_level': current_step.level + 1,
-                    'final': False,
-                },
-            )
-            return locked_request  # Still pending until final level passes.
-
-        # Final level approved — check for conflicts and fully approve.
-        conflicting_requests = _lock_queryset(
-            get_overlapping_requests(
-                facility=locked_request.facility,
-                start_datetime=locked_request.start_datetime,
-                end_datetime=locked_request.end_datetime,
-                statuses=[BookingRequest.STATUS_PENDING, BookingRequest.STATUS_APPROVED],
-            ).exclude(pk=locked_request.pk)
-        )
-        if conflicting_requests.filter(status=BookingRequest.STATUS_APPROVED).exists():
-            raise ValidationError('This booking conflicts with an already approved request.')
-
-        locked_request.approve(manager_user=acting_user)
-        pending_conflicts = list(conflicting_requests.filter(status=BookingRequest.STATUS_PENDING))
-        rejected_count = len(pending_conflicts)
-        rejection_reason = 'Another request for the same facility and time slot was approved.'
-        
-        for conflict in pending_conflicts:
-            conflict.reject(manager_user=acting_user, reason=rejection_reason)
-            log_activity(
-                user=acting_user,
-                action=ActivityLog.ACTION_BOOKING_REJECTED,
-                obj=conflict,
-                metadata={'reason': rejection_reason, 'auto_rejected': True},
-            )
-            # Notification suppressed for auto-rejected conflicts per Phase 5 spec.
+    Returns the primary keys of pending requests that were rejected automatically
+    because the request reached its final approval level.
+    """
+    _ensure_pending(locked_request)
+
+    # Get the current (topmost) pending ApprovalStep.
+    current_step = (
+        locked_request.approval_steps
+        .filter(status=ApprovalStep.STATUS_PENDING)
+        .order_by('level')
+        .first()
+    )
+    if not current_step:
+        raise ValidationError('No pending approval step found for this request.')
+
+    # Record the approval on this step.
+    current_step.status = ApprovalStep.STATUS_APPROVED
+    current_step.approver = acting_user
+    current_step.timestamp = timezone.now()
+    current_step.save(update_fields=['status', 'approver', 'timestamp'])
+
+    policy = get_or_create_policy(locked_request.facility)
+    required_levels = policy.required_approval_levels
 
+    if current_step.level < required_levels:
+        # More levels to go — create the next step and leave as pending.
+        ApprovalStep.objects.create(
+            booking_request=locked_request,
+            level=current_step.level + 1,
+            status=ApprovalStep.STATUS_PENDING,
+        )
         log_activity(
             user=acting_user,
             action=ActivityLog.ACTION_BOOKING_APPROVED,
             obj=locked_request,
-            metadata={'rejected_conflicts': rejected_count, 'final': True},
+            metadata={
+                'step_level': current_step.level,
+                'next_level': current_step.level + 1,
+                'final': False,
+            },
         )
-        send_booking_notification(locked_request, notification_events.BOOKING_APPROVED)
+        return []  # Still pending until final level passes.
+
+    # Final level approved — check for conflicts and fully approve.
+    conflicts = find_conflicts(
+        facility_id=locked_request.facility_id,
+        start_datetime=locked_request.start_datetime,
+        end_datetime=locked_request.end_datetime,
+        exclude_pk=locked_request.pk,
+        lock_queryset=_lock_queryset,
+    )
+    if conflicts.approved:
+        raise ValidationError('This booking conflicts with an already approved request.')
+
+    locked_request.approve(manager_user=acting_user)
+    # Reject overlapping pending requests in bulk; their requesters are notified.
+    rejected_count = _auto_reject_conflicts(
+        locked_request,
+        conflict_pks=conflicts.pending_pks,
+        acting_user=acting_user,
+    )
+
+    log_activity(
+        user=acting_user,
+        action=ActivityLog.ACTION_BOOKING_APPROVED,
+        obj=locked_request,
+        metadata={'rejected_conflicts': rejected_count, 'final': True},
+    )
+    send_booking_notification(locked_request, notification_events.BOOKING_APPROVED)
+    return conflicts.pending_pks
+
+
+def _reject_locked_request(locked_request, acting_user, reason=''):
+    """Reject the current step of a request the caller has already locked."""
+    _ensure_pending(locked_request)
+
+    # Mark the current pending step as rejected.
+    current_step = (
+        locked_request.approval_steps
+        .filter(status=ApprovalStep.STATUS_PENDING)
+        .order_by('level')
+        .first()
+    )
+    if current_step:
+        current_step.status = ApprovalStep.STATUS_REJECTED
+        current_step.approver = acting_user
+        current_step.comment = reason
+        current_step.timestamp = timezone.now()
+        current_step.save(update_fields=['status', 'approver', 'comment', 'timestamp'])
+
+    locked_request.reject(manager_user=acting_user, reason=reason)
+    log_activity(
+        user=acting_user,
+        action=ActivityLog.ACTION_BOOKING_REJECTED,
+        obj=locked_request,
+        metadata={'reason': reason},
+    )
+    send_booking_notification(locked_request, notification_events.BOOKING_REJECTED)
+
+
+@profile_span('bookings.approve')
+def approve_booking_request(*, booking_request, acting_user):
+    """
+    Approve the current pending ApprovalStep.
+
+    Single-level (default): marks BookingRequest as APPROVED immediately.
+    Multi-level: advances the chain. Only marks BookingRequest as APPROVED
+    when the final level is reached.
+    """
+    with transaction.atomic():
+        locked_request = _lock_booking_request(booking_request)
+        _require_facility_manager(locked_request, acting_user)
+        _approve_locked_request(locked_request, acting_user)
         return locked_request
 
 
+@profile_span('bookings.reject')
 def reject_booking_request(*, booking_request, acting_user, reason=''):
     """Reject a pending booking request at the current approval level."""
     with transaction.atomic():
-        locked_request = _lock_queryset(
-            BookingRequest.objects.select_related('facility', 'user').filter(pk=booking_request.pk)
-        ).get()
+        locked_request = _lock_booking_request(booking_request)
         _require_facility_manager(locked_request, acting_user)
+        _reject_locked_request(locked_request, acting_user, reason=reason)
+        return locked_request
 
-        if locked_request.status != BookingRequest.STATUS_PENDING:
-            raise ValidationError(
-                f'Request #{locked_request.pk} is already {locked_request.get_status_display().lower()}.'
-            )
 
-        # Mark the current pending step as rejected.
-        current_step = (
-            locked_request.approval_steps
-            .filter(status=ApprovalStep.STATUS_PENDING)
-            .order_by('level')
-            .first()
-        )
-        if current_step:
-            current_step.status = ApprovalStep.STATUS_REJECTED
-            current_step.approver = acting_user
-            current_step.comment = reason
-            current_step.timestamp = timezone.now()
-            current_step.save(update_fields=['status', 'approver', 'comment', 'timestamp'])
-
-        locked_request.reject(manager_user=acting_user, reason=reason)
-        log_activity(
-            user=acting_user,
-            action=ActivityLog.ACTION_BOOKING_REJECTED,
-            obj=locked_request,
-            metadata={'reason': reason},
+REVIEW_APPROVE = 'approve'
+REVIEW_REJECT = 'reject'
+
+BatchReviewResult = namedtuple('BatchReviewResult', ['booking_request', 'succeeded', 'message'])
+
+
+@profile_span('bookings.batch_review')
+def review_booking_requests(*, booking_requests, acting_user, action, reason=''):
+    """
+    Approve or reject several booking requests in one transaction.
+
+    Requests are processed oldest first (by `created_at`) so that conflicts
+    between selected requests resolve the same way every time. All affected
+    request and facility rows are locked once up front, and each item runs in
+    its own savepoint so one failure does not undo the others.
+
+    Returns one `BatchReviewResult` per request, in processing order.
+    """
+    if action not in (REVIEW_APPROVE, REVIEW_REJECT):
+        raise ValueError(f'Unknown review action: {action!r}')
+
+    pks = [booking_request.pk for booking_request in booking_requests]
+    results = []
+    with transaction.atomic():
+        locked_requests = list(
+            _lock_queryset(
+                BookingRequest.objects
+                .select_related('facility', 'user')
+                .filter(pk__in=pks)
+                .order_by('created_at', 'pk')
+            )
         )
-        send_booking_notification(locked_request, notification_events.BOOKING_REJECTED)
-        return locked_request
+        facility_ids = sorted({locked_request.facility_id for locked_request in locked_requests})
+        if connection.features.has_select_for_update:
+            list(
+                Facility.objects.select_for_update()
+                .filter(pk__in=facility_ids)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+
+        access = load_permission_context(acting_user)
+        auto_rejected = set()
+        for locked_request in locked_requests:
+            if not access.manages(locked_request.facility):
+                message = f'Request #{locked_request.pk}: only the assigned facility manager can review this booking.'
+                results.append(BatchReviewResult(locked_request, False, message))
+                continue
+            if locked_request.pk in auto_rejected:
+                message = (
+                    f'Request #{locked_request.pk} was rejected automatically '
+                    'because a conflicting request was approved.'
+                )
+                results.append(BatchReviewResult(locked_request, False, message))
+                continue
+
+            try:
+                with transaction.atomic():
+                    if action == REVIEW_APPROVE:
+                        auto_rejected.update(_approve_locked_request(locked_request, acting_user))
+                    else:
+                        _reject_locked_request(locked_request, acting_user, reason=reason)
+            except ValidationError as exc:
+                # The savepoint rolled back, but the in-memory instance may
+                # already carry the new status.
+                locked_request.refresh_from_db(fields=['status'])
+                results.append(BatchReviewResult(locked_request, False, f'Request #{locked_request.pk}: {exc.messages[0]}'))
+                continue
+
+            if action == REVIEW_REJECT:
+                message = f'Request #{locked_request.pk} has been rejected.'
+            elif locked_request.status == BookingRequest.STATUS_APPROVED:
+                message = f'Request #{locked_request.pk} fully approved.'
+            else:
+                message = f'Request #{locked_request.pk}: approved at the current level, awaiting the next level.'
+            results.append(BatchReviewResult(locked_request, True, message))
+
+    return results
 
 
 def withdraw_booking_request(*, booking_request, acting_user):
@@ -2,21 +2,38 @@ from datetime import datetime, time, timedelta
 
 from django.contrib.auth.models import User
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
 from core.models import ActivityLog
+from core.testing import QueryCheckingClient
 from facilities.models import Facility
 
-from .models import BookingRequest
+from .conflicts import IndexedBooking, IntervalIndex, find_conflicts
+from .models import ApprovalStep, BookingRequest, RecurringRule
+from .pagination import keyset_page
+from .recurrence import (
+    COLLISION_BOOKED,
+    COLLISION_USER_LIMIT,
+    generate_occurrences,
+    submit_recurring_booking_request,
+)
 from .services import (
+    REVIEW_APPROVE,
+    REVIEW_REJECT,
     approve_booking_request,
     reject_booking_request,
+    review_booking_requests,
     submit_booking_request,
 )
 
 
 class BookingServiceTests(TestCase):
+    client_class = QueryCheckingClient
+
     def setUp(self):
         self.student = User.objects.create_user(username='student', password='test123')
         self.manager = User.objects.create_user(username='manager', password='test123')
@@ -44,13 +61,14 @@ class BookingServiceTests(TestCase):
         )
 
     def test_submit_booking_request_creates_pending_booking_and_log(self):
-        booking = submit_booking_request(
-            user=self.student,
-            facility=self.facility,
-            start_datetime=self.make_datetime(1, 10),
-            end_datetime=self.make_datetime(1, 11),
-            purpose='Data structures lab',
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = submit_booking_request(
+                user=self.student,
+                facility=self.facility,
+                start_datetime=self.make_datetime(1, 10),
+                end_datetime=self.make_datetime(1, 11),
+                purpose='Data structures lab',
+            )
 
         self.assertEqual(booking.status, BookingRequest.STATUS_PENDING)
         self.assertTrue(
@@ -142,6 +160,183 @@ class BookingServiceTests(TestCase):
                 purpose='Third booking',
             )
 
+    def test_submit_booking_request_runs_a_fixed_number_of_queries(self):
+        other_user = User.objects.create_user(username='other', password='test123')
+        submit_booking_request(
+            user=other_user,
+            facility=self.facility,
+            start_datetime=self.make_datetime(9, 10),
+            end_datetime=self.make_datetime(9, 11),
+            purpose='Existing request',
+        )
+
+        # Savepoint, validation aggregate, booking, approval step, release; the audit log waits for commit.
+        with self.assertNumQueries(5):
+            submit_booking_request(
+                user=self.student,
+                facility=self.facility,
+                start_datetime=self.make_datetime(9, 10),
+                end_datetime=self.make_datetime(9, 11),
+                purpose='Second request for the slot',
+            )
+
+    def test_submit_reports_the_approved_conflict_window(self):
+        booking = submit_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(10, 14),
+            end_datetime=self.make_datetime(10, 15),
+            purpose='Seminar',
+        )
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+        other_user = User.objects.create_user(username='other', password='test123')
+
+        with self.assertRaisesMessage(ValidationError, 'already booked from 14:00 to 15:00'):
+            submit_booking_request(
+                user=other_user,
+                facility=self.facility,
+                start_datetime=self.make_datetime(10, 14, 30),
+                end_datetime=self.make_datetime(10, 15, 30),
+                purpose='Overlapping seminar',
+            )
+
+    def submit_competing_requests(self, count, days_from_now):
+        self.facility.max_pending_requests = count + 1
+        self.facility.save(update_fields=['max_pending_requests'])
+        requests = []
+        for index in range(count):
+            user = User.objects.create_user(username=f'queue_{days_from_now}_{index}')
+            requests.append(submit_booking_request(
+                user=user,
+                facility=self.facility,
+                start_datetime=self.make_datetime(days_from_now, 12),
+                end_datetime=self.make_datetime(days_from_now, 13),
+                purpose='Queued request',
+            ))
+        return requests
+
+    def test_approval_bulk_rejects_conflicts_and_their_open_steps(self):
+        winner, *conflicts = self.submit_competing_requests(4, days_from_now=11)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_booking_request(booking_request=winner, acting_user=self.manager)
+
+        conflict_pks = [conflict.pk for conflict in conflicts]
+        rejected = BookingRequest.objects.filter(pk__in=conflict_pks)
+        self.assertTrue(all(
+            booking.status == BookingRequest.STATUS_REJECTED and booking.reviewed_by == self.manager
+            for booking in rejected
+        ))
+        self.assertFalse(
+            ApprovalStep.objects.filter(
+                booking_request_id__in=conflict_pks,
+                status=ApprovalStep.STATUS_PENDING,
+            ).exists()
+        )
+        self.assertEqual(
+            ActivityLog.objects.filter(
+                action=ActivityLog.ACTION_BOOKING_REJECTED,
+                object_id__in=conflict_pks,
+                metadata__auto_rejected=True,
+            ).count(),
+            len(conflicts),
+        )
+
+    def test_approval_query_count_does_not_grow_with_pending_queue(self):
+        small_winner, *_ = self.submit_competing_requests(2, days_from_now=12)
+        large_winner, *_ = self.submit_competing_requests(12, days_from_now=13)
+
+        # Commit callbacks run inside the block, so the single audit INSERT and the
+        # availability refresh are counted too.
+        with self.assertNumQueries(15) as small, self.captureOnCommitCallbacks(execute=True):
+            approve_booking_request(booking_request=small_winner, acting_user=self.manager)
+        with self.assertNumQueries(len(small)), self.captureOnCommitCallbacks(execute=True):
+            approve_booking_request(booking_request=large_winner, acting_user=self.manager)
+
+    def test_review_checks_current_rights_of_a_long_lived_user(self):
+        booking = self.submit_competing_requests(1, days_from_now=12)[0]
+        self.assertTrue(booking.facility.is_managed_by(self.manager))
+
+        self.facility.managers.remove(self.manager)
+
+        with self.assertRaises(PermissionDenied):
+            approve_booking_request(booking_request=booking, acting_user=self.manager)
+
+    def test_batch_review_resolves_conflicts_oldest_first(self):
+        older, newer = self.submit_competing_requests(2, days_from_now=14)
+        other_facility = Facility.objects.create(name='Gym', facility_type='sports', capacity=30)
+        foreign = submit_booking_request(
+            user=self.student,
+            facility=other_facility,
+            start_datetime=self.make_datetime(14, 12),
+            end_datetime=self.make_datetime(14, 13),
+            purpose='Not managed by this manager',
+        )
+
+        results = review_booking_requests(
+            booking_requests=[newer, foreign, older],
+            acting_user=self.manager,
+            action=REVIEW_APPROVE,
+        )
+
+        self.assertEqual(
+            [(result.booking_request.pk, result.succeeded) for result in results],
+            [(older.pk, True), (newer.pk, False), (foreign.pk, False)],
+        )
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual(older.status, BookingRequest.STATUS_APPROVED)
+        self.assertEqual(newer.status, BookingRequest.STATUS_REJECTED)
+        self.assertEqual(foreign.status, BookingRequest.STATUS_PENDING)
+
+    def test_batch_review_writes_its_audit_entries_with_one_insert(self):
+        pending = self.submit_competing_requests(3, days_from_now=11)
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            review_booking_requests(booking_requests=pending, acting_user=self.manager, action=REVIEW_REJECT)
+
+        audit_inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_activitylog"')]
+        self.assertEqual(len(audit_inserts), 1)
+        self.assertEqual(ActivityLog.objects.filter(action=ActivityLog.ACTION_BOOKING_REJECTED).count(), 3)
+
+    def test_batch_review_view_rejects_selected_requests(self):
+        first, second = self.submit_competing_requests(2, days_from_now=13)
+        self.client.force_login(self.manager)
+
+        response = self.client.post(reverse('bookings:admin_batch_review'), {
+            'request_ids': [first.pk, second.pk],
+            'action': REVIEW_REJECT,
+            'reason': 'Room closed for exams',
+        })
+
+        self.assertRedirects(response, reverse('bookings:admin_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(
+            set(BookingRequest.objects.filter(pk__in=[first.pk, second.pk]).values_list('rejection_reason', flat=True)),
+            {'Room closed for exams'},
+        )
+
+    def test_batch_review_view_returns_to_the_same_dashboard_page(self):
+        first, second = self.submit_competing_requests(2, days_from_now=13)
+        self.client.force_login(self.manager)
+        cursor = keyset_page(BookingRequest.objects.all(), per_page=1).next_cursor
+        dashboard_query = f'facility={self.facility.pk}&pending_after={cursor}'
+
+        response = self.client.get(f'{reverse("bookings:admin_dashboard")}?{dashboard_query}')
+        self.assertEqual(response.context['batch_form']['dashboard_query'].value(), dashboard_query)
+
+        response = self.client.post(reverse('bookings:admin_batch_review'), {
+            'request_ids': [first.pk],
+            'action': REVIEW_APPROVE,
+            'dashboard_query': dashboard_query,
+        })
+
+        self.assertRedirects(
+            response,
+            f'{reverse("bookings:admin_dashboard")}?{dashboard_query}',
+            fetch_redirect_response=False,
+        )
+
     def test_reject_booking_request_updates_status(self):
         booking = submit_booking_request(
             user=self.student,
@@ -160,3 +355,267 @@ class BookingServiceTests(TestCase):
 
         self.assertEqual(booking.status, BookingRequest.STATUS_REJECTED)
         self.assertEqual(booking.rejection_reason, 'Maintenance window')
+
+
+class ConflictIndexTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='test123')
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(
+            name='Seminar Hall',
+            facility_type='hall',
+            capacity=80,
+            open_time='08:00',
+            close_time='20:00',
+            max_pending_requests=5,
+        )
+        self.facility.managers.add(self.manager)
+
+    def make_datetime(self, days_from_now, hour, minute=0):
+        booking_date = timezone.localdate() + timedelta(days=days_from_now)
+        return timezone.make_aware(
+            datetime.combine(booking_date, time(hour=hour, minute=minute)),
+            timezone.get_current_timezone(),
+        )
+
+    def test_day_index_classifies_overlaps_by_status(self):
+        index = IntervalIndex([
+            IndexedBooking(1, self.make_datetime(1, 8), self.make_datetime(1, 12), BookingRequest.STATUS_APPROVED),
+            IndexedBooking(2, self.make_datetime(1, 13), self.make_datetime(1, 14), BookingRequest.STATUS_PENDING),
+            IndexedBooking(3, self.make_datetime(1, 13, 30), self.make_datetime(1, 15), BookingRequest.STATUS_PENDING),
+            IndexedBooking(4, self.make_datetime(1, 16), self.make_datetime(1, 17), BookingRequest.STATUS_PENDING),
+        ])
+
+        summary = index.classify(self.make_datetime(1, 11), self.make_datetime(1, 14))
+        self.assertEqual([booking.pk for booking in summary.approved], [1])
+        self.assertEqual(summary.pending_pks, [2, 3])
+
+        summary = index.classify(self.make_datetime(1, 12), self.make_datetime(1, 13))
+        self.assertIsNone(summary.approved_conflict)
+        self.assertEqual(summary.pending_count, 0)
+
+        summary = index.classify(self.make_datetime(1, 13), self.make_datetime(1, 15), exclude_pk=2)
+        self.assertEqual(summary.pending_pks, [3])
+
+    def test_conflicts_are_read_from_the_database_in_one_query(self):
+        booking = submit_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(2, 10),
+            end_datetime=self.make_datetime(2, 11),
+            purpose='Guest lecture',
+        )
+        with self.assertNumQueries(1):
+            summary = find_conflicts(
+                facility_id=self.facility.pk,
+                start_datetime=self.make_datetime(2, 10),
+                end_datetime=self.make_datetime(2, 11),
+            )
+        self.assertEqual(summary.pending_pks, [booking.pk])
+
+        # A status change made behind the service layer is seen straight away.
+        BookingRequest.objects.filter(pk=booking.pk).update(status=BookingRequest.STATUS_APPROVED)
+
+        summary = find_conflicts(
+            facility_id=self.facility.pk,
+            start_datetime=booking.start_datetime,
+            end_datetime=booking.end_datetime,
+        )
+        self.assertEqual([entry.pk for entry in summary.approved], [booking.pk])
+        self.assertEqual(summary.pending_count, 0)
+
+
+class RecurringBookingTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='test123')
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(
+            name='Physics Lab',
+            facility_type='lab',
+            capacity=30,
+            open_time='08:00',
+            close_time='20:00',
+        )
+        self.facility.managers.add(self.manager)
+
+    def make_datetime(self, days_from_now, hour):
+        booking_date = timezone.localdate() + timedelta(days=days_from_now)
+        return timezone.make_aware(
+            datetime.combine(booking_date, time(hour=hour)),
+            timezone.get_current_timezone(),
+        )
+
+    def test_monthly_occurrences_skip_missing_days(self):
+        start = timezone.make_aware(datetime(2031, 1, 31, 9), timezone.get_current_timezone())
+        occurrences = generate_occurrences(
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=1),
+            frequency=RecurringRule.MONTHLY,
+            until_date=datetime(2031, 5, 31).date(),
+        )
+
+        self.assertEqual(
+            [timezone.localtime(occurrence.start_datetime).date().month for occurrence in occurrences],
+            [1, 3, 5],
+        )
+
+    def test_weekly_rule_creates_available_occurrences_and_reports_collisions(self):
+        blocker = submit_booking_request(
+            user=User.objects.create_user(username='blocker'),
+            facility=self.facility,
+            start_datetime=self.make_datetime(8, 10),
+            end_datetime=self.make_datetime(8, 11),
+            purpose='Existing booking',
+        )
+        approve_booking_request(booking_request=blocker, acting_user=self.manager)
+
+        expansion = submit_recurring_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 10),
+            end_datetime=self.make_datetime(1, 11),
+            purpose='Weekly tutorial',
+            frequency=RecurringRule.WEEKLY,
+            until_date=timezone.localdate() + timedelta(days=22),
+        )
+
+        self.assertEqual([booking.date for booking in expansion.created], [
+            timezone.localdate() + timedelta(days=offset) for offset in (1, 15, 22)
+        ])
+        self.assertEqual(
+            [(collision.start_datetime, collision.code) for collision in expansion.collisions],
+            [(self.make_datetime(8, 10), COLLISION_BOOKED)],
+        )
+        self.assertEqual(expansion.rule.booking_request, expansion.created[0])
+        self.assertEqual(
+            ApprovalStep.objects.filter(
+                booking_request__in=expansion.created,
+                level=1,
+                status=ApprovalStep.STATUS_PENDING,
+            ).count(),
+            3,
+        )
+
+    def test_every_occurrence_counts_towards_the_active_booking_limit(self):
+        submit_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 8),
+            end_datetime=self.make_datetime(1, 9),
+            purpose='Existing booking',
+        )
+
+        expansion = submit_recurring_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, 10),
+            end_datetime=self.make_datetime(1, 11),
+            purpose='Daily revision',
+            frequency=RecurringRule.DAILY,
+            until_date=timezone.localdate() + timedelta(days=5),
+        )
+
+        self.assertEqual(len(expansion.created), 2)
+        self.assertEqual(
+            [collision.code for collision in expansion.collisions],
+            [COLLISION_USER_LIMIT] * 3,
+        )
+        self.assertEqual(expansion.collisions[0].reason, 'Over your limit of 3 active booking(s).')
+        self.assertEqual(
+            set(expansion.rule.occurrences.values_list('pk', flat=True)),
+            {booking.pk for booking in expansion.created},
+        )
+
+
+class BookingViewQueryTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(
+            name='Seminar Hall',
+            facility_type='hall',
+            capacity=80,
+            open_time='08:00',
+            close_time='20:00',
+            max_pending_requests=10,
+        )
+        self.facility.managers.add(self.manager)
+        self.requests = []
+        for index in range(8):
+            start = timezone.make_aware(
+                datetime.combine(timezone.localdate() + timedelta(days=index + 1), time(hour=10)),
+                timezone.get_current_timezone(),
+            )
+            self.requests.append(submit_booking_request(
+                user=User.objects.create_user(username=f'student_{index}', password='test123'),
+                facility=self.facility,
+                start_datetime=start,
+                end_datetime=start + timedelta(hours=1),
+                purpose='Study group',
+            ))
+        for booking in self.requests[:2]:
+            approve_booking_request(booking_request=booking, acting_user=self.manager)
+        reject_booking_request(booking_request=self.requests[2], acting_user=self.manager, reason='Closed')
+
+    def test_admin_dashboard_does_not_query_per_row(self):
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('bookings:admin_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'student_7')
+        self.assertContains(response, '<option value="reject">Reject selected</option>', html=True)
+
+    def test_my_requests_and_detail_do_not_query_per_row(self):
+        owner = self.requests[0].user
+        self.client.force_login(owner)
+
+        self.assertEqual(self.client.get(reverse('bookings:my_requests')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('bookings:detail', args=[self.requests[0].pk])).status_code, 200)
+
+    @override_settings(ADMIN_DASHBOARD={'PAGE_SIZE': 2, 'COUNT_LIMIT': 3})
+    def test_admin_dashboard_queues_page_by_keyset(self):
+        # Identical timestamps leave the id as the only tiebreaker.
+        BookingRequest.objects.update(created_at=timezone.now())
+        self.client.force_login(self.manager)
+        expected = list(
+            BookingRequest.objects.filter(status=BookingRequest.STATUS_PENDING)
+            .order_by('-created_at', '-pk').values_list('pk', flat=True)
+        )
+
+        url, pages, query_counts = reverse('bookings:admin_dashboard'), [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_counts.append(len(queries))
+            pages.append([booking.pk for booking in response.context['pending_requests']])
+            next_url = response.context['pending_next_url']
+            url = next_url and reverse('bookings:admin_dashboard') + next_url
+
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:5]])
+        self.assertEqual(len(set(query_counts)), 1)
+        self.assertEqual(str(response.context['pending_count']), '3+')
+        self.assertEqual(str(response.context['reviewed_count']), '3')
+        self.assertEqual(str(response.context['total_count']), '6+')
+
+        previous = self.client.get(reverse('bookings:admin_dashboard') + response.context['pending_previous_url'])
+        self.assertEqual([booking.pk for booking in previous.context['pending_requests']], expected[2:4])
+        first = self.client.get(reverse('bookings:admin_dashboard') + previous.context['pending_previous_url'])
+        self.assertEqual([booking.pk for booking in first.context['pending_requests']], expected[0:2])
+        self.assertIsNone(first.context['pending_previous_url'])
+
+    def test_cursor_pages_keep_the_other_queue_and_filters(self):
+        self.client.force_login(self.manager)
+        pending = BookingRequest.objects.filter(status=BookingRequest.STATUS_PENDING)
+        cursor = keyset_page(pending, per_page=1).next_cursor
+
+        response = self.client.get(reverse('bookings:admin_dashboard'), {
+            'facility': self.facility.pk, 'pending_after': cursor, 'reviewed_after': 'not-a-cursor',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['reviewed_requests']), 3)
+        self.assertIn(f'facility={self.facility.pk}', response.context['pending_previous_url'])
+        self.assertIn('reviewed_after=not-a-cursor', response.context['pending_previous_url'])
+        self.assertNotIn('pending_after', response.context['pending_previous_url'])
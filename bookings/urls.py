@@ -14,5 +14,6 @@ urlpatterns = [
     path('admin/',                  views.admin_dashboard, name='admin_dashboard'),
     path('admin/<int:pk>/approve/', views.admin_approve,   name='admin_approve'),
     path('admin/<int:pk>/reject/',  views.admin_reject,    name='admin_reject'),
+    path('admin/batch-review/',     views.admin_batch_review, name='admin_batch_review'),
 ]
 
@@ -1,16 +1,23 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import QueryDict
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.dateparse import parse_date
 
+from core.utils import local_date_bounds
 from facilities.models import Facility
+from facilities.services import filter_visible_facilities
 from users.decorators import facility_manager_required
 
-from .forms import BookingRequestForm, RejectRequestForm
+from .forms import BatchReviewForm, BookingRequestForm, RejectRequestForm
 from .models import BookingRequest
+from .pagination import estimate_count, get_dashboard_settings, keyset_page
 from .services import (
     approve_booking_request,
     reject_booking_request,
+    review_booking_requests,
     submit_booking_request,
     withdraw_booking_request,
 )
@@ -71,12 +78,9 @@ def request_detail(request, pk):
         .prefetch_related('approval_steps__approver'),
         pk=pk,
     )
+    # Covers assigned managers, department admins of the facility and system admins.
     can_manage_booking = booking_request.facility.is_managed_by(request.user)
-    is_dept_admin_for_facility = (
-        request.user.profile.is_dept_admin() and 
-        booking_request.facility.department == request.user.profile.department
-    )
-    if booking_request.user != request.user and not can_manage_booking and not is_dept_admin_for_facility:
+    if booking_request.user != request.user and not can_manage_booking:
         messages.error(request, 'You do not have permission to view this request.')
         return redirect('bookings:my_requests')
 
@@ -110,22 +114,38 @@ def request_withdraw(request, pk):
     return render(request, 'bookings/confirm_withdraw.html', {'br': booking_request})
 
 
+def _queue_page_url(request, queue, direction, cursor):
+    """Query string for another page of one dashboard queue, keeping the filters and the other queue's page."""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop(f'{queue}_after', None)
+    params.pop(f'{queue}_before', None)
+    params[f'{queue}_{direction}'] = cursor
+    return f'?{params.urlencode()}'
+
+
+def _dashboard_redirect(request):
+    """Redirect back to the dashboard with the filters and cursors posted by the batch form."""
+    query = QueryDict(request.POST.get('dashboard_query', '')).urlencode()
+    url = reverse('bookings:admin_dashboard')
+    return redirect(f'{url}?{query}' if query else url)
+
+
 @facility_manager_required
 def admin_dashboard(request):
-    """Manager dashboard for reviewing booking requests in managed facilities."""
+    """
+    Manager dashboard for reviewing booking requests in managed facilities.
+
+    The pending and reviewed queues are paged independently with keyset
+    cursors (`pending_after`/`pending_before`, `reviewed_after`/`reviewed_before`).
+    """
 
     all_requests = BookingRequest.objects.select_related(
-        'user', 'facility', 'reviewed_by'
+        'user__profile', 'facility', 'reviewed_by'
     ).prefetch_related('approval_steps')
-    facilities = Facility.objects.filter(is_active=True)
-    if request.user.profile.is_sys_admin():
-        pass
-    elif request.user.profile.is_dept_admin():
-        all_requests = all_requests.filter(facility__department=request.user.profile.department)
-        facilities = facilities.filter(department=request.user.profile.department)
-    else:
-        all_requests = all_requests.filter(facility__managers=request.user)
-        facilities = facilities.filter(managers=request.user)
+    all_requests = filter_visible_facilities(all_requests, request.user)
+    facilities = filter_visible_facilities(Facility.objects.filter(is_active=True), request.user, field='pk')
 
     facility_id = request.GET.get('facility', '')
     filter_date = request.GET.get('date', '')
@@ -133,17 +153,38 @@ def admin_dashboard(request):
 
     if facility_id:
         all_requests = all_requests.filter(facility_id=facility_id)
-    if filter_date:
-        all_requests = all_requests.filter(start_datetime__date=filter_date)
+    try:
+        parsed_date = parse_date(filter_date)
+    except ValueError:
+        parsed_date = None
+    if parsed_date:
+        day_start, day_end = local_date_bounds(parsed_date)
+        all_requests = all_requests.filter(start_datetime__gte=day_start, start_datetime__lt=day_end)
     if filter_status:
         all_requests = all_requests.filter(status=filter_status)
 
-    pending_requests = all_requests.filter(status=BookingRequest.STATUS_PENDING)
-    reviewed_requests = all_requests.exclude(status=BookingRequest.STATUS_PENDING)
+    dashboard_settings = get_dashboard_settings()
+    queues = {
+        'pending': all_requests.filter(status=BookingRequest.STATUS_PENDING),
+        'reviewed': all_requests.exclude(status=BookingRequest.STATUS_PENDING),
+    }
+    context = {}
+    for name, queryset in queues.items():
+        page = keyset_page(
+            queryset,
+            after=request.GET.get(f'{name}_after'),
+            before=request.GET.get(f'{name}_before'),
+            per_page=dashboard_settings['PAGE_SIZE'],
+        )
+        context[f'{name}_requests'] = page.items
+        context[f'{name}_count'] = estimate_count(queryset, limit=dashboard_settings['COUNT_LIMIT'])
+        context[f'{name}_next_url'] = _queue_page_url(request, name, 'after', page.next_cursor)
+        context[f'{name}_previous_url'] = _queue_page_url(request, name, 'before', page.previous_cursor)
 
     return render(request, 'bookings/admin_dashboard.html', {
-        'pending_requests': pending_requests,
-        'reviewed_requests': reviewed_requests,
+        **context,
+        'total_count': context['pending_count'] + context['reviewed_count'],
+        'batch_form': BatchReviewForm(initial={'dashboard_query': request.GET.urlencode()}),
         'facilities': facilities,
         'status_choices': BookingRequest.STATUS_CHOICES,
         'filter_facility': facility_id,
@@ -205,3 +246,31 @@ def admin_reject(request, pk):
             return redirect('bookings:admin_dashboard')
 
     return render(request, 'bookings/confirm_reject.html', {'br': booking_request, 'form': form})
+
+
+@facility_manager_required
+def admin_batch_review(request):
+    """Approve or reject all selected pending requests in one transaction."""
+
+    if request.method != 'POST':
+        return redirect('bookings:admin_dashboard')
+
+    form = BatchReviewForm(request.POST)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            messages.warning(request, errors[0])
+        return _dashboard_redirect(request)
+
+    results = review_booking_requests(
+        booking_requests=form.cleaned_data['request_ids'],
+        acting_user=request.user,
+        action=form.cleaned_data['action'],
+        reason=form.cleaned_data['reason'],
+    )
+    for result in results:
+        if result.succeeded:
+            messages.success(request, result.message)
+        else:
+            messages.warning(request, result.message)
+
+    return _dashboard_redirect(request)
@@ -27,6 +27,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its timings cover every other middleware; inactive unless REQUEST_PROFILING is enabled.
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,7 +42,8 @@ ROOT_URLCONF = 'campus_booking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for sampled requests (core/profiling.py).
+        'BACKEND': 'core.profiling.ProfilingDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -48,6 +51,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'users.context_processors.access',
             ],
         },
     },
@@ -67,6 +71,31 @@ DATABASES = {
 }
 
 
+# ─── Cache ─────────────────────────────────────────────────────────────────────
+# Holds the per-(facility, date) availability bitmaps read by the facility list.
+# Bitmaps are rebuilt on every booking write, but only in the cache of the
+# process that made the write. Local memory is therefore only correct for a
+# single process; prod.py switches to a shared Redis cache when one is
+# configured and otherwise shortens AVAILABILITY_CACHE_TIMEOUT.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # One entry per facility-day: room for 200 facilities over a 60-day horizon.
+        'OPTIONS': {'MAX_ENTRIES': 12000},
+    }
+}
+
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+
+# Department admins' visible-facility sets (facilities/services.py). They are
+# invalidated only in the cache of the process that changed a facility,
+# manager or profile, so without a shared cache another worker could keep
+# showing a department admin a scope they no longer have. 0 keeps the sets
+# for the current request only.
+SCOPE_CACHE_TIMEOUT = 5 * 60  # seconds
+
+
 # ─── Authentication ────────────────────────────────────────────────────────────
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -125,10 +154,64 @@ DEFAULT_FROM_EMAIL = 'Campus Booking <noreply@campus.example.com>'
 
 NOTIFICATIONS_ENABLED = True
 
+# Requests rejected automatically because a conflicting one was approved are
+# not notified (Phase 5 spec). Set True to mail those requesters too.
+NOTIFY_AUTO_REJECTED_REQUESTS = False
+
+# Delivery settings for the notification outbox worker (manage.py send_notifications).
+NOTIFICATION_OUTBOX = {
+    'BATCH_SIZE': 100,              # messages claimed per transaction
+    'MAX_ATTEMPTS': 5,              # give up on a message after this many failures
+    'RETRY_BACKOFF_SECONDS': 60,    # doubled after each failure...
+    'MAX_BACKOFF_SECONDS': 60 * 60, # ...up to this ceiling
+    'DIGEST_WINDOW_SECONDS': 0,     # >0 holds new mail this long and sends one digest per recipient
+}
+
+
+# ─── Audit Log ─────────────────────────────────────────────────────────────────
+# core.services.log_activity buffers entries and writes them with one INSERT
+# when the outermost transaction commits. Strict-audit deployments can set
+# SYNCHRONOUS to write each entry inside the transaction instead.
+# `manage.py archive_activity_logs` moves entries older than RETENTION_DAYS
+# into monthly gzipped JSONL files.
+ACTIVITY_LOG = {
+    'SYNCHRONOUS': False,
+    'RETENTION_DAYS': 365,
+}
+
+
+# ─── Request Profiling ─────────────────────────────────────────────────────────
+# core.profiling.ProfilingMiddleware adds a Server-Timing header and logs one
+# JSON line per sampled request (DB queries, template render time, named spans).
+REQUEST_PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,   # fraction of requests profiled when enabled
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
+# ─── Manager Dashboard ─────────────────────────────────────────────────────────
+# bookings/pagination.py pages both dashboard queues with keyset cursors.
+# Queue sizes are counted up to COUNT_LIMIT and shown as "1000+" beyond it;
+# None counts exactly.
+ADMIN_DASHBOARD = {
+    'PAGE_SIZE': 20,
+    'COUNT_LIMIT': 1000,
+}
+
 
 # ─── Recurring Bookings ────────────────────────────────────────────────────────
-# Future feature stub. Activate by implementing RecurringRule in bookings/models.py
-# and setting RECURRENCE_ENABLED = True here.
+# Used by bookings/recurrence.py when expanding a RecurringRule into requests.
 #
 RECURRENCE_SETTINGS = {
     'ENABLED': True,
@@ -8,6 +8,9 @@ Required env vars:
 
 Optional env vars for SMTP email:
     EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS
+
+Optional env var for the shared cache (needs the `redis` package):
+    DJANGO_REDIS_URL    — e.g. "redis://cache.internal:6379/1"
 """
 
 import os
@@ -26,6 +29,24 @@ ALLOWED_HOSTS = [
 ]
 
 
+# ── Cache ──────────────────────────────────────────────────────────────────────
+# Availability bitmaps must be shared by every worker, or workers that did not
+# handle a booking write keep serving the old availability. Without Redis each
+# worker keeps its own cache, so bitmaps expire after a few minutes instead and
+# facility scopes are not cached across requests at all.
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+else:
+    AVAILABILITY_CACHE_TIMEOUT = 5 * 60  # seconds
+    # Stale scopes would leak other departments' bookings; recompute them per request.
+    SCOPE_CACHE_TIMEOUT = 0
+
+
 # ── Security headers ───────────────────────────────────────────────────────────
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -47,8 +68,14 @@ X_FRAME_OPTIONS = 'DENY'
 # EMAIL_HOST_USER = os.environ['EMAIL_HOST_USER']
 # EMAIL_HOST_PASSWORD = os.environ['EMAIL_HOST_PASSWORD']
 # NOTIFICATIONS_ENABLED = True   # flip this to activate notifications/service.py
+# Run `python manage.py send_notifications --loop` alongside the web process to deliver mail.
 
 
 # ── Static files ───────────────────────────────────────────────────────────────
 # Run `python manage.py collectstatic` before deploying.
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # noqa: F405
+
+
+# ── Request profiling ──────────────────────────────────────────────────────────
+# Profile a small sample of live traffic; see core/profiling.py.
+# REQUEST_PROFILING = {'ENABLED': True, 'SAMPLE_RATE': 0.01}
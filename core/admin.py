@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import ActivityLog
+from .purge import purge_activity_logs
 
 
 @admin.register(ActivityLog)
@@ -23,6 +24,8 @@ class ActivityLogAdmin(admin.ModelAdmin):
     @admin.action(description="⚠️ Clear ALL Audit Logs (Ignores selection)")
     def clear_all_logs(self, request, queryset):
         # Delete every single log in the table regardless of what checkboxes were clicked
-        filter_count = ActivityLog.objects.all().count()
-        ActivityLog.objects.all().delete()
-        self.message_user(request, f"Successfully wiped all {filter_count} audit logs.", level='success')
+        result = purge_activity_logs()
+        if result.truncated:
+            self.message_user(request, "Successfully wiped all audit logs.", level='success')
+        else:
+            self.message_user(request, f"Successfully wiped all {result.deleted} audit logs.", level='success')
@@ -0,0 +1,82 @@
+"""
+Archival of old activity log entries.
+
+Entries older than the retention window are read in primary-key order, one
+chunk at a time, and appended to one gzip-compressed JSONL file per local
+calendar month (`activity-log-2026-03.jsonl.gz`). A chunk is deleted only
+after its lines are written and the files closed, so an interrupted run loses
+nothing; running it again may repeat the last chunk in the archive.
+"""
+
+import gzip
+import json
+from collections import namedtuple
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from core.models import ActivityLog
+from core.services import get_activity_log_settings
+
+ARCHIVE_CHUNK_SIZE = 5000
+ARCHIVE_FIELDS = ('id', 'timestamp', 'user_id', 'action', 'object_type', 'object_id', 'metadata')
+ARCHIVE_FILENAME = 'activity-log-{month}.jsonl.gz'
+
+ArchiveResult = namedtuple('ArchiveResult', ['archived', 'files'])
+
+
+def retention_cutoff(days=None):
+    """Return the moment before which entries fall outside the retention window."""
+    if days is None:
+        days = get_activity_log_settings()['RETENTION_DAYS']
+    return timezone.now() - timedelta(days=days)
+
+
+def iter_archive_chunks(*, before, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Yield lists of entry dicts older than `before`, walking the primary key."""
+    queryset = ActivityLog.objects.filter(timestamp__lt=before).order_by('pk').values(*ARCHIVE_FIELDS)
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]['id']
+
+
+def _archive_month(row):
+    return timezone.localtime(row['timestamp']).strftime('%Y-%m')
+
+
+def archive_activity_logs(*, before, directory, chunk_size=ARCHIVE_CHUNK_SIZE, delete=True):
+    """
+    Move entries older than `before` into monthly archive files under `directory`.
+
+    With `delete=False` the entries are copied and left in place. Returns an
+    `ArchiveResult` with the number of entries archived and the files written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    archived = 0
+    files = set()
+
+    for chunk in iter_archive_chunks(before=before, chunk_size=chunk_size):
+        lines_by_month = {}
+        for row in chunk:
+            lines_by_month.setdefault(_archive_month(row), []).append(
+                json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+            )
+        for month, lines in lines_by_month.items():
+            path = directory / ARCHIVE_FILENAME.format(month=month)
+            # Appending adds a gzip member; readers see one continuous stream.
+            with gzip.open(path, 'at', encoding='utf-8') as archive:
+                archive.writelines(lines)
+            files.add(path)
+
+        if delete:
+            ActivityLog.objects.filter(pk__in=[row['id'] for row in chunk]).delete()
+        archived += len(chunk)
+
+    return ArchiveResult(archived, sorted(files))
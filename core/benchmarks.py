@@ -0,0 +1,158 @@
+"""
+Request-level benchmarks for the main pages.
+
+Each case requests one URL as a seeded user through the test client, timing
+the full response (streamed bodies included) and counting the queries it ran.
+Query counts are checked against the budgets committed in
+`core/benchmark_budgets.json`; they do not depend on the machine. Latency
+depends on the hardware, so p95 baselines are kept in a local, untracked
+file (`benchmark_timings.json` in the project root by default) recorded on
+the machine that runs the check, and p95 must stay within `time_tolerance`
+times its baseline.
+"""
+
+import json
+import math
+import time
+from collections import namedtuple
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+BUDGETS_PATH = Path(__file__).with_name('benchmark_budgets.json')
+TIMINGS_PATH = Path(settings.BASE_DIR) / 'benchmark_timings.json'
+DEFAULT_TIME_TOLERANCE = 1.5
+
+BenchmarkCase = namedtuple('BenchmarkCase', ['name', 'url', 'username'])
+BenchmarkResult = namedtuple('BenchmarkResult', ['name', 'status_code', 'queries', 'p50_ms', 'p95_ms'])
+
+
+def benchmark_cases(campus):
+    """Return the pages to benchmark, each requested as the role that normally uses it."""
+    today = timezone.localdate()
+    export_query = urlencode({
+        'format': 'csv',
+        'start': (today - timedelta(days=30)).isoformat(),
+        'end': today.isoformat(),
+    })
+    return [
+        BenchmarkCase('facility_list', reverse('facilities:list'), campus.requester),
+        BenchmarkCase('my_requests', reverse('bookings:my_requests'), campus.requester),
+        BenchmarkCase('calendar', reverse('core:calendar'), campus.requester),
+        BenchmarkCase('admin_dashboard', reverse('bookings:admin_dashboard'), campus.manager),
+        BenchmarkCase('analytics_dashboard', reverse('analytics:dashboard'), campus.sys_admin),
+        BenchmarkCase('export_data', f'{reverse("analytics:export")}?{export_query}', campus.sys_admin),
+    ]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list of samples."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _fetch(client, url):
+    response = client.get(url)
+    # Read the whole body so streamed and lazily rendered responses are timed in full.
+    if response.streaming:
+        for _chunk in response.streaming_content:
+            pass
+    else:
+        len(response.content)
+    return response
+
+
+def run_case(case, *, repeat=10):
+    """Time `repeat` requests for `case` after one warm-up request."""
+    client = Client()
+    client.force_login(User.objects.get(username=case.username))
+    _fetch(client, case.url)
+
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = _fetch(client, case.url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+    return BenchmarkResult(
+        name=case.name,
+        status_code=response.status_code,
+        queries=queries,
+        p50_ms=percentile(timings, 0.5),
+        p95_ms=percentile(timings, 0.95),
+    )
+
+
+def run_benchmarks(campus, *, repeat=10, names=None):
+    return [
+        run_case(case, repeat=repeat)
+        for case in benchmark_cases(campus)
+        if not names or case.name in names
+    ]
+
+
+def _load_json(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _save_json(data, path):
+    with open(path, 'w') as handle:
+        json.dump(data, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def load_budgets(path=BUDGETS_PATH):
+    """Return `{page: max_queries}` from the committed budget file."""
+    return _load_json(path)
+
+
+def save_budgets(results, path=BUDGETS_PATH):
+    _save_json({result.name: result.queries for result in results}, path)
+
+
+def load_timings(path=TIMINGS_PATH):
+    """Return `{page: p95_ms}` from a local baseline file, or {} if none was recorded."""
+    try:
+        return _load_json(path)
+    except FileNotFoundError:
+        return {}
+
+
+def save_timings(results, path=TIMINGS_PATH):
+    _save_json({result.name: round(result.p95_ms, 1) for result in results}, path)
+
+
+def check_budgets(results, budgets, *, timings=None, time_tolerance=DEFAULT_TIME_TOLERANCE):
+    """
+    Return a message for every result that fails or exceeds its budget.
+
+    `budgets` maps pages to query budgets. p95 latency is only checked against
+    the local `timings` baselines, for pages that have one.
+    """
+    timings = timings or {}
+    violations = []
+    for result in results:
+        if result.status_code != 200:
+            violations.append(f'{result.name}: returned HTTP {result.status_code}')
+        budget = budgets.get(result.name)
+        if budget is None:
+            violations.append(f'{result.name}: no query budget recorded')
+        elif result.queries > budget:
+            violations.append(f'{result.name}: {result.queries} queries, budget {budget}')
+        baseline = timings.get(result.name)
+        if time_tolerance and baseline is not None and result.p95_ms > baseline * time_tolerance:
+            violations.append(
+                f'{result.name}: p95 {result.p95_ms:.1f} ms, baseline {baseline} ms x {time_tolerance}'
+            )
+    return violations
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVE_CHUNK_SIZE, archive_activity_logs, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move activity log entries older than the retention window into monthly gzipped JSONL files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory that holds the monthly archive files.')
+        parser.add_argument('--days', type=int, help="Retention window in days (default: ACTIVITY_LOG['RETENTION_DAYS']).")
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help='Entries read and deleted per chunk.')
+        parser.add_argument('--keep', action='store_true', help='Copy entries into the archive without deleting them.')
+
+    def handle(self, *args, **options):
+        result = archive_activity_logs(
+            before=retention_cutoff(options['days']),
+            directory=options['directory'],
+            chunk_size=options['chunk_size'],
+            delete=not options['keep'],
+        )
+        for path in result.files:
+            self.stdout.write(f'Wrote {path}')
+        self.stdout.write(self.style.SUCCESS(f'Archived {result.archived} activity log entries.'))
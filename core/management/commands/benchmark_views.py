@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from core.benchmarks import (
+    BUDGETS_PATH,
+    DEFAULT_TIME_TOLERANCE,
+    TIMINGS_PATH,
+    check_budgets,
+    load_budgets,
+    load_timings,
+    run_benchmarks,
+    save_budgets,
+    save_timings,
+)
+from core.seeding import seed_campus
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic campus into a throwaway test database and report p50/p95 latency '
+        'and query counts for the main pages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=5)
+        parser.add_argument('--facilities', type=int, default=40)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--bookings', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per page.')
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Benchmark only these pages.')
+        parser.add_argument('--budgets', default=str(BUDGETS_PATH), help='Query budget file (committed).')
+        parser.add_argument('--timings', default=str(TIMINGS_PATH),
+                            help='Local p95 baseline file; keep it out of version control.')
+        parser.add_argument('--record', action='store_true',
+                            help='Write the query counts as the new budgets and the p95 values as local baselines.')
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if a page exceeds its query budget or its local p95 baseline.')
+        parser.add_argument('--time-tolerance', type=float, default=DEFAULT_TIME_TOLERANCE,
+                            help='Allowed p95 as a multiple of its baseline; 0 checks query counts only.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive.')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f'Seeding {options["bookings"]} bookings...')
+            campus = seed_campus(
+                departments=options['departments'],
+                facilities=options['facilities'],
+                users=options['users'],
+                bookings=options['bookings'],
+                seed=options['seed'],
+            )
+            results = run_benchmarks(campus, repeat=options['repeat'], names=options['only'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'{"page":<22}{"status":>7}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}')
+        for result in results:
+            self.stdout.write(
+                f'{result.name:<22}{result.status_code:>7}{result.queries:>9}'
+                f'{result.p50_ms:>10.1f}{result.p95_ms:>10.1f}'
+            )
+
+        if options['record']:
+            save_budgets(results, options['budgets'])
+            save_timings(results, options['timings'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Recorded query budgets in {options["budgets"]} and p95 baselines in {options["timings"]}.'
+            ))
+        if options['check']:
+            timings = load_timings(options['timings'])
+            if not timings and options['time_tolerance']:
+                self.stdout.write(f'No p95 baselines in {options["timings"]}; checking query counts only.')
+            violations = check_budgets(
+                results,
+                load_budgets(options['budgets']),
+                timings=timings,
+                time_tolerance=options['time_tolerance'],
+            )
+            if violations:
+                raise CommandError('Over budget:\n  ' + '\n  '.join(violations))
+            self.stdout.write(self.style.SUCCESS('All pages within budget.'))
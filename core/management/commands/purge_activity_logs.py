@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archive import retention_cutoff
+from core.purge import PURGE_CHUNK_SIZE, purge_activity_logs
+
+
+class Command(BaseCommand):
+    help = 'Delete activity log entries in chunks without locking the table for the whole run.'
+
+    def add_arguments(self, parser):
+        age = parser.add_mutually_exclusive_group(required=True)
+        age.add_argument('--older-than-days', type=int, help='Only delete entries older than this many days.')
+        age.add_argument('--all', action='store_true', help='Delete every entry.')
+        parser.add_argument('--chunk-size', type=int, default=PURGE_CHUNK_SIZE, help='Entries deleted per transaction.')
+        parser.add_argument('--no-truncate', action='store_true', help='Delete in chunks even when TRUNCATE is available.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        before = None if options['all'] else retention_cutoff(options['older_than_days'])
+        result = purge_activity_logs(
+            before=before,
+            chunk_size=options['chunk_size'],
+            truncate=not options['no_truncate'],
+            progress=lambda deleted: self.stdout.write(f'Deleted {deleted} entries...'),
+        )
+        if result.truncated:
+            self.stdout.write(self.style.SUCCESS('Truncated the activity log.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {result.deleted} activity log entries.'))
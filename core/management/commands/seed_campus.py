@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.models import BookingRequest
+from core.seeding import SEED_PASSWORD, seed_campus
+from facilities.models import Facility
+
+
+class Command(BaseCommand):
+    help = 'Fill an empty database with a deterministic synthetic campus for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=5)
+        parser.add_argument('--facilities', type=int, default=40)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--bookings', type=int, default=100_000)
+        parser.add_argument('--past-days', type=int, default=60, help='Days of history before the anchor date.')
+        parser.add_argument('--future-days', type=int, default=30, help='Days of bookings after the anchor date.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--anchor-date', type=date.fromisoformat, help='Date the campus is built around (default: today).')
+
+    def handle(self, *args, **options):
+        if options['departments'] < 1 or options['facilities'] < 1 or options['users'] < 1:
+            raise CommandError('--departments, --facilities and --users must be positive.')
+        if Facility.objects.exists() or BookingRequest.objects.exists():
+            raise CommandError('seed_campus expects an empty database; run `manage.py flush` first.')
+
+        started = time.perf_counter()
+        campus = seed_campus(
+            departments=options['departments'],
+            facilities=options['facilities'],
+            users=options['users'],
+            bookings=options['bookings'],
+            past_days=options['past_days'],
+            future_days=options['future_days'],
+            seed=options['seed'],
+            anchor_date=options['anchor_date'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {campus.bookings} bookings in {time.perf_counter() - started:.1f}s. '
+            f'Log in as {campus.sys_admin}, {campus.manager} or {campus.requester} '
+            f'with the password "{SEED_PASSWORD}".'
+        ))
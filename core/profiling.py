@@ -0,0 +1,182 @@
+"""
+Opt-in request profiling.
+
+`ProfilingMiddleware` records, for a sample of requests, the number and
+duration of database queries, template render time, total time and any
+named spans entered while handling the request. The numbers go out as a
+`Server-Timing` header (visible in the browser's network panel) and as one
+JSON log line on the `core.profiling` logger. It is configured through
+`REQUEST_PROFILING` and removes itself at startup when disabled, so it costs
+nothing unless turned on.
+
+Spans mark interesting service calls::
+
+    @profile_span('bookings.approve')
+    def approve_booking_request(...):
+        ...
+
+Outside a sampled request a span is a no-op.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from contextlib import ContextDecorator, ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING_SETTINGS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,
+}
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+def get_profiling_settings():
+    return {**DEFAULT_PROFILING_SETTINGS, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+class RequestProfile:
+    """Timings collected while one sampled request is handled. Durations are in seconds."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.spans = {}
+
+    def add_span(self, name, duration):
+        count, total = self.spans.get(name, (0, 0.0))
+        self.spans[name] = (count + 1, total + duration)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with `connection.execute_wrapper`.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += time.perf_counter() - started
+
+
+def current_profile():
+    """Return the profile of the request being sampled, or None."""
+    return _current_profile.get()
+
+
+class profile_span(ContextDecorator):
+    """Time a block or function as a named span of the current request profile."""
+
+    def __init__(self, name):
+        self.name = name
+        self._started = None
+
+    def _recreate_cm(self):
+        # A decorated function may run in several threads at once; each call gets its own timer.
+        return type(self)(self.name)
+
+    def __enter__(self):
+        if current_profile() is not None:
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        profile = current_profile()
+        if self._started is not None and profile is not None:
+            profile.add_span(self.name, time.perf_counter() - self._started)
+        return False
+
+
+class Template(DjangoTemplate):
+    def render(self, context=None, request=None):
+        profile = current_profile()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render for the request profile."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
+
+
+_METRIC_NAME = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def server_timing(profile, total):
+    """Format a profile as a `Server-Timing` header value (durations in milliseconds)."""
+    metrics = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={profile.query_time * 1000:.1f};desc="{profile.query_count} queries"',
+        f'template;dur={profile.template_time * 1000:.1f}',
+    ]
+    for name, (count, duration) in profile.spans.items():
+        metrics.append(f'{_METRIC_NAME.sub("_", name)};dur={duration * 1000:.1f};desc="{count}x"')
+    return ', '.join(metrics)
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests; see the module docstring."""
+
+    def __init__(self, get_response):
+        profiling_settings = get_profiling_settings()
+        if not profiling_settings['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = profiling_settings['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            _current_profile.reset(token)
+
+        # Streamed bodies are produced after this point and are not included.
+        response['Server-Timing'] = server_timing(profile, total)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'event': 'request_profile',
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': profile.query_count,
+            'db_ms': round(profile.query_time * 1000, 1),
+            'template_ms': round(profile.template_time * 1000, 1),
+            'spans': {
+                name: {'count': count, 'ms': round(duration * 1000, 1)}
+                for name, (count, duration) in profile.spans.items()
+            },
+        }, sort_keys=True))
+        return response
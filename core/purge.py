@@ -0,0 +1,60 @@
+"""
+Bulk removal of activity log entries.
+
+`Model.delete()` on a queryset collects every row into memory and sends
+signals before deleting, which on a large audit table holds locks for minutes.
+The purge engine instead deletes in primary-key chunks with plain DELETE
+statements, committing after each chunk so other writers are only ever
+blocked briefly. Clearing the whole table uses TRUNCATE on backends that
+have it.
+"""
+
+from collections import namedtuple
+
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+
+from core.models import ActivityLog
+
+PURGE_CHUNK_SIZE = 5000
+
+PurgeResult = namedtuple('PurgeResult', ['deleted', 'truncated'])
+
+
+def _truncate(connection):
+    # sql_flush emits TRUNCATE on PostgreSQL, MySQL and Oracle.
+    statements = connection.ops.sql_flush(no_style(), [ActivityLog._meta.db_table], reset_sequences=False)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def purge_activity_logs(*, before=None, chunk_size=PURGE_CHUNK_SIZE, truncate=True, progress=None):
+    """
+    Delete activity log entries older than `before`, or all of them.
+
+    `progress`, if given, is called with the running total after each chunk.
+    Returns a `PurgeResult`; `deleted` is None when the table was truncated,
+    because TRUNCATE does not report a row count.
+    """
+    using = router.db_for_write(ActivityLog)
+    connection = connections[using]
+    if before is None and truncate and connection.vendor != 'sqlite':
+        _truncate(connection)
+        return PurgeResult(None, True)
+
+    queryset = ActivityLog.objects.using(using).order_by()
+    if before is not None:
+        queryset = queryset.filter(timestamp__lt=before)
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk_pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not chunk_pks:
+                break
+            # Earlier matches are already gone, so the range covers exactly this chunk.
+            deleted += queryset.filter(pk__lte=chunk_pks[-1])._raw_delete(using)
+        if progress:
+            progress(deleted)
+    return PurgeResult(deleted, False)
@@ -0,0 +1,405 @@
+"""
+Synthetic campus data for benchmarks and load tests.
+
+The generated campus has the shape of real traffic rather than uniform
+noise: a few popular facilities take most of the demand, requests cluster
+around late morning and mid-afternoon on weekdays, facilities use one to
+three approval levels, and every booking leaves the approval steps and
+audit entries the real workflow would have written. The same `seed` always
+produces the same rows, primary keys included.
+
+Departments, accounts and facilities are written with `bulk_create`. The
+high-volume tables (bookings, approval steps, activity log) are inserted
+with `executemany` from plain tuples in batches, skipping model instances,
+per-row signals and per-field value preparation. The rows the skipped
+`post_save` receivers would have added (profiles, booking policies, the
+usage rollup) are written here explicitly.
+"""
+
+import random
+from bisect import bisect
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from analytics.models import FacilityDailyUsage
+from analytics.services import usage_buckets
+from bookings.models import ApprovalStep, BookingPolicy, BookingRequest
+from bookings.services import AUTO_REJECTION_REASON
+from core.models import ActivityLog
+from facilities.models import Facility
+from facilities.services import invalidate_facility_scopes
+from users.models import Department, UserProfile
+
+SEED_BATCH_SIZE = 10_000
+SEED_PASSWORD = 'campus-seed'
+
+OPEN_HOUR = 8
+CLOSE_HOUR = 20
+# Relative demand per start hour and per booking length in hours.
+PEAK_HOUR_WEIGHTS = {8: 2, 9: 6, 10: 10, 11: 9, 12: 4, 13: 4, 14: 8, 15: 8, 16: 6, 17: 3, 18: 2, 19: 1}
+DURATION_WEIGHTS = {1: 6, 2: 3, 3: 1}
+WEEKEND_WEIGHT = 0.25
+# Share of facilities needing one, two or three approvals.
+APPROVAL_LEVEL_WEIGHTS = {1: 7, 2: 2, 3: 1}
+# Status mix for bookings that start in the past and in the future.
+PAST_STATUS_WEIGHTS = {
+    BookingRequest.STATUS_APPROVED: 70,
+    BookingRequest.STATUS_REJECTED: 20,
+    BookingRequest.STATUS_WITHDRAWN: 10,
+}
+FUTURE_STATUS_WEIGHTS = {
+    BookingRequest.STATUS_PENDING: 45,
+    BookingRequest.STATUS_APPROVED: 35,
+    BookingRequest.STATUS_REJECTED: 12,
+    BookingRequest.STATUS_WITHDRAWN: 8,
+}
+
+BOOKING_COLUMNS = (
+    'id', 'user', 'facility', 'start_datetime', 'end_datetime', 'purpose', 'status',
+    'created_at', 'reviewed_at', 'reviewed_by', 'rejection_reason',
+)
+STEP_COLUMNS = ('id', 'booking_request', 'level', 'approver', 'status', 'comment', 'timestamp')
+LOG_COLUMNS = ('id', 'user', 'action', 'object_type', 'object_id', 'timestamp', 'metadata')
+
+PURPOSES = ('Lecture', 'Lab session', 'Club meeting', 'Seminar', 'Exam revision', 'Practice', 'Workshop')
+
+SeededCampus = namedtuple('SeededCampus', ['sys_admin', 'dept_admin', 'manager', 'requester', 'bookings'])
+
+
+def _weighted(weights):
+    """Split a `{value: weight}` mapping into values and cumulative weights for `Random.choices`."""
+    return list(weights), list(accumulate(weights.values()))
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _insert_rows(model, field_names, rows):
+    """INSERT already prepared value tuples with one `executemany`."""
+    meta = model._meta
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(meta.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote_name(meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+@contextmanager
+def _bulk_load(models):
+    """
+    Make a large SQLite load cheaper: skip fsync, widen the page cache and
+    rebuild the secondary indexes of `models` once at the end instead of
+    updating them row by row. A crash mid-load only loses the seed.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    # SQLite only accepts a new safety level outside a transaction.
+    tune = not connection.in_atomic_block
+    with connection.cursor() as cursor:
+        if tune:
+            cursor.execute('PRAGMA synchronous')
+            synchronous, = cursor.fetchone()
+            cursor.execute('PRAGMA cache_size')
+            cache_size, = cursor.fetchone()
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA cache_size = -262144')
+        # Automatic indexes backing UNIQUE constraints have no SQL and stay in place.
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables,
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            if tune:
+                cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+                cursor.execute(f'PRAGMA cache_size = {int(cache_size)}')
+
+
+def _create_users(usernames, password_hash):
+    return User.objects.bulk_create(
+        [User(username=username, email=f'{username}@campus.test', password=password_hash) for username in usernames],
+        batch_size=SEED_BATCH_SIZE,
+    )
+
+
+class _BookingWriter:
+    """Turns drawn bookings into booking, approval step and activity log rows."""
+
+    def __init__(self, *, facilities, levels, managers, now):
+        self.facilities = facilities
+        self.levels = levels
+        self.managers = managers
+        self.now = now
+        self.booking_pk = _next_pk(BookingRequest)
+        self.step_pk = _next_pk(ApprovalStep)
+        self.log_pk = _next_pk(ActivityLog)
+        self.taken = set()
+        self.usage = defaultdict(lambda: [0, 0])
+        self.object_type = BookingRequest._meta.label_lower
+        metadata_field = ActivityLog._meta.get_field('metadata')
+        # Datetimes and audit metadata repeat heavily, so each distinct value is prepared once.
+        self.prepare_datetime = lru_cache(maxsize=None)(connection.ops.adapt_datetimefield_value)
+        self.prepare_metadata = lru_cache(maxsize=None)(
+            lambda items: metadata_field.get_db_prep_save(dict(items), connection)
+        )
+        self.isoformat = lru_cache(maxsize=None)(datetime.isoformat)
+        self.buckets = lru_cache(maxsize=None)(usage_buckets)
+        self.bookings, self.steps, self.logs = [], [], []
+
+    def _log(self, user_id, action, object_id, timestamp, **metadata):
+        self.logs.append((
+            self.log_pk, user_id, action, self.object_type, object_id, self.prepare_datetime(timestamp),
+            self.prepare_metadata(tuple(metadata.items())),
+        ))
+        self.log_pk += 1
+
+    def _step(self, booking_pk, level, approver_id, status, timestamp, comment=''):
+        self.steps.append((
+            self.step_pk, booking_pk, level, approver_id, status, comment,
+            self.prepare_datetime(timestamp) if timestamp else None,
+        ))
+        self.step_pk += 1
+
+    def _claim_slots(self, facility_id, start, end):
+        """Reserve the hours of an approved booking; False if another approval holds one."""
+        slots = {(facility_id, bucket) for bucket, _ in self.buckets(start, end)}
+        if slots & self.taken:
+            return False
+        self.taken |= slots
+        return True
+
+    def add(self, rng, *, user_id, facility_id, start, hours, status):
+        pk = self.booking_pk
+        self.booking_pk += 1
+        end = start + timedelta(hours=hours)
+        manager_id = self.managers[facility_id]
+        levels = self.levels[facility_id]
+
+        reason = ''
+        if status == BookingRequest.STATUS_APPROVED and not self._claim_slots(facility_id, start, end):
+            status, reason = BookingRequest.STATUS_REJECTED, AUTO_REJECTION_REASON
+        # Requests arrive one to fourteen days ahead and are reviewed within two days.
+        created = start - timedelta(days=1 + int(rng.random() * 14))
+        if created > self.now:
+            created = self.now - timedelta(hours=1 + int(rng.random() * 48))
+        reviewed = None
+        if status in (BookingRequest.STATUS_APPROVED, BookingRequest.STATUS_REJECTED):
+            reviewed = min(created + timedelta(hours=1 + int(rng.random() * 48)), self.now)
+
+        self.bookings.append((
+            pk, user_id, facility_id, self.prepare_datetime(start), self.prepare_datetime(end),
+            PURPOSES[int(rng.random() * len(PURPOSES))], status, self.prepare_datetime(created),
+            self.prepare_datetime(reviewed) if reviewed else None,
+            manager_id if reviewed else None, reason,
+        ))
+        self._log(
+            user_id, ActivityLog.ACTION_BOOKING_CREATED, pk, created,
+            facility_id=facility_id,
+            facility_name=self.facilities[facility_id],
+            start_datetime=self.isoformat(start),
+            end_datetime=self.isoformat(end),
+        )
+
+        # Levels approved before the request reached its final state.
+        if status == BookingRequest.STATUS_APPROVED:
+            approved_levels = levels
+        elif status == BookingRequest.STATUS_REJECTED and reason:
+            approved_levels = levels - 1
+        else:
+            approved_levels = int(rng.random() * levels)
+        step_time = reviewed or created
+        for level in range(1, approved_levels + 1):
+            self._step(pk, level, manager_id, ApprovalStep.STATUS_APPROVED, step_time)
+            if level == levels:
+                metadata = {'rejected_conflicts': 0, 'final': True}
+            else:
+                metadata = {'step_level': level, 'next_level': level + 1, 'final': False}
+            self._log(manager_id, ActivityLog.ACTION_BOOKING_APPROVED, pk, step_time, **metadata)
+
+        if status == BookingRequest.STATUS_APPROVED:
+            for index, (bucket, seconds) in enumerate(self.buckets(start, end)):
+                totals = self.usage[(facility_id, *bucket)]
+                totals[0] += seconds
+                totals[1] += index == 0
+        elif status == BookingRequest.STATUS_REJECTED:
+            self._step(pk, approved_levels + 1, manager_id, ApprovalStep.STATUS_REJECTED, reviewed, reason)
+            metadata = {'reason': reason, 'auto_rejected': True} if reason else {'reason': reason}
+            self._log(manager_id, ActivityLog.ACTION_BOOKING_REJECTED, pk, reviewed, **metadata)
+        else:
+            self._step(pk, approved_levels + 1, None, ApprovalStep.STATUS_PENDING, None)
+            if status == BookingRequest.STATUS_WITHDRAWN:
+                self._log(user_id, ActivityLog.ACTION_BOOKING_WITHDRAWN, pk, step_time, facility_id=facility_id)
+
+    def flush(self):
+        with transaction.atomic():
+            _insert_rows(BookingRequest, BOOKING_COLUMNS, self.bookings)
+            _insert_rows(ApprovalStep, STEP_COLUMNS, self.steps)
+            _insert_rows(ActivityLog, LOG_COLUMNS, self.logs)
+        self.bookings, self.steps, self.logs = [], [], []
+
+
+def seed_campus(
+    *,
+    departments=5,
+    facilities=40,
+    users=500,
+    bookings=100_000,
+    past_days=60,
+    future_days=30,
+    seed=42,
+    anchor_date=None,
+):
+    """
+    Fill an empty database with a synthetic campus and return a `SeededCampus`.
+
+    Each department gets a department admin and a facility manager who
+    manages that department's facilities; `users` plain requesters make the
+    bookings, spread over `past_days` before and `future_days` after
+    `anchor_date` (default: today). Pass an `anchor_date` as well as a
+    `seed` to get the same rows on any day.
+    """
+    rng = random.Random(seed)
+    # Hashing is deliberately slow, so every seeded account shares one hash.
+    password_hash = make_password(SEED_PASSWORD)
+
+    department_rows = Department.objects.bulk_create([
+        Department(name=f'Department {index}', code=f'D{index}') for index in range(departments)
+    ])
+    sys_admin, = _create_users(['seed_admin'], password_hash)
+    dept_admins = _create_users([f'seed_dept_admin_{index}' for index in range(departments)], password_hash)
+    managers = _create_users([f'seed_manager_{index}' for index in range(departments)], password_hash)
+    requesters = _create_users([f'seed_user_{index}' for index in range(users)], password_hash)
+
+    profiles = [UserProfile(user=sys_admin, role='sys_admin')]
+    profiles += [
+        UserProfile(user=user, role='dept_admin', department=department)
+        for user, department in zip(dept_admins, department_rows)
+    ]
+    profiles += [
+        UserProfile(user=user, role='user', department=department)
+        for user, department in zip(managers, department_rows)
+    ]
+    profiles += [UserProfile(user=user, role='user', department=rng.choice(department_rows)) for user in requesters]
+    UserProfile.objects.bulk_create(profiles, batch_size=SEED_BATCH_SIZE)
+
+    facility_rows = Facility.objects.bulk_create([
+        Facility(
+            name=f'Facility {index:03d}',
+            facility_type=Facility.TYPE_CHOICES[index % len(Facility.TYPE_CHOICES)][0],
+            capacity=rng.choice((20, 40, 60, 120)),
+            open_time=time(OPEN_HOUR),
+            close_time=time(CLOSE_HOUR),
+            department=department_rows[index % departments],
+            max_pending_requests=10,
+        )
+        for index in range(facilities)
+    ])
+    level_values, level_weights = _weighted(APPROVAL_LEVEL_WEIGHTS)
+    levels = {facility.pk: rng.choices(level_values, cum_weights=level_weights)[0] for facility in facility_rows}
+    BookingPolicy.objects.bulk_create([
+        BookingPolicy(facility=facility, required_approval_levels=levels[facility.pk]) for facility in facility_rows
+    ])
+    manager_by_facility = {facility.pk: managers[index % departments].pk for index, facility in enumerate(facility_rows)}
+    Facility.managers.through.objects.bulk_create([
+        Facility.managers.through(facility_id=facility_id, user_id=manager_id)
+        for facility_id, manager_id in manager_by_facility.items()
+    ])
+
+    # Popularity follows a Zipf curve over a shuffled ranking of facilities.
+    ranking = [facility.pk for facility in facility_rows]
+    rng.shuffle(ranking)
+    facility_ids, facility_weights = _weighted({pk: 1 / rank for rank, pk in enumerate(ranking, start=1)})
+
+    current_timezone = timezone.get_current_timezone()
+    if anchor_date is None:
+        today = timezone.localdate()
+        now = timezone.now().replace(second=0, microsecond=0)
+    else:
+        today = anchor_date
+        now = timezone.make_aware(datetime.combine(anchor_date, time(12)), current_timezone)
+    slot_weights = {}
+    for offset in range(-past_days, future_days + 1):
+        day = today + timedelta(days=offset)
+        day_weight = WEEKEND_WEIGHT if day.weekday() >= 5 else 1
+        for hour, hour_weight in PEAK_HOUR_WEIGHTS.items():
+            start = timezone.make_aware(datetime.combine(day, time(hour)), current_timezone)
+            slot_weights[(start, CLOSE_HOUR - hour)] = day_weight * hour_weight
+    slots, slot_cum_weights = _weighted(slot_weights)
+    durations, duration_weights = _weighted(DURATION_WEIGHTS)
+    past_statuses, past_status_weights = _weighted(PAST_STATUS_WEIGHTS)
+    future_statuses, future_status_weights = _weighted(FUTURE_STATUS_WEIGHTS)
+    requester_ids = [user.pk for user in requesters]
+
+    writer = _BookingWriter(
+        facilities={facility.pk: facility.name for facility in facility_rows},
+        levels=levels,
+        managers=manager_by_facility,
+        now=now,
+    )
+    with _bulk_load([BookingRequest, ApprovalStep, ActivityLog]):
+        remaining = bookings
+        while remaining:
+            size = min(remaining, SEED_BATCH_SIZE)
+            remaining -= size
+            draws = zip(
+                rng.choices(requester_ids, k=size),
+                rng.choices(facility_ids, cum_weights=facility_weights, k=size),
+                rng.choices(slots, cum_weights=slot_cum_weights, k=size),
+                rng.choices(durations, cum_weights=duration_weights, k=size),
+            )
+            for user_id, facility_id, (start, hours_left), hours in draws:
+                if start > now:
+                    status = future_statuses[bisect(future_status_weights, rng.random() * future_status_weights[-1])]
+                else:
+                    status = past_statuses[bisect(past_status_weights, rng.random() * past_status_weights[-1])]
+                writer.add(
+                    rng,
+                    user_id=user_id,
+                    facility_id=facility_id,
+                    start=start,
+                    hours=min(hours, hours_left),
+                    status=status,
+                )
+            writer.flush()
+
+        FacilityDailyUsage.objects.bulk_create(
+            [
+                FacilityDailyUsage(facility_id=facility_id, date=date, hour=hour, booked_seconds=seconds, booking_count=count)
+                for (facility_id, date, hour), (seconds, count) in writer.usage.items()
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+    # Explicit primary keys leave sequences behind on backends that have them.
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [BookingRequest, ApprovalStep, ActivityLog]):
+            cursor.execute(statement)
+    invalidate_facility_scopes()
+
+    return SeededCampus(
+        sys_admin=sys_admin.username,
+        dept_admin=dept_admins[0].username,
+        manager=managers[0].username,
+        requester=requesters[0].username,
+        bookings=bookings,
+    )
@@ -1,11 +1,102 @@
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import transaction
+
 from core.models import ActivityLog
 
+DEFAULT_ACTIVITY_LOG_SETTINGS = {
+    'SYNCHRONOUS': False,
+    'RETENTION_DAYS': 365,
+}
+
+
+def get_activity_log_settings():
+    return {**DEFAULT_ACTIVITY_LOG_SETTINGS, **getattr(settings, 'ACTIVITY_LOG', {})}
+
+
+class _PendingEntries(list):
+    """
+    Entries logged by one call inside a transaction, registered as an
+    `on_commit` callback.
+
+    Only Django's list of commit callbacks holds the instance strongly, so
+    when a savepoint or the transaction rolls back and its callbacks are
+    discarded, the entries go with them. On commit the callbacks run in
+    order and the last surviving one writes every surviving batch with one
+    INSERT; the others do nothing.
+    """
+
+    def __init__(self, entries, buffer):
+        super().__init__(entries)
+        self.buffer = buffer
+
+    def __call__(self):
+        batches = self.buffer.batches
+        last = next((batch for ref in reversed(batches) if (batch := ref()) is not None), None)
+        if last is not self:
+            return
+        entries = [entry for ref in batches if (batch := ref()) is not None for entry in batch]
+        batches.clear()
+        ActivityLog.objects.bulk_create(entries)
+
+
+class _ActivityLogBuffer:
+    """Weak references to the pending batches of one connection's outermost transaction."""
+
+    def __init__(self):
+        self.batches = []
+        self.alive = 0
+
+    def _discarded(self, ref):
+        self.alive -= 1
+
+    def add(self, entries, using):
+        if not self.alive:
+            # Everything queued so far was written or rolled back.
+            self.batches.clear()
+        batch = _PendingEntries(entries, self)
+        self.batches.append(weakref.ref(batch, self._discarded))
+        self.alive += 1
+        transaction.on_commit(batch, using=using)
+
+
+_buffers = threading.local()
+
+
+def _buffer_for(connection):
+    buffers = _buffers.__dict__.setdefault('by_alias', {})
+    return buffers.setdefault(connection.alias, _ActivityLogBuffer())
+
+
+def _write_entries(entries):
+    """
+    Save `entries` now, or queue them for one INSERT when the outermost
+    transaction commits.
+
+    Writes are immediate outside a transaction and when
+    `ACTIVITY_LOG['SYNCHRONOUS']` is set, for deployments where an audit row
+    must exist as soon as the change it describes does.
+    """
+    connection = transaction.get_connection()
+    if get_activity_log_settings()['SYNCHRONOUS'] or not connection.in_atomic_block:
+        return ActivityLog.objects.bulk_create(entries)
+    _buffer_for(connection).add(entries, using=connection.alias)
+    return entries
+
 
 def log_activity(*, user=None, action, obj=None, metadata=None):
     """
-    Persist a normalized audit log entry.
+    Record a normalized audit log entry.
 
     When `obj` is provided, the log stores the affected model label and primary key.
+
+    Outside a transaction the entry is saved straight away. Inside one it is
+    queued and saved with the rest of the transaction's entries when the
+    outermost atomic block commits, so the returned instance is unsaved and
+    its `pk` is None; entries logged in a savepoint that rolls back are
+    never saved.
     """
 
     object_type = ''
@@ -14,10 +105,35 @@ def log_activity(*, user=None, action, obj=None, metadata=None):
         object_type = obj._meta.label_lower
         object_id = obj.pk
 
-    return ActivityLog.objects.create(
-        user=user,
-        action=action,
-        object_type=object_type,
-        object_id=object_id,
-        metadata=metadata or {},
-    )
+    entry, = _write_entries([
+        ActivityLog(
+            user=user,
+            action=action,
+            object_type=object_type,
+            object_id=object_id,
+            metadata=metadata or {},
+        )
+    ])
+    return entry
+
+
+def bulk_log_activity(*, user=None, action, model, object_ids, metadata=None):
+    """
+    Record one audit log entry per object id.
+
+    Used when the same action is applied to many rows at once, e.g. the
+    automatic rejection of conflicting requests. The entries join the
+    transaction's buffer like `log_activity` ones.
+    """
+
+    object_type = model._meta.label_lower
+    return _write_entries([
+        ActivityLog(
+            user=user,
+            action=action,
+            object_type=object_type,
+            object_id=object_id,
+            metadata=dict(metadata or {}),
+        )
+        for object_id in object_ids
+    ])
@@ -0,0 +1,118 @@
+"""
+Test helpers that catch N+1 queries.
+
+`QueryCheckingClient` is a drop-in test client that fingerprints every SQL
+statement run while a request is handled (streamed bodies included) and
+fails the request with `RepeatedQueryError` when one query shape runs more
+than `max_repeats` times. Two statements share a shape when they differ only
+in literal values, placeholder parameters or the length of an `IN (...)` or
+`VALUES` list, so fetching the same relation once per row is caught however
+many rows there are. View tests opt in with::
+
+    class DashboardViewTests(TestCase):
+        client_class = QueryCheckingClient
+"""
+
+import re
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.test import Client
+
+DEFAULT_MAX_REPEATS = 3
+
+# Savepoints and transaction control repeat legitimately around every atomic block.
+_IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK', 'BEGIN', 'COMMIT')
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s|\?'), '?'),
+    (re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+class RepeatedQueryError(AssertionError):
+    """A request ran the same query shape more often than allowed."""
+
+
+def fingerprint(sql):
+    """Return `sql` with literals and parameter lists collapsed, or None for transaction control."""
+    sql = sql.strip()
+    if sql.upper().startswith(_IGNORED_PREFIXES):
+        return None
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class RepeatedQueryDetector:
+    """Count query shapes; installed on every connection with `connection.execute_wrapper`."""
+
+    def __init__(self, max_repeats=DEFAULT_MAX_REPEATS):
+        self.max_repeats = max_repeats
+        self.counts = {}
+        self.examples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        if shape is not None:
+            self.counts[shape] = self.counts.get(shape, 0) + 1
+            self.examples.setdefault(shape, sql)
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def watching(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self):
+        """Return `(count, example_sql)` for every shape over the limit, most repeated first."""
+        return sorted(
+            ((count, self.examples[shape]) for shape, count in self.counts.items() if count > self.max_repeats),
+            key=lambda item: -item[0],
+        )
+
+    def check(self, description):
+        repeated = self.repeated()
+        if repeated:
+            details = '\n'.join(f'  {count}x {sql}' for count, sql in repeated)
+            raise RepeatedQueryError(
+                f'{description} repeated a query more than {self.max_repeats} times '
+                f'(likely N+1; add select_related/prefetch_related):\n{details}'
+            )
+
+
+class QueryCheckingClient(Client):
+    """Test client that fails any request repeating a query shape more than `max_repeats` times."""
+
+    def __init__(self, *args, max_repeats=DEFAULT_MAX_REPEATS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_repeats = max_repeats
+
+    def request(self, **request):
+        detector = RepeatedQueryDetector(self.max_repeats)
+        description = f'{request.get("REQUEST_METHOD", "GET")} {request.get("PATH_INFO", "")}'
+        with detector.watching():
+            response = super().request(**request)
+        if response.streaming:
+            response.streaming_content = self._checked_stream(response.streaming_content, detector, description)
+        else:
+            detector.check(description)
+        return response
+
+    @staticmethod
+    def _checked_stream(chunks, detector, description):
+        # Only the generator's own work is watched, not whatever the test does between chunks.
+        chunks = iter(chunks)
+        while True:
+            with detector.watching():
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+        detector.check(description)
@@ -1,2 +1,410 @@
+import gzip
+import json
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import FacilityDailyUsage
+from analytics.services import rebuild_daily_usage
+from bookings.models import ApprovalStep, BookingRequest
+from facilities.models import Facility
+from users.models import Department, UserProfile
+
+from .archive import archive_activity_logs, retention_cutoff
+from .benchmarks import (
+    BenchmarkResult,
+    check_budgets,
+    load_budgets,
+    percentile,
+    run_benchmarks,
+)
+from .models import ActivityLog
+from .profiling import current_profile, profile_span
+from .purge import purge_activity_logs
+from .seeding import seed_campus
+from .services import bulk_log_activity, log_activity
+from .testing import (
+    QueryCheckingClient,
+    RepeatedQueryDetector,
+    RepeatedQueryError,
+    fingerprint,
+)
+from .utils import local_date_bounds
+
+
+class LocalDateBoundsTests(TestCase):
+    def setUp(self):
+        self.window_start, self.window_end = local_date_bounds(date(2026, 3, 2), date(2026, 3, 8))
+        self.facility_index = BookingRequest._meta.indexes[0].name
+
+    def window_queryset(self):
+        return BookingRequest.objects.filter(
+            facility_id=1,
+            status=BookingRequest.STATUS_APPROVED,
+            start_datetime__gte=self.window_start,
+            start_datetime__lt=self.window_end,
+        ).order_by()
+
+    def test_bounds_cover_whole_local_days(self):
+        current_timezone = timezone.get_current_timezone()
+
+        self.assertEqual(self.window_start, timezone.make_aware(datetime(2026, 3, 2), current_timezone))
+        self.assertEqual(self.window_end, timezone.make_aware(datetime(2026, 3, 9), current_timezone))
+        self.assertEqual(
+            local_date_bounds(date(2026, 3, 2)),
+            (self.window_start, self.window_start + timedelta(days=1)),
+        )
+        self.assertEqual(timezone.localtime(self.window_end).time(), time(0))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_sqlite_range_scans_facility_status_start_index(self):
+        plan = self.window_queryset().explain()
+
+        self.assertIn(f'USING INDEX {self.facility_index}', plan)
+        self.assertIn('start_datetime>? AND start_datetime<?', plan)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plan')
+    def test_postgresql_range_scans_facility_status_start_index(self):
+        with connection.cursor() as cursor:
+            # The test table is empty, so make the planner show the index path it would take.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = self.window_queryset().explain()
+
+        self.assertIn(self.facility_index, plan)
+        index_conditions = [line for line in plan.splitlines() if 'Index Cond' in line]
+        self.assertTrue(any('start_datetime >=' in line and 'start_datetime <' in line for line in index_conditions))
+
+
+class BufferedActivityLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditor', password='test123')
+
+    def test_entries_are_written_with_one_insert_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_CREATED)
+                bulk_log_activity(
+                    user=self.user,
+                    action=ActivityLog.ACTION_FACILITY_UPDATED,
+                    model=User,
+                    object_ids=[1, 2, 3],
+                )
+            self.assertFalse(ActivityLog.objects.exists())
+
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(ActivityLog.objects.count(), 4)
+
+    def test_rolled_back_savepoint_drops_its_entries(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_CREATED)
+            try:
+                with transaction.atomic():
+                    log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_DELETED)
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_UPDATED)
+
+        self.assertCountEqual(
+            ActivityLog.objects.values_list('action', flat=True),
+            [ActivityLog.ACTION_FACILITY_CREATED, ActivityLog.ACTION_FACILITY_UPDATED],
+        )
+
+    def test_rollback_of_the_first_savepoint_keeps_later_entries(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            try:
+                with transaction.atomic():
+                    log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_DELETED)
+                    raise ValueError
+            except ValueError:
+                pass
+            log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_UPDATED)
+
+        self.assertEqual(
+            list(ActivityLog.objects.values_list('action', flat=True)),
+            [ActivityLog.ACTION_FACILITY_UPDATED],
+        )
+
+    def test_synchronous_setting_writes_inside_the_transaction(self):
+        with self.settings(ACTIVITY_LOG={'SYNCHRONOUS': True}), self.captureOnCommitCallbacks() as callbacks:
+            entry = log_activity(user=self.user, action=ActivityLog.ACTION_FACILITY_CREATED)
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ActivityLog.objects.get().pk, entry.pk)
+
+
+class ActivityLogArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditor', password='test123')
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, action=action)
+            for action in (
+                ActivityLog.ACTION_FACILITY_CREATED,
+                ActivityLog.ACTION_FACILITY_UPDATED,
+                ActivityLog.ACTION_FACILITY_DELETED,
+            )
+        ])
+        current_timezone = timezone.get_current_timezone()
+        ActivityLog.objects.filter(action=ActivityLog.ACTION_FACILITY_CREATED).update(
+            timestamp=timezone.make_aware(datetime(2025, 1, 15, 9), current_timezone)
+        )
+        ActivityLog.objects.filter(action=ActivityLog.ACTION_FACILITY_UPDATED).update(
+            timestamp=timezone.make_aware(datetime(2025, 2, 3, 9), current_timezone)
+        )
+
+    def read_archive(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_command_moves_old_entries_into_monthly_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('archive_activity_logs', directory, '--days', '90', '--chunk-size', '1', stdout=StringIO())
+
+            files = sorted(path.name for path in Path(directory).iterdir())
+            january = self.read_archive(Path(directory) / 'activity-log-2025-01.jsonl.gz')
+
+        self.assertEqual(files, ['activity-log-2025-01.jsonl.gz', 'activity-log-2025-02.jsonl.gz'])
+        self.assertEqual(
+            [(entry['action'], entry['user_id']) for entry in january],
+            [(ActivityLog.ACTION_FACILITY_CREATED, self.user.pk)],
+        )
+        self.assertEqual(
+            list(ActivityLog.objects.values_list('action', flat=True)),
+            [ActivityLog.ACTION_FACILITY_DELETED],
+        )
+
+    def test_keep_copies_without_deleting(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = archive_activity_logs(before=retention_cutoff(90), directory=directory, delete=False)
+            # A second run appends another gzip member to the same file.
+            archive_activity_logs(before=retention_cutoff(90), directory=directory, delete=False)
+            january = self.read_archive(result.files[0])
+
+        self.assertEqual(result.archived, 2)
+        self.assertEqual(len(january), 2)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+
+class ActivityLogPurgeTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditor', password='test123')
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, action=ActivityLog.ACTION_FACILITY_UPDATED, object_id=index)
+            for index in range(5)
+        ])
+        ActivityLog.objects.filter(object_id__lt=3).update(timestamp=timezone.now() - timedelta(days=400))
+
+    def test_chunks_report_progress_and_respect_the_age_filter(self):
+        progress = []
+
+        result = purge_activity_logs(before=retention_cutoff(365), chunk_size=2, progress=progress.append)
+
+        self.assertEqual(result, (3, False))
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(sorted(ActivityLog.objects.values_list('object_id', flat=True)), [3, 4])
+
+    def test_command_requires_an_age_or_all(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_activity_logs', stdout=StringIO())
+
+        call_command('purge_activity_logs', '--all', '--no-truncate', stdout=StringIO())
+
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_admin_action_clears_every_entry(self):
+        admin_user = User.objects.create_superuser(username='root', password='test123')
+        self.client.force_login(admin_user)
+
+        response = self.client.post(reverse('admin:core_activitylog_changelist'), {
+            'action': 'clear_all_logs',
+            '_selected_action': [ActivityLog.objects.first().pk],
+        }, follow=True)
+
+        self.assertContains(response, 'audit logs.')
+        self.assertFalse(ActivityLog.objects.exists())
+
+
+class BenchmarkBudgetTests(TestCase):
+    def test_pages_stay_within_recorded_query_budgets(self):
+        campus = seed_campus(departments=2, facilities=6, users=20, bookings=300, seed=7)
+
+        results = run_benchmarks(campus, repeat=1)
+
+        self.assertEqual(
+            [result.name for result in results],
+            ['facility_list', 'my_requests', 'calendar', 'admin_dashboard', 'analytics_dashboard', 'export_data'],
+        )
+        # Timings depend on the machine, so the test suite gates query counts only.
+        self.assertEqual(check_budgets(results, load_budgets()), [])
+
+    def test_check_budgets_reports_regressions(self):
+        result = BenchmarkResult('calendar', 200, queries=9, p50_ms=10.0, p95_ms=40.0)
+
+        violations = check_budgets([result], {'calendar': 4}, timings={'calendar': 20.0})
+
+        self.assertEqual(violations, [
+            'calendar: 9 queries, budget 4',
+            'calendar: p95 40.0 ms, baseline 20.0 ms x 1.5',
+        ])
+        self.assertEqual(check_budgets([result], {'calendar': 9}), [])
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 0.5), 3)
+
+
+class SeedCampusTests(TestCase):
+    def test_seeded_campus_matches_what_the_workflow_would_write(self):
+        seed_campus(departments=2, facilities=5, users=10, bookings=400, seed=3, anchor_date=date(2026, 3, 2))
+
+        self.assertEqual(BookingRequest.objects.count(), 400)
+        self.assertEqual(ActivityLog.objects.filter(action=ActivityLog.ACTION_BOOKING_CREATED).count(), 400)
+        self.assertEqual(UserProfile.objects.count(), User.objects.count())
+        for booking in BookingRequest.objects.filter(status=BookingRequest.STATUS_APPROVED).select_related(
+            'facility__booking_policy'
+        ).prefetch_related('approval_steps'):
+            self.assertEqual(
+                [step.status for step in booking.approval_steps.all()],
+                [ApprovalStep.STATUS_APPROVED] * booking.facility.booking_policy.required_approval_levels,
+            )
+        # The rollup written by the seeder is the one a rebuild produces.
+        usage = list(FacilityDailyUsage.objects.order_by('facility', 'date', 'hour').values_list())
+        rebuild_daily_usage()
+        self.assertEqual(
+            [row[1:] for row in usage],
+            [row[1:] for row in FacilityDailyUsage.objects.order_by('facility', 'date', 'hour').values_list()],
+        )
+
+    def test_same_seed_and_anchor_reproduce_the_same_campus(self):
+        booking_fields = (
+            'user__username', 'facility__name', 'start_datetime', 'end_datetime', 'purpose', 'status',
+            'created_at', 'reviewed_at', 'reviewed_by__username', 'rejection_reason',
+        )
+        step_fields = (
+            'booking_request__facility__name', 'booking_request__start_datetime', 'booking_request__user__username',
+            'level', 'approver__username', 'status', 'comment', 'timestamp',
+        )
+
+        def seed_and_snapshot():
+            seed_campus(departments=2, facilities=5, users=10, bookings=300, seed=11, anchor_date=date(2026, 3, 2))
+            snapshot = (
+                list(BookingRequest.objects.order_by(*booking_fields).values_list(*booking_fields)),
+                list(ApprovalStep.objects.order_by(*step_fields).values_list(*step_fields)),
+            )
+            for model in (ActivityLog, FacilityDailyUsage, BookingRequest, Facility, Department, User):
+                model.objects.all().delete()
+            return snapshot
+
+        first_bookings, first_steps = seed_and_snapshot()
+        second_bookings, second_steps = seed_and_snapshot()
+
+        self.assertEqual(len(first_bookings), 300)
+        self.assertEqual(first_bookings, second_bookings)
+        self.assertEqual(first_steps, second_steps)
+
+    def test_command_refuses_a_database_with_bookings(self):
+        call_command('seed_campus', '--bookings', '50', '--users', '5', '--facilities', '3', stdout=StringIO())
+
+        with self.assertRaisesMessage(CommandError, 'expects an empty database'):
+            call_command('seed_campus', '--bookings', '50', stdout=StringIO())
+
+
+@override_settings(REQUEST_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+class ProfilingMiddlewareTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='sysadmin', password='test123')
+        self.admin.profile.role = 'sys_admin'
+        self.admin.profile.save()
+        self.client.force_login(self.admin)
+
+    def test_sampled_request_reports_queries_templates_and_spans(self):
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('analytics:dashboard'))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", template;dur=[\d.]+')
+        self.assertIn('analytics.utilization;dur=', timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'analytics:dashboard')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertEqual(record['spans']['analytics.peak_hours']['count'], 1)
+
+    @override_settings(REQUEST_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 0})
+    def test_unsampled_requests_are_left_alone(self):
+        response = self.client.get(reverse('analytics:dashboard'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_PROFILING={'ENABLED': False})
+    def test_disabled_middleware_is_not_installed(self):
+        response = self.client.get(reverse('analytics:dashboard'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    def test_spans_outside_a_request_do_nothing(self):
+        with profile_span('idle') as span:
+            pass
+
+        self.assertIsNone(current_profile())
+        self.assertIsNone(span._started)
+
+
+class RepeatedQueryDetectorTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s, %s) AND "t"."name" = \'x\' LIMIT 21'),
+            fingerprint('SELECT *  FROM "t" WHERE "t"."id" IN (%s) AND "t"."name" = \'y\'\nLIMIT 5'),
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (...)',
+        )
+        self.assertIsNone(fingerprint('SAVEPOINT "s1_x2"'))
+
+    def test_repeated_query_shapes_fail_only_over_the_limit(self):
+        users = [User.objects.create_user(username=f'user_{index}') for index in range(4)]
+        detector = RepeatedQueryDetector(max_repeats=3)
+
+        with detector.watching():
+            for user in users[:3]:
+                User.objects.get(pk=user.pk)
+        detector.check('three lookups')
+
+        with detector.watching():
+            User.objects.get(pk=users[3].pk)
+        with self.assertRaisesRegex(RepeatedQueryError, r'4x SELECT .*"auth_user"'):
+            detector.check('four lookups')
+
+    def test_streamed_bodies_are_checked_once_consumed(self):
+        users = [User.objects.create_user(username=f'user_{index}') for index in range(5)]
+        rows = (User.objects.get(pk=user.pk).username.encode() for user in users)
+
+        chunks = QueryCheckingClient._checked_stream(rows, RepeatedQueryDetector(), 'GET /export/')
+
+        with self.assertRaises(RepeatedQueryError):
+            list(chunks)
+
+    def test_core_pages_do_not_query_per_row(self):
+        campus = seed_campus(departments=2, facilities=6, users=12, bookings=200, seed=9)
+        for username in (campus.requester, campus.sys_admin):
+            self.client.force_login(User.objects.get(username=username))
+            for url in (reverse('core:home'), reverse('core:calendar')):
+                with self.subTest(username=username, url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+
+def local_day_start(local_date):
+    """Return the aware datetime at which `local_date` begins in the current timezone."""
+    return timezone.make_aware(
+        datetime.combine(local_date, datetime.min.time()),
+        timezone.get_current_timezone(),
+    )
+
+
+def local_date_bounds(start_date, end_date=None):
+    """
+    Convert an inclusive local-date window into aware `[start, end)` bounds.
+
+    Filtering with `start_datetime__gte=start, start_datetime__lt=end` lets the
+    database range-scan datetime indexes, which `__date` lookups cannot do
+    because they cast every row first.
+    """
+    end_date = end_date or start_date
+    return local_day_start(start_date), local_day_start(end_date + timedelta(days=1))
@@ -4,6 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.utils import timezone
 
+from .utils import local_date_bounds
+
 
 def home(request):
     context = {}
@@ -40,13 +42,14 @@ def calendar_view(request):
     # Week starts on Monday.
     week_start = anchor - timedelta(days=anchor.weekday())
     week_end = week_start + timedelta(days=6)
+    window_start, window_end = local_date_bounds(week_start, week_end)
 
     approved_bookings = (
         BookingRequest.objects
         .filter(
             status=BookingRequest.STATUS_APPROVED,
-            start_datetime__date__gte=week_start,
-            start_datetime__date__lte=week_end,
+            start_datetime__gte=window_start,
+            start_datetime__lt=window_end,
         )
         .select_related('facility', 'user')
         .order_by('start_datetime')
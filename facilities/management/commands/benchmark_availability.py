@@ -0,0 +1,95 @@
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings.models import BookingRequest
+from facilities.services import SLOT_GRANULARITIES, build_availability_slots
+
+SyntheticBooking = namedtuple('SyntheticBooking', ['start_datetime', 'end_datetime', 'status'])
+
+
+def _rescan_slots(*, open_dt, close_dt, bookings, slot_minutes):
+    """The previous slot-by-slot implementation, kept here as the baseline."""
+    slots = []
+    slot_start = open_dt
+    while slot_start < close_dt:
+        slot_end = min(slot_start + timedelta(minutes=slot_minutes), close_dt)
+        state = 'free'
+        for booking in bookings:
+            if booking.start_datetime < slot_end and booking.end_datetime > slot_start:
+                if booking.status == BookingRequest.STATUS_APPROVED:
+                    state = 'booked'
+                    break
+                state = 'pending'
+        slots.append({
+            'label': (
+                f'{timezone.localtime(slot_start).strftime("%H:%M")} - '
+                f'{timezone.localtime(slot_end).strftime("%H:%M")}'
+            ),
+            'state': state,
+        })
+        slot_start = slot_end
+    return slots
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark availability slot classification over a synthetic campus day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facilities', type=int, default=50)
+        parser.add_argument('--bookings', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        day = timezone.localdate()
+        open_dt = timezone.make_aware(
+            datetime.combine(day, datetime.min.time()) + timedelta(hours=8),
+            timezone.get_current_timezone(),
+        )
+        close_dt = open_dt + timedelta(hours=12)
+
+        per_facility = [[] for _ in range(options['facilities'])]
+        for _ in range(options['bookings']):
+            start = open_dt + timedelta(minutes=15 * rng.randrange(0, 44))
+            end = min(start + timedelta(minutes=15 * rng.randint(2, 16)), close_dt)
+            status = rng.choice([BookingRequest.STATUS_APPROVED, BookingRequest.STATUS_PENDING])
+            per_facility[rng.randrange(options['facilities'])].append(SyntheticBooking(start, end, status))
+        for bookings in per_facility:
+            bookings.sort(key=lambda booking: booking.start_datetime)
+
+        self.stdout.write(
+            f'{options["facilities"]} facilities, {options["bookings"]} bookings, '
+            f'best of {options["repeat"]} runs per day'
+        )
+        for slot_minutes in SLOT_GRANULARITIES:
+            timings = {}
+            for name, implementation in (('rescan', _rescan_slots), ('sweep', build_availability_slots)):
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    for bookings in per_facility:
+                        implementation(
+                            open_dt=open_dt,
+                            close_dt=close_dt,
+                            bookings=bookings,
+                            slot_minutes=slot_minutes,
+                        )
+                    best = min(best, time.perf_counter() - started)
+                timings[name] = best * 1000
+
+            for bookings in per_facility:
+                kwargs = {'open_dt': open_dt, 'close_dt': close_dt, 'bookings': bookings, 'slot_minutes': slot_minutes}
+                if _rescan_slots(**kwargs) != build_availability_slots(**kwargs):
+                    self.stderr.write(self.style.ERROR(f'Sweep result differs from rescan at {slot_minutes} min.'))
+                    return
+
+            self.stdout.write(
+                f'{slot_minutes:>3} min slots: rescan {timings["rescan"]:8.2f} ms | '
+                f'sweep {timings["sweep"]:8.2f} ms'
+            )
@@ -2,8 +2,12 @@ from datetime import datetime, time, timedelta
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
+from users.permissions import get_permission_context
+
 
 class Facility(models.Model):
     """
@@ -58,17 +62,15 @@ class Facility(models.Model):
         return f'{self.name} ({self.get_facility_type_display()})'
 
     def is_managed_by(self, user):
-        """Return True when the user is an assigned manager, dept admin for the facility, or system admin."""
+        """
+        Return True when the user is an assigned manager, dept admin for the facility, or system admin.
+
+        Uses the user's memoized permission context, which suits display checks; services that
+        change data check `load_permission_context(user).manages(facility)` instead.
+        """
         if not user or not user.is_authenticated:
             return False
-        profile = getattr(user, 'profile', None)
-        if not profile:
-            return False
-        if profile.is_sys_admin():
-            return True
-        if profile.is_dept_admin() and self.department_id == profile.department_id:
-            return True
-        return self.managers.filter(id=user.id).exists()
+        return get_permission_context(user).manages(self)
 
     def get_open_datetime(self, booking_date):
         """Build an aware datetime for the facility opening time on a given day."""
@@ -107,3 +109,16 @@ class Facility(models.Model):
     def amenity_list(self):
         """Return a clean list of amenity tags."""
         return [tag.strip() for tag in self.amenities.split(',') if tag.strip()]
+
+
+@receiver(m2m_changed, sender=Facility.managers.through)
+@receiver(post_save, sender=Facility)
+@receiver(post_delete, sender=Facility)
+@receiver(post_save, sender='users.UserProfile')
+def reset_facility_scopes(sender, action=None, **kwargs):
+    """Drop cached visible-facility sets when managers, facilities or roles change."""
+    from .services import invalidate_facility_scopes
+
+    if action is not None and not action.startswith('post_'):
+        return
+    invalidate_facility_scopes()
@@ -1,28 +1,313 @@
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import timedelta
+from functools import partial
+from heapq import heappop, heappush
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 
-from bookings.models import BookingRequest
+from bookings.models import BookingPolicy, BookingRequest
+from core.profiling import profile_span
+from core.utils import local_date_bounds, local_day_start
+from users.permissions import get_permission_context
 
+from .models import Facility
 
-def get_facility_availability_map(*, facilities, booking_date):
+SLOT_GRANULARITIES = (15, 30, 60)
+
+# Day bitmaps keep two bits per 15-minute slot: one mask of slots touched by a
+# pending request and one of slots covered by an approved booking.
+BITMAP_SLOT = timedelta(minutes=15)
+BITMAP_CACHE_PREFIX = 'facility-day-bitmap'
+
+# Visible-facility sets are cached per user under a shared generation number;
+# bumping the generation invalidates every cached set at once.
+SCOPE_CACHE_PREFIX = 'facility-scope'
+SCOPE_GENERATION_KEY = f'{SCOPE_CACHE_PREFIX}:generation'
+
+
+def _scope_generation():
+    generation = cache.get(SCOPE_GENERATION_KEY)
+    if generation is None:
+        cache.add(SCOPE_GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(SCOPE_GENERATION_KEY, 1)
+    return generation
+
+
+def invalidate_facility_scopes():
+    """Forget every cached visible-facility set, e.g. after a manager change."""
+    try:
+        cache.incr(SCOPE_GENERATION_KEY)
+    except ValueError:
+        cache.add(SCOPE_GENERATION_KEY, 1, timeout=None)
+
+
+def get_visible_facility_ids(user):
+    """
+    Return the ids of the facilities `user` administers, or None for all of them.
+
+    System admins see every facility, department admins their department's
+    facilities and everyone else the facilities they manage. Managed sets come
+    straight from the permission context; department sets are memoized on the
+    user object for the rest of the request and, when `SCOPE_CACHE_TIMEOUT` is
+    set, cached across requests until `invalidate_facility_scopes` runs or the
+    timeout passes.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    access = get_permission_context(user)
+    if access.is_sys_admin:
+        return None
+    if not access.is_dept_admin:
+        return access.managed_facility_ids
+
+    visible_ids = getattr(user, '_visible_facility_ids', None)
+    if visible_ids is None:
+        timeout = getattr(settings, 'SCOPE_CACHE_TIMEOUT', 0)
+        key = f'{SCOPE_CACHE_PREFIX}:{_scope_generation()}:{user.pk}' if timeout else None
+        visible_ids = cache.get(key) if key else None
+        if visible_ids is None:
+            visible_ids = frozenset(
+                Facility.objects.filter(department=access.department_id).order_by().values_list('pk', flat=True)
+            )
+            if key:
+                cache.set(key, visible_ids, timeout=timeout)
+        user._visible_facility_ids = visible_ids
+    return visible_ids
+
+
+def filter_visible_facilities(queryset, user, *, field='facility_id'):
+    """Limit `queryset` to rows whose `field` is a facility `user` may see."""
+    visible_ids = get_visible_facility_ids(user)
+    if visible_ids is None:
+        return queryset
+    return queryset.filter(**{f'{field}__in': visible_ids})
+
+
+def build_availability_slots(*, open_dt, close_dt, bookings, slot_minutes=60):
+    """
+    Classify each slot between `open_dt` and `close_dt` as free, pending or booked.
+
+    `bookings` must be sorted by `start_datetime`. A single sweep walks the slots
+    and the bookings together: bookings enter an end-time heap once their start
+    falls before the slot end and leave it once they finish, so every booking is
+    touched a constant number of times no matter how fine the slot grid is.
+    """
+    if slot_minutes not in SLOT_GRANULARITIES:
+        raise ValueError(f'slot_minutes must be one of {SLOT_GRANULARITIES}, got {slot_minutes!r}.')
+
+    step = timedelta(minutes=slot_minutes)
+    active = []
+    active_approved = active_pending = 0
+    position = 0
+    slots = []
+
+    slot_start = open_dt
+    start_label = timezone.localtime(slot_start).strftime('%H:%M')
+    while slot_start < close_dt:
+        slot_end = min(slot_start + step, close_dt)
+        end_label = timezone.localtime(slot_end).strftime('%H:%M')
+
+        while position < len(bookings) and bookings[position].start_datetime < slot_end:
+            booking = bookings[position]
+            position += 1
+            if booking.end_datetime <= slot_start:
+                continue
+            is_approved = booking.status == BookingRequest.STATUS_APPROVED
+            heappush(active, (booking.end_datetime, position, is_approved))
+            if is_approved:
+                active_approved += 1
+            else:
+                active_pending += 1
+
+        while active and active[0][0] <= slot_start:
+            _, _, is_approved = heappop(active)
+            if is_approved:
+                active_approved -= 1
+            else:
+                active_pending -= 1
+
+        if active_approved:
+            state = 'booked'
+        elif active_pending:
+            state = 'pending'
+        else:
+            state = 'free'
+
+        slots.append({'label': f'{start_label} - {end_label}', 'state': state})
+        slot_start, start_label = slot_end, end_label
+
+    return slots
+
+
+def _bitmap_cache_key(facility_id, booking_date):
+    return f'{BITMAP_CACHE_PREFIX}:{facility_id}:{booking_date.isoformat()}'
+
+
+def _slot_mask(day_start, start_datetime, end_datetime):
+    """Return a mask of the 15-minute slots touched by a window."""
+    first = max((start_datetime - day_start) // BITMAP_SLOT, 0)
+    last = -((day_start - end_datetime) // BITMAP_SLOT)  # ceiling division
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def build_day_bitmap(*, booking_date, bookings):
+    """Fold a facility-day's active bookings into `(pending_mask, booked_mask)`."""
+    day_start = local_day_start(booking_date)
+    pending_mask = booked_mask = 0
+    for booking in bookings:
+        mask = _slot_mask(day_start, booking.start_datetime, booking.end_datetime)
+        if booking.status == BookingRequest.STATUS_APPROVED:
+            booked_mask |= mask
+        else:
+            pending_mask |= mask
+    return pending_mask, booked_mask
+
+
+def _load_bitmaps(keys):
+    """Build bitmaps for `(facility_id, date)` pairs from one booking query."""
+    facility_ids = {facility_id for facility_id, _ in keys}
+    dates = [booking_date for _, booking_date in keys]
+    rows = (
+        BookingRequest.objects
+        .filter(
+            facility_id__in=facility_ids,
+            status__in=[BookingRequest.STATUS_APPROVED, BookingRequest.STATUS_PENDING],
+            start_datetime__lt=local_day_start(max(dates)) + timedelta(days=1),
+            end_datetime__gt=local_day_start(min(dates)),
+        )
+        .order_by()
+        .values_list('facility_id', 'start_datetime', 'end_datetime', 'status', named=True)
+    )
+    # Bookings never span midnight, so the local start date identifies the day.
+    grouped_bookings = defaultdict(list)
+    for row in rows:
+        grouped_bookings[(row.facility_id, timezone.localtime(row.start_datetime).date())].append(row)
+    return {
+        key: build_day_bitmap(booking_date=key[1], bookings=grouped_bookings[key])
+        for key in keys
+    }
+
+
+def get_bitmaps(keys):
+    """
+    Return `{(facility_id, date): (pending_mask, booked_mask)}` for the given pairs.
+
+    Bitmaps are served from the cache; missing pairs are rebuilt with a single
+    booking query and written back.
+    """
+    cache_keys = {_bitmap_cache_key(*key): key for key in keys}
+    cached = cache.get_many(list(cache_keys))
+    bitmaps = {cache_keys[cache_key]: tuple(value) for cache_key, value in cached.items()}
+
+    missing = [key for key in cache_keys.values() if key not in bitmaps]
+    if missing:
+        loaded = _load_bitmaps(missing)
+        cache.set_many(
+            {_bitmap_cache_key(*key): bitmap for key, bitmap in loaded.items()},
+            timeout=getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 60 * 60 * 24),
+        )
+        bitmaps.update(loaded)
+    return bitmaps
+
+
+def get_day_bitmaps(facility_ids, booking_date):
+    """Return `{facility_id: (pending_mask, booked_mask)}` for one day."""
+    bitmaps = get_bitmaps([(facility_id, booking_date) for facility_id in facility_ids])
+    return {facility_id: bitmaps[(facility_id, booking_date)] for facility_id in facility_ids}
+
+
+def refresh_day_bitmap(facility_id, booking_date):
+    """Rebuild and re-cache the bitmap for one facility-day."""
+    bitmap = _load_bitmaps([(facility_id, booking_date)])[(facility_id, booking_date)]
+    cache.set(
+        _bitmap_cache_key(facility_id, booking_date),
+        bitmap,
+        timeout=getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 60 * 60 * 24),
+    )
+    return bitmap
+
+
+def schedule_availability_refresh(booking_request):
+    """
+    Refresh the bitmaps of the facility-day the booking occupies, and of the one
+    it occupied when it was loaded if it has moved, once the transaction commits.
+    """
+    keys = {(booking_request.facility_id, booking_request.date)}
+    if booking_request.loaded_state is not None:
+        facility_id, _, start_datetime, _ = booking_request.loaded_state
+        keys.add((facility_id, timezone.localtime(start_datetime).date()))
+    for key in sorted(keys):
+        transaction.on_commit(partial(refresh_day_bitmap, *key))
+
+
+def slots_from_bitmap(bitmap, *, open_dt, close_dt, slot_minutes=60):
+    """Render a day bitmap as the same slot dicts `build_availability_slots` returns."""
+    if slot_minutes not in SLOT_GRANULARITIES:
+        raise ValueError(f'slot_minutes must be one of {SLOT_GRANULARITIES}, got {slot_minutes!r}.')
+
+    pending_mask, booked_mask = bitmap
+    day_start = local_day_start(timezone.localtime(open_dt).date())
+    step = timedelta(minutes=slot_minutes)
+    slots = []
+
+    slot_start = open_dt
+    start_label = timezone.localtime(slot_start).strftime('%H:%M')
+    while slot_start < close_dt:
+        slot_end = min(slot_start + step, close_dt)
+        end_label = timezone.localtime(slot_end).strftime('%H:%M')
+        mask = _slot_mask(day_start, slot_start, slot_end)
+        if booked_mask & mask:
+            state = 'booked'
+        elif pending_mask & mask:
+            state = 'pending'
+        else:
+            state = 'free'
+        slots.append({'label': f'{start_label} - {end_label}', 'state': state})
+        slot_start, start_label = slot_end, end_label
+
+    return slots
+
+
+@profile_span('facilities.cached_availability_map')
+def get_cached_availability_map(*, facilities, booking_date, slot_minutes=60):
+    """
+    Build availability slots for the supplied facilities from cached day bitmaps.
+
+    With a warm cache this does not query `BookingRequest` at all.
+    """
+    facilities = list(facilities)
+    bitmaps = get_day_bitmaps([facility.pk for facility in facilities], booking_date)
+    return {
+        facility.pk: slots_from_bitmap(
+            bitmaps[facility.pk],
+            open_dt=facility.get_open_datetime(booking_date),
+            close_dt=facility.get_close_datetime(booking_date),
+            slot_minutes=slot_minutes,
+        )
+        for facility in facilities
+    }
+
+
+@profile_span('facilities.availability_map')
+def get_facility_availability_map(*, facilities, booking_date, slot_minutes=60):
     """
     Build availability slots for the supplied facilities using one booking query.
 
-    The timeline keeps the current one-hour visual grid, but overlap checks are done
-    in Python against pre-fetched bookings instead of repeated database lookups.
+    Slots default to the one-hour visual grid; `slot_minutes` may also be 15 or 30.
+    Overlap checks are done in Python against pre-fetched bookings instead of
+    repeated database lookups.
     """
 
     facilities = list(facilities)
     if not facilities:
         return {}
 
-    day_start = timezone.make_aware(
-        datetime.combine(booking_date, datetime.min.time()),
-        timezone.get_current_timezone(),
-    )
-    day_end = day_start + timedelta(days=1)
+    day_start, day_end = local_date_bounds(booking_date)
 
     bookings = (
         BookingRequest.objects
@@ -32,8 +317,8 @@ def get_facility_availability_map(*, facilities, booking_date):
             start_datetime__lt=day_end,
             end_datetime__gt=day_start,
         )
-        .select_related('facility')
         .order_by('start_datetime')
+        .values_list('facility_id', 'start_datetime', 'end_datetime', 'status', named=True)
     )
 
     grouped_bookings = defaultdict(list)
@@ -42,30 +327,116 @@ def get_facility_availability_map(*, facilities, booking_date):
 
     availability = {}
     for facility in facilities:
-        open_dt = facility.get_open_datetime(booking_date)
-        close_dt = facility.get_close_datetime(booking_date)
-        slot_start = open_dt
-        slots = []
-
-        while slot_start < close_dt:
-            slot_end = min(slot_start + timedelta(hours=1), close_dt)
-            state = 'free'
-            for booking in grouped_bookings.get(facility.pk, []):
-                if booking.start_datetime < slot_end and booking.end_datetime > slot_start:
-                    if booking.status == BookingRequest.STATUS_APPROVED:
-                        state = 'booked'
-                        break
-                    state = 'pending'
-
-            slots.append({
-                'label': (
-                    f'{timezone.localtime(slot_start).strftime("%H:%M")} - '
-                    f'{timezone.localtime(slot_end).strftime("%H:%M")}'
-                ),
-                'state': state,
-            })
-            slot_start = slot_end
-
-        availability[facility.pk] = slots
+        availability[facility.pk] = build_availability_slots(
+            open_dt=facility.get_open_datetime(booking_date),
+            close_dt=facility.get_close_datetime(booking_date),
+            bookings=grouped_bookings.get(facility.pk, []),
+            slot_minutes=slot_minutes,
+        )
 
     return availability
+
+
+def _free_runs(mask):
+    """Yield `(first_slot, length)` for each run of set bits in `mask`."""
+    while mask:
+        first = (mask & -mask).bit_length() - 1
+        shifted = mask >> first
+        length = (~shifted & (shifted + 1)).bit_length() - 1
+        yield first, length
+        mask &= ~(((1 << length) - 1) << first)
+
+
+@profile_span('facilities.free_windows')
+def find_free_windows(
+    *, duration, start_date=None, end_date=None,
+    facility_type='', min_capacity=None, amenity='', limit=5,
+):
+    """
+    Return the earliest free windows of `duration` across matching facilities.
+
+    Each facility-day is reduced to a mask of free 15-minute slots inside opening
+    hours (and after the current time for today), and the runs of free slots are
+    read off with bit arithmetic, so the search never walks slot by slot. A
+    window is reported at the start of every free run long enough to hold the
+    requested duration. Facilities whose booking policy caps bookings below
+    `duration` are skipped, and days beyond a facility's `max_advance_days` are
+    not searched.
+
+    Returns up to `limit` dicts with `facility`, `start_datetime`,
+    `end_datetime` and `free_until`, ordered by start time.
+    """
+    if duration <= timedelta():
+        raise ValueError('duration must be positive.')
+
+    today = timezone.localdate()
+    start_date = max(start_date or today, today)
+    end_date = end_date or (start_date + timedelta(days=30))
+    slots_needed = -(-duration // BITMAP_SLOT)
+
+    facilities = Facility.objects.filter(is_active=True).select_related('booking_policy')
+    if facility_type:
+        facilities = facilities.filter(facility_type=facility_type)
+    if min_capacity:
+        facilities = facilities.filter(capacity__gte=min_capacity)
+    if amenity:
+        facilities = facilities.filter(amenities__icontains=amenity)
+
+    default_policy = BookingPolicy()
+    last_dates = {}
+    candidates = []
+    for facility in facilities:
+        policy = getattr(facility, 'booking_policy', None) or default_policy
+        if duration > timedelta(hours=policy.max_duration_hours):
+            continue
+        last_dates[facility.pk] = min(end_date, today + timedelta(days=policy.max_advance_days))
+        candidates.append(facility)
+
+    if not candidates or start_date > end_date:
+        return []
+
+    now = timezone.now()
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    windows = []
+    # Bitmaps are fetched a week at a time so an early hit avoids loading the whole horizon.
+    for chunk_start in range(0, len(days), 7):
+        chunk = days[chunk_start:chunk_start + 7]
+        bitmaps = get_bitmaps([
+            (facility.pk, day)
+            for day in chunk
+            for facility in candidates
+            if day <= last_dates[facility.pk]
+        ])
+
+        for day in chunk:
+            day_start = local_day_start(day)
+            not_before = -((day_start - now) // BITMAP_SLOT) if day == today else 0
+            for facility in candidates:
+                if day > last_dates[facility.pk]:
+                    continue
+                # Opening hours as slot offsets from local midnight.
+                first_slot = max(-((day_start - facility.get_open_datetime(day)) // BITMAP_SLOT), not_before)
+                last_slot = (facility.get_close_datetime(day) - day_start) // BITMAP_SLOT
+                if last_slot - first_slot < slots_needed:
+                    continue
+
+                pending_mask, booked_mask = bitmaps[(facility.pk, day)]
+                open_mask = ((1 << (last_slot - first_slot)) - 1) << first_slot
+                for first, length in _free_runs(open_mask & ~(pending_mask | booked_mask)):
+                    if length < slots_needed:
+                        continue
+                    window_start = day_start + first * BITMAP_SLOT
+                    windows.append({
+                        'facility': facility,
+                        'start_datetime': window_start,
+                        'end_datetime': window_start + duration,
+                        'free_until': day_start + (first + length) * BITMAP_SLOT,
+                    })
+
+            # Every window on a later day starts later, so stop once we have enough.
+            if len(windows) >= limit:
+                windows.sort(key=lambda window: (window['start_datetime'], window['facility'].name))
+                return windows[:limit]
+
+    windows.sort(key=lambda window: (window['start_datetime'], window['facility'].name))
+    return windows[:limit]
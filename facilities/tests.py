@@ -1,2 +1,330 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import BookingRequest
+from bookings.services import approve_booking_request, submit_booking_request
+from core.seeding import seed_campus
+from core.testing import QueryCheckingClient
+from users.models import Department
+
+from .models import Facility
+from .services import (
+    build_availability_slots,
+    find_free_windows,
+    get_bitmaps,
+    get_day_bitmaps,
+    get_visible_facility_ids,
+)
+
+Booking = namedtuple('Booking', ['start_datetime', 'end_datetime', 'status'])
+
+
+class AvailabilitySlotTests(SimpleTestCase):
+    def make_datetime(self, hour, minute=0):
+        return timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=1), time(hour=hour, minute=minute)),
+            timezone.get_current_timezone(),
+        )
+
+    def test_sweep_classifies_slots_at_each_granularity(self):
+        bookings = [
+            Booking(self.make_datetime(8, 30), self.make_datetime(9, 15), BookingRequest.STATUS_PENDING),
+            Booking(self.make_datetime(9, 0), self.make_datetime(9, 30), BookingRequest.STATUS_APPROVED),
+            Booking(self.make_datetime(10, 45), self.make_datetime(11, 0), BookingRequest.STATUS_PENDING),
+        ]
+
+        hourly = build_availability_slots(
+            open_dt=self.make_datetime(8),
+            close_dt=self.make_datetime(12),
+            bookings=bookings,
+        )
+        self.assertEqual([slot['state'] for slot in hourly], ['pending', 'booked', 'pending', 'free'])
+        self.assertEqual(hourly[0]['label'], '08:00 - 09:00')
+
+        quarter_hours = build_availability_slots(
+            open_dt=self.make_datetime(8),
+            close_dt=self.make_datetime(10),
+            bookings=bookings,
+            slot_minutes=15,
+        )
+        self.assertEqual(
+            [slot['state'] for slot in quarter_hours],
+            ['free', 'free', 'pending', 'pending', 'booked', 'booked', 'free', 'free'],
+        )
+
+    def test_unsupported_granularity_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_availability_slots(
+                open_dt=self.make_datetime(8),
+                close_dt=self.make_datetime(9),
+                bookings=[],
+                slot_minutes=20,
+            )
+
+
+class AvailabilityBitmapTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='student', password='test123')
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(
+            name='Computer Lab 2',
+            facility_type='lab',
+            capacity=40,
+            open_time='08:00',
+            close_time='12:00',
+        )
+        self.facility.managers.add(self.manager)
+        self.booking_date = timezone.localdate() + timedelta(days=1)
+
+    def make_datetime(self, hour, minute=0):
+        return timezone.make_aware(
+            datetime.combine(self.booking_date, time(hour=hour, minute=minute)),
+            timezone.get_current_timezone(),
+        )
+
+    def test_booking_services_refresh_the_cached_bitmap(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = submit_booking_request(
+                user=self.student,
+                facility=self.facility,
+                start_datetime=self.make_datetime(9),
+                end_datetime=self.make_datetime(9, 30),
+                purpose='Lab practice',
+            )
+        with self.assertNumQueries(0):
+            pending_mask, booked_mask = get_day_bitmaps([self.facility.pk], self.booking_date)[self.facility.pk]
+        self.assertEqual(pending_mask, 0b11 << 36)
+        self.assertEqual(booked_mask, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_booking_request(booking_request=booking, acting_user=self.manager)
+        pending_mask, booked_mask = get_day_bitmaps([self.facility.pk], self.booking_date)[self.facility.pk]
+        self.assertEqual((pending_mask, booked_mask), (0, 0b11 << 36))
+
+    def test_direct_saves_and_deletes_refresh_the_cached_bitmaps(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = submit_booking_request(
+                user=self.student,
+                facility=self.facility,
+                start_datetime=self.make_datetime(9),
+                end_datetime=self.make_datetime(9, 30),
+                purpose='Lab practice',
+            )
+        next_day = self.booking_date + timedelta(days=1)
+        get_bitmaps([(self.facility.pk, self.booking_date), (self.facility.pk, next_day)])
+
+        # An edit made through the admin site moves the booking to the next day.
+        booking = BookingRequest.objects.get(pk=booking.pk)
+        booking.status = BookingRequest.STATUS_APPROVED
+        booking.start_datetime += timedelta(days=1)
+        booking.end_datetime += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        with self.assertNumQueries(0):
+            bitmaps = get_bitmaps([(self.facility.pk, self.booking_date), (self.facility.pk, next_day)])
+        self.assertEqual(bitmaps[(self.facility.pk, self.booking_date)], (0, 0))
+        self.assertEqual(bitmaps[(self.facility.pk, next_day)], (0, 0b11 << 36))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertEqual(get_day_bitmaps([self.facility.pk], next_day)[self.facility.pk], (0, 0))
+
+    def test_list_view_renders_from_warm_bitmaps_without_booking_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_booking_request(
+                user=self.student,
+                facility=self.facility,
+                start_datetime=self.make_datetime(10),
+                end_datetime=self.make_datetime(11),
+                purpose='Lab practice',
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('facilities:list'), {'avail_date': self.booking_date.isoformat()})
+
+        self.assertFalse(any('bookings_bookingrequest' in query['sql'] for query in queries.captured_queries))
+        facility = response.context['facilities'][0]
+        self.assertEqual([slot['state'] for slot in facility.slots], ['free', 'free', 'pending', 'free'])
+
+
+class FreeWindowSearchTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='student', password='test123')
+        self.lab = Facility.objects.create(
+            name='Robotics Lab',
+            facility_type='lab',
+            capacity=20,
+            amenities='projector,PC',
+            open_time='09:00',
+            close_time='12:00',
+        )
+        self.hall = Facility.objects.create(
+            name='Main Hall',
+            facility_type='hall',
+            capacity=300,
+            open_time='09:00',
+            close_time='12:00',
+        )
+        self.search_date = timezone.localdate() + timedelta(days=2)
+
+    def make_datetime(self, hour, minute=0):
+        return timezone.make_aware(
+            datetime.combine(self.search_date, time(hour=hour, minute=minute)),
+            timezone.get_current_timezone(),
+        )
+
+    def test_search_skips_occupied_slots_and_applies_filters(self):
+        submit_booking_request(
+            user=self.student,
+            facility=self.lab,
+            start_datetime=self.make_datetime(9),
+            end_datetime=self.make_datetime(10, 15),
+            purpose='Morning session',
+        )
+
+        windows = find_free_windows(
+            duration=timedelta(minutes=90),
+            start_date=self.search_date,
+            end_date=self.search_date,
+            facility_type='lab',
+            amenity='projector',
+        )
+
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0]['facility'], self.lab)
+        self.assertEqual(windows[0]['start_datetime'], self.make_datetime(10, 15))
+        self.assertEqual(windows[0]['free_until'], self.make_datetime(12))
+
+    def test_default_horizon_runs_from_the_start_date(self):
+        policy = self.lab.booking_policy
+        policy.max_advance_days = 90
+        policy.save()
+        start_date = timezone.localdate() + timedelta(days=40)
+
+        windows = find_free_windows(duration=timedelta(hours=1), start_date=start_date, facility_type='lab')
+
+        self.assertEqual(timezone.localtime(windows[0]['start_datetime']).date(), start_date)
+        self.assertEqual(timezone.localtime(windows[0]['start_datetime']).time(), time(9))
+
+    def test_search_respects_booking_policy_limits(self):
+        policy = self.hall.booking_policy
+        policy.max_duration_hours = 1
+        policy.save()
+        policy = self.lab.booking_policy
+        policy.max_advance_days = 1
+        policy.save()
+
+        windows = find_free_windows(
+            duration=timedelta(hours=2),
+            start_date=self.search_date,
+            end_date=self.search_date,
+        )
+
+        self.assertEqual(windows, [])
+
+    def test_free_slot_endpoint_returns_earliest_windows(self):
+        response = self.client.get(reverse('facilities:free_slots'), {
+            'duration': 60,
+            'start': self.search_date.isoformat(),
+            'end': self.search_date.isoformat(),
+            'limit': 3,
+        })
+
+        results = response.json()['results']
+        self.assertEqual([result['facility_name'] for result in results], ['Main Hall', 'Robotics Lab'])
+        self.assertTrue(all(result['start'].endswith('09:00:00+05:30') for result in results))
+
+
+class FacilityScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Computer Science', code='CS')
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.lab = Facility.objects.create(
+            name='Robotics Lab', facility_type='lab', capacity=20, department=self.department,
+        )
+        self.hall = Facility.objects.create(name='Main Hall', facility_type='hall', capacity=300)
+        self.lab.managers.add(self.manager)
+
+    def fresh_user(self, user):
+        return User.objects.get(pk=user.pk)
+
+    def test_visible_ids_come_from_one_permission_query_per_request(self):
+        manager = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_visible_facility_ids(manager), {self.lab.pk})
+            self.assertTrue(self.lab.is_managed_by(manager))
+            self.assertFalse(self.hall.is_managed_by(manager))
+
+    def test_department_sets_are_cached_across_requests(self):
+        profile = self.manager.profile
+        profile.role = 'dept_admin'
+        profile.department = self.department
+        profile.save()
+        get_visible_facility_ids(User.objects.get(pk=self.manager.pk))
+
+        next_request_user = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_visible_facility_ids(next_request_user), {self.lab.pk})
+
+    @override_settings(SCOPE_CACHE_TIMEOUT=0)
+    def test_department_sets_stay_per_request_without_a_scope_timeout(self):
+        profile = self.manager.profile
+        profile.role = 'dept_admin'
+        profile.department = self.department
+        profile.save()
+        get_visible_facility_ids(User.objects.get(pk=self.manager.pk))
+
+        next_request_user = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(get_visible_facility_ids(next_request_user), {self.lab.pk})
+            self.assertEqual(get_visible_facility_ids(next_request_user), {self.lab.pk})
+
+    def test_manager_and_role_changes_invalidate_cached_sets(self):
+        get_visible_facility_ids(self.fresh_user(self.manager))
+
+        self.hall.managers.add(self.manager)
+        self.assertEqual(get_visible_facility_ids(self.fresh_user(self.manager)), {self.lab.pk, self.hall.pk})
+
+        profile = self.manager.profile
+        profile.role = 'dept_admin'
+        profile.department = self.department
+        profile.save()
+        self.assertEqual(get_visible_facility_ids(self.fresh_user(self.manager)), {self.lab.pk})
+
+        profile.role = 'sys_admin'
+        profile.save()
+        self.assertIsNone(get_visible_facility_ids(self.fresh_user(self.manager)))
+
+
+class FacilityViewQueryTests(TestCase):
+    client_class = QueryCheckingClient
+
+    def setUp(self):
+        cache.clear()
+        self.campus = seed_campus(departments=2, facilities=6, users=12, bookings=200, seed=3)
+
+    def test_facility_pages_do_not_query_per_row(self):
+        facility = Facility.objects.first()
+        for username in (self.campus.requester, self.campus.manager, self.campus.sys_admin):
+            self.client.force_login(User.objects.get(username=username))
+            for url in (reverse('facilities:list'), reverse('facilities:detail', args=[facility.pk])):
+                with self.subTest(username=username, url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.get(reverse('facilities:free_slots'), {'duration': 60})
+        self.assertEqual(response.status_code, 200)
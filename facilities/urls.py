@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     FacilityListView, FacilityDetailView,
     FacilityCreateView, FacilityUpdateView, FacilityDeleteView,
+    free_slot_search,
 )
 
 app_name = 'facilities'
@@ -10,6 +11,7 @@ urlpatterns = [
     path('',              FacilityListView.as_view(),   name='list'),
     path('<int:pk>/',     FacilityDetailView.as_view(), name='detail'),
     path('create/',       FacilityCreateView.as_view(), name='create'),
+    path('free-slots/',   free_slot_search,             name='free_slots'),
     path('<int:pk>/edit/',   FacilityUpdateView.as_view(), name='edit'),
     path('<int:pk>/delete/', FacilityDeleteView.as_view(), name='delete'),
 ]
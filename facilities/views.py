@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -9,20 +10,18 @@ from django.views.generic import CreateView, DeleteView, DetailView, ListView, U
 
 from core.models import ActivityLog
 from core.services import log_activity
+from users.permissions import get_permission_context
 
 from .forms import FacilityForm
 from .models import Facility
-from .services import get_facility_availability_map
+from .services import find_free_windows, get_cached_availability_map
 
 
 class SysAdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     """Class-based view equivalent of the sys_admin_required decorator."""
 
     def test_func(self):
-        try:
-            return self.request.user.profile.is_sys_admin()
-        except Exception:
-            return False
+        return get_permission_context(self.request.user).is_sys_admin
 
     def handle_no_permission(self):
         messages.error(self.request, 'Only system admins can perform this action.')
@@ -74,7 +73,7 @@ class FacilityListView(ListView):
             avail_date = timezone.localdate()
 
         page_facilities = list(context['facilities'])
-        availability_map = get_facility_availability_map(
+        availability_map = get_cached_availability_map(
             facilities=page_facilities,
             booking_date=avail_date,
         )
@@ -87,6 +86,53 @@ class FacilityListView(ListView):
         return context
 
 
+def _parse_search_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def free_slot_search(request):
+    """
+    Return the earliest free windows across facilities as JSON.
+
+    Query params:
+        duration (minutes)  — required length of the booking
+        start / end         — YYYY-MM-DD search range (default: today, +30 days)
+        type, min_capacity, amenity — same filters as the facility list
+        limit               — number of windows to return (default 5, max 50)
+    """
+    try:
+        duration_minutes = int(request.GET.get('duration', ''))
+        limit = min(int(request.GET.get('limit', 5)), 50)
+        min_capacity = int(request.GET.get('min_capacity') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'duration, limit and min_capacity must be integers.'}, status=400)
+    if duration_minutes <= 0 or limit <= 0:
+        return JsonResponse({'error': 'duration and limit must be positive.'}, status=400)
+
+    windows = find_free_windows(
+        duration=timedelta(minutes=duration_minutes),
+        start_date=_parse_search_date(request.GET.get('start')),
+        end_date=_parse_search_date(request.GET.get('end')),
+        facility_type=request.GET.get('type', '').strip(),
+        min_capacity=min_capacity,
+        amenity=request.GET.get('amenity', '').strip(),
+        limit=limit,
+    )
+    return JsonResponse({'results': [
+        {
+            'facility_id': window['facility'].pk,
+            'facility_name': window['facility'].name,
+            'start': timezone.localtime(window['start_datetime']).isoformat(),
+            'end': timezone.localtime(window['end_datetime']).isoformat(),
+            'free_until': timezone.localtime(window['free_until']).isoformat(),
+        }
+        for window in windows
+    ]})
+
+
 class FacilityDetailView(DetailView):
     model = Facility
     template_name = 'facilities/detail.html'
@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'event', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'event')
+    search_fields = ('recipient', 'subject')
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'event', 'booking_request', 'recipient', 'subject', 'body',
+        'attempts', 'last_error', 'created_at', 'sent_at',
+    )
+
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Retry selected notifications on the next drain')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=NotificationOutbox.STATUS_SENT).update(
+            status=NotificationOutbox.STATUS_PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} notification(s) queued for retry.', level='success')
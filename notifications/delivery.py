@@ -0,0 +1,102 @@
+"""
+Delivery engine for queued notifications.
+
+Claimed outbox entries are turned into email messages, optionally collapsing
+every entry for the same recipient into a single digest, and the whole batch
+goes out through one `send_messages` call on a shared connection. If that
+call fails the batch is retried message by message, so one bad recipient
+only holds back its own mail. Delivery is at-least-once: messages sent before
+a mid-batch failure may go out again on the per-message retry.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+Delivery = namedtuple('Delivery', ['message', 'entries'])
+
+DIGEST_SUBJECT = '{count} updates to your booking requests'
+DIGEST_SEPARATOR = '\n' + '-' * 40 + '\n'
+
+
+def _digest_message(recipient, entries, mail_connection):
+    # Each queued body already opens with its event and subject line.
+    body = DIGEST_SEPARATOR.join(entry.body for entry in entries)
+    return EmailMessage(
+        subject=DIGEST_SUBJECT.format(count=len(entries)),
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+        connection=mail_connection,
+    )
+
+
+def build_deliveries(entries, mail_connection, *, digest=False):
+    """Return one `Delivery` per outgoing email, grouping by recipient when `digest` is set."""
+    if not digest:
+        return [
+            Delivery(
+                EmailMessage(
+                    subject=entry.subject,
+                    body=entry.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[entry.recipient],
+                    connection=mail_connection,
+                ),
+                [entry],
+            )
+            for entry in entries
+        ]
+
+    grouped = {}
+    for entry in entries:
+        grouped.setdefault(entry.recipient, []).append(entry)
+    deliveries = []
+    for recipient, recipient_entries in grouped.items():
+        if len(recipient_entries) == 1:
+            deliveries.extend(build_deliveries(recipient_entries, mail_connection))
+        else:
+            deliveries.append(Delivery(_digest_message(recipient, recipient_entries, mail_connection), recipient_entries))
+    return deliveries
+
+
+def send_deliveries(deliveries, mail_connection):
+    """
+    Send `deliveries` over `mail_connection`.
+
+    Returns `(sent, failed, connection_ok)`: the deliveries that went out,
+    `(delivery, error)` pairs for those that did not, and whether the
+    connection is still usable. Deliveries after a failed reconnect are in
+    neither list and stay queued untouched.
+    """
+    if not deliveries:
+        return [], [], True
+    try:
+        mail_connection.send_messages([delivery.message for delivery in deliveries])
+        return list(deliveries), [], True
+    except Exception:
+        if not _reconnect(mail_connection):
+            return [], [], False
+
+    sent, failed = [], []
+    for delivery in deliveries:
+        try:
+            mail_connection.send_messages([delivery.message])
+        except Exception as exc:
+            failed.append((delivery, exc))
+            if not _reconnect(mail_connection):
+                return sent, failed, False
+        else:
+            sent.append(delivery)
+    return sent, failed, True
+
+
+def _reconnect(mail_connection):
+    """Replace a possibly broken connection; returns False if the server is unreachable."""
+    try:
+        mail_connection.close()
+        mail_connection.open()
+    except Exception:
+        return False
+    return True
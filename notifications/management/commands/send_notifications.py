@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued booking notifications from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Messages claimed per transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once drained.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            result = drain_outbox(batch_size=options['batch_size'])
+            if any(result):
+                self.stdout.write(
+                    f'Sent {result.sent}, retrying {result.retried}, gave up on {result.failed}.'
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,161 @@
+"""
+Transactional outbox for booking notifications.
+
+`enqueue_notification` runs inside the caller's transaction and only writes a
+row. `drain_outbox` is called by the `send_notifications` worker: it claims
+due rows in batches, hands them to the delivery engine (notifications/delivery.py)
+over one mail connection, marks successes as sent and reschedules failures
+with exponential backoff until they run out of attempts.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .delivery import build_deliveries, send_deliveries
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_SETTINGS = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF_SECONDS': 60,
+    'MAX_BACKOFF_SECONDS': 60 * 60,
+    'DIGEST_WINDOW_SECONDS': 0,
+}
+
+DrainResult = namedtuple('DrainResult', ['sent', 'retried', 'failed'])
+
+
+def get_outbox_settings():
+    return {**DEFAULT_OUTBOX_SETTINGS, **getattr(settings, 'NOTIFICATION_OUTBOX', {})}
+
+
+def _first_attempt_at():
+    # With digests on, hold new mail for the window so later events for the
+    # same recipient can be folded into one message.
+    return timezone.now() + timedelta(seconds=get_outbox_settings()['DIGEST_WINDOW_SECONDS'])
+
+
+def enqueue_notification(*, event, recipient, subject, body, booking_request=None):
+    """Store a notification for delivery once the current transaction commits."""
+    return NotificationOutbox.objects.create(
+        event=event,
+        booking_request=booking_request,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        next_attempt_at=_first_attempt_at(),
+    )
+
+
+def enqueue_notifications(entries):
+    """Store several unsaved `NotificationOutbox` entries with one INSERT."""
+    next_attempt_at = _first_attempt_at()
+    for entry in entries:
+        entry.next_attempt_at = next_attempt_at
+    return NotificationOutbox.objects.bulk_create(entries)
+
+
+def retry_delay(attempts, outbox_settings=None):
+    """Return how long to wait before the next try after `attempts` failures."""
+    outbox_settings = outbox_settings or get_outbox_settings()
+    delay = outbox_settings['RETRY_BACKOFF_SECONDS'] * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, outbox_settings['MAX_BACKOFF_SECONDS']))
+
+
+def _claim_batch(batch_size):
+    queryset = NotificationOutbox.objects.filter(
+        status=NotificationOutbox.STATUS_PENDING,
+        next_attempt_at__lte=timezone.now(),
+    ).order_by('next_attempt_at', 'pk')
+    if connection.features.has_select_for_update_skip_locked:
+        # Parallel workers each take different rows instead of queueing on the same ones.
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset[:batch_size])
+
+
+def _record_failure(entry, error, outbox_settings):
+    attempts = entry.attempts + 1
+    exhausted = attempts >= outbox_settings['MAX_ATTEMPTS']
+    NotificationOutbox.objects.filter(pk=entry.pk).update(
+        attempts=attempts,
+        status=NotificationOutbox.STATUS_FAILED if exhausted else NotificationOutbox.STATUS_PENDING,
+        next_attempt_at=timezone.now() + retry_delay(attempts, outbox_settings),
+        last_error=str(error)[:1000],
+    )
+    logger.warning('Notification %s to %s failed (attempt %s): %s', entry.pk, entry.recipient, attempts, error)
+    return exhausted
+
+
+def _send_batch(entries, mail_connection, outbox_settings):
+    """Send claimed entries; returns the batch's `DrainResult` and whether the connection is still usable."""
+    deliveries = build_deliveries(entries, mail_connection, digest=bool(outbox_settings['DIGEST_WINDOW_SECONDS']))
+    sent, failed, connection_ok = send_deliveries(deliveries, mail_connection)
+    if not connection_ok:
+        logger.warning('Mail server unavailable, stopping this drain.')
+
+    retried = gave_up = 0
+    for delivery, error in failed:
+        for entry in delivery.entries:
+            if _record_failure(entry, error, outbox_settings):
+                gave_up += 1
+            else:
+                retried += 1
+
+    sent_ids = [entry.pk for delivery in sent for entry in delivery.entries]
+    if sent_ids:
+        NotificationOutbox.objects.filter(pk__in=sent_ids).update(
+            status=NotificationOutbox.STATUS_SENT,
+            sent_at=timezone.now(),
+            attempts=F('attempts') + 1,
+            last_error='',
+        )
+    return DrainResult(len(sent_ids), retried, gave_up), connection_ok
+
+
+def drain_outbox(*, batch_size=None, max_batches=None, mail_connection=None):
+    """
+    Deliver due notifications until the outbox is empty or `max_batches` ran.
+
+    One mail connection is opened for the whole drain and reused by every
+    batch. Returns a `DrainResult` with the number of messages sent, retried
+    later and given up on.
+    """
+    outbox_settings = get_outbox_settings()
+    batch_size = batch_size or outbox_settings['BATCH_SIZE']
+    mail_connection = mail_connection or get_connection(fail_silently=False)
+    totals = DrainResult(0, 0, 0)
+    batches = 0
+
+    opened = False
+    try:
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                entries = _claim_batch(batch_size)
+                if not entries:
+                    break
+                if not opened:
+                    # Opened on the first non-empty batch, so idle polls never reach the mail server.
+                    try:
+                        mail_connection.open()
+                    except Exception as exc:
+                        logger.warning('Mail server unavailable, leaving the outbox for the next drain: %s', exc)
+                        break
+                    opened = True
+                result, connection_ok = _send_batch(entries, mail_connection, outbox_settings)
+            totals = DrainResult(*(total + count for total, count in zip(totals, result)))
+            batches += 1
+            if not connection_ok:
+                break
+    finally:
+        if opened:
+            mail_connection.close()
+    return totals
@@ -1,13 +1,11 @@
 """
 Notification service — the single point for all booking communication.
 
-Current behaviour: logs to Python's standard logger.
-
-To enable real email delivery in production:
-  1. Set EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend' in settings/prod.py
-  2. Set NOTIFICATIONS_ENABLED = True in settings/prod.py
-  3. Replace the `logger.info(...)` call below with `send_mail(...)` 
-     — everything else stays identical.
+With NOTIFICATIONS_ENABLED, each notification is written to the
+NotificationOutbox inside the caller's transaction and delivered later by
+`python manage.py send_notifications` (see notifications/outbox.py), so
+booking requests never wait on the mail server. Otherwise notifications are
+only logged.
 """
 
 import logging
@@ -15,18 +13,14 @@ import logging
 from django.conf import settings
 
 from .events import EVENT_SUBJECTS
+from .models import NotificationOutbox
+from .outbox import enqueue_notification, enqueue_notifications
 
 logger = logging.getLogger(__name__)
 
 
-def send_booking_notification(booking_request, event: str) -> None:
-    """
-    Dispatch a notification for a booking lifecycle event.
-
-    Args:
-        booking_request: A BookingRequest instance.
-        event: One of the constants from notifications.events.
-    """
+def _render_notification(booking_request, event):
+    """Return `(recipient, subject, message)` for a booking event."""
     subject = EVENT_SUBJECTS.get(event, event)
     recipient = booking_request.user.email
     facility = booking_request.facility.name
@@ -42,18 +36,56 @@ def send_booking_notification(booking_request, event: str) -> None:
         f"Status   : {booking_request.get_status_display()}\n"
         f"Recipient: {recipient or '(no email set)'}\n"
     )
+    return recipient, subject, message
+
+
+def send_booking_notification(booking_request, event: str) -> None:
+    """
+    Dispatch a notification for a booking lifecycle event.
+
+    Args:
+        booking_request: A BookingRequest instance.
+        event: One of the constants from notifications.events.
+    """
+    recipient, subject, message = _render_notification(booking_request, event)
 
     if getattr(settings, 'NOTIFICATIONS_ENABLED', False):
-        from django.core.mail import send_mail
         if recipient:
-            send_mail(
+            enqueue_notification(
+                event=event,
+                recipient=recipient,
                 subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient],
-                fail_silently=True,
+                body=message,
+                booking_request=booking_request,
             )
-        logger.info('NOTIFICATION SENT | %s', message)
+        logger.info('NOTIFICATION QUEUED | %s', message)
     else:
         # Development mode: just log, no actual emails.
         logger.debug('NOTIFICATION (disabled) | %s', message)
+
+
+def send_booking_notifications(booking_requests, event: str) -> None:
+    """
+    Dispatch the same event for several booking requests with one outbox INSERT.
+
+    The requests should come with `user` and `facility` already loaded.
+    """
+    if not getattr(settings, 'NOTIFICATIONS_ENABLED', False):
+        for booking_request in booking_requests:
+            logger.debug('NOTIFICATION (disabled) | %s', _render_notification(booking_request, event)[2])
+        return
+
+    entries = []
+    for booking_request in booking_requests:
+        recipient, subject, message = _render_notification(booking_request, event)
+        if recipient:
+            entries.append(NotificationOutbox(
+                event=event,
+                recipient=recipient,
+                subject=subject,
+                body=message,
+                booking_request=booking_request,
+            ))
+        logger.info('NOTIFICATION QUEUED | %s', message)
+    if entries:
+        enqueue_notifications(entries)
@@ -0,0 +1,230 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bookings.services import approve_booking_request, submit_booking_request
+from facilities.models import Facility
+
+from .delivery import build_deliveries, send_deliveries
+from .models import NotificationOutbox
+from .outbox import drain_outbox, retry_delay
+
+
+class FlakyBackend(BaseEmailBackend):
+    """Mail backend that fails for chosen recipients and counts connection opens."""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.opened = 0
+        self.calls = 0
+        self.sent = []
+
+    def open(self):
+        self.opened += 1
+        return True
+
+    def send_messages(self, email_messages):
+        self.calls += 1
+        for message in email_messages:
+            if self.failing & set(message.to):
+                raise ConnectionError('mailbox unavailable')
+            self.sent.append(message)
+        return len(email_messages)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.student = User.objects.create_user(username='student', password='test123', email='student@example.com')
+        self.facility = Facility.objects.create(
+            name='Seminar Hall',
+            facility_type='hall',
+            capacity=100,
+            open_time='08:00',
+            close_time='18:00',
+        )
+        self.facility.managers.add(self.manager)
+
+    def make_datetime(self, days_from_now, hour):
+        return timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=days_from_now), time(hour=hour)),
+            timezone.get_current_timezone(),
+        )
+
+    def submit(self, hour=9):
+        return submit_booking_request(
+            user=self.student,
+            facility=self.facility,
+            start_datetime=self.make_datetime(1, hour),
+            end_datetime=self.make_datetime(1, hour + 1),
+            purpose='Workshop',
+        )
+
+    def test_booking_changes_queue_mail_instead_of_sending_it(self):
+        booking = self.submit()
+        approve_booking_request(booking_request=booking, acting_user=self.manager)
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(
+            list(NotificationOutbox.objects.values_list('event', 'recipient', 'status')),
+            [
+                ('booking_created', 'student@example.com', NotificationOutbox.STATUS_PENDING),
+                ('booking_approved', 'student@example.com', NotificationOutbox.STATUS_PENDING),
+            ],
+        )
+
+        result = drain_outbox()
+
+        self.assertEqual(result.sent, 2)
+        self.assertEqual([message.subject for message in mail.outbox], [
+            'Booking Request Submitted — Pending Approval',
+            'Your Booking Request Has Been Approved',
+        ])
+        self.assertFalse(NotificationOutbox.objects.filter(status=NotificationOutbox.STATUS_PENDING).exists())
+
+    def test_drain_reuses_one_connection_across_batches(self):
+        for hour in (9, 11, 13):
+            self.submit(hour)
+        backend = FlakyBackend()
+
+        result = drain_outbox(batch_size=2, mail_connection=backend)
+
+        self.assertEqual(result.sent, 3)
+        self.assertEqual(backend.opened, 1)
+
+    def test_failures_back_off_and_give_up_after_max_attempts(self):
+        self.submit()
+        backend = FlakyBackend(failing={'student@example.com'})
+
+        with self.settings(NOTIFICATION_OUTBOX={'MAX_ATTEMPTS': 2}):
+            first = drain_outbox(mail_connection=backend)
+            entry = NotificationOutbox.objects.get()
+            self.assertEqual((first.retried, entry.attempts, entry.status), (1, 1, NotificationOutbox.STATUS_PENDING))
+            self.assertGreater(entry.next_attempt_at, timezone.now())
+            self.assertIn('mailbox unavailable', entry.last_error)
+
+            # Not due yet, so nothing is claimed.
+            self.assertEqual(drain_outbox(mail_connection=backend), (0, 0, 0))
+
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            second = drain_outbox(mail_connection=backend)
+
+        self.assertEqual(second.failed, 1)
+        self.assertEqual(NotificationOutbox.objects.get().status, NotificationOutbox.STATUS_FAILED)
+        self.assertEqual(retry_delay(1), timedelta(seconds=60))
+        self.assertEqual(retry_delay(3), timedelta(seconds=240))
+
+
+class DeliveryEngineTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(
+            name='Seminar Hall',
+            facility_type='hall',
+            capacity=100,
+            open_time='08:00',
+            close_time='18:00',
+        )
+        self.facility.managers.add(self.manager)
+        self.facility.max_pending_requests = 20
+        self.facility.save()
+        self.booking_date = timezone.localdate() + timedelta(days=1)
+
+    def make_datetime(self, hour):
+        return timezone.make_aware(
+            datetime.combine(self.booking_date, time(hour=hour)),
+            timezone.get_current_timezone(),
+        )
+
+    def submit_queue(self, users):
+        return [
+            submit_booking_request(
+                user=user,
+                facility=self.facility,
+                start_datetime=self.make_datetime(10),
+                end_datetime=self.make_datetime(11),
+                purpose='Queued request',
+            )
+            for user in users
+        ]
+
+    def make_requesters(self, count):
+        return [
+            User.objects.create_user(username=f'requester{index}', email=f'requester{index}@example.com')
+            for index in range(count)
+        ]
+
+    def test_auto_rejected_requesters_are_not_notified_by_default(self):
+        winner, *_ = self.submit_queue(self.make_requesters(3))
+
+        approve_booking_request(booking_request=winner, acting_user=self.manager)
+
+        self.assertEqual(
+            list(NotificationOutbox.objects.exclude(event='booking_created').values_list('event', 'booking_request')),
+            [('booking_approved', winner.pk)],
+        )
+
+    @override_settings(NOTIFY_AUTO_REJECTED_REQUESTS=True)
+    def test_batch_goes_out_in_one_send_messages_call(self):
+        winner, *_ = self.submit_queue(self.make_requesters(5))
+        approve_booking_request(booking_request=winner, acting_user=self.manager)
+        # Everyone heard about their submission; the four losers were auto-rejected in bulk.
+        self.assertEqual(NotificationOutbox.objects.filter(event='booking_rejected').count(), 4)
+        backend = FlakyBackend()
+
+        result = drain_outbox(mail_connection=backend)
+
+        self.assertEqual(result.sent, 10)
+        self.assertEqual((backend.opened, backend.calls), (1, 1))
+
+    def test_digest_collapses_events_per_recipient(self):
+        student = User.objects.create_user(username='student', email='student@example.com')
+        other = User.objects.create_user(username='other', email='other@example.com')
+        with self.settings(NOTIFICATION_OUTBOX={'DIGEST_WINDOW_SECONDS': 300}):
+            for hour in (9, 11, 13):
+                submit_booking_request(
+                    user=student,
+                    facility=self.facility,
+                    start_datetime=self.make_datetime(hour),
+                    end_datetime=self.make_datetime(hour + 1),
+                    purpose='Lab practice',
+                )
+            self.submit_queue([other])
+
+            # Held for the digest window.
+            self.assertEqual(drain_outbox(), (0, 0, 0))
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            result = drain_outbox(mail_connection=get_connection('django.core.mail.backends.locmem.EmailBackend'))
+
+        self.assertEqual(result.sent, 4)
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ['student@example.com'])
+        self.assertEqual(digest.subject, '3 updates to your booking requests')
+        self.assertEqual(digest.body.count('Booking Request Submitted'), 3)
+
+    def test_failed_batch_falls_back_to_per_message_sends(self):
+        good, bad = (
+            User.objects.create_user(username=name, email=f'{name}@example.com') for name in ('good', 'bad')
+        )
+        self.submit_queue([good])
+        submit_booking_request(
+            user=bad,
+            facility=self.facility,
+            start_datetime=self.make_datetime(12),
+            end_datetime=self.make_datetime(13),
+            purpose='Lab practice',
+        )
+        backend = FlakyBackend(failing={'bad@example.com'})
+        deliveries = build_deliveries(list(NotificationOutbox.objects.all()), backend)
+
+        sent, failed, connection_ok = send_deliveries(deliveries, backend)
+
+        self.assertTrue(connection_ok)
+        self.assertEqual([delivery.message.to for delivery in sent], [['good@example.com']])
+        self.assertEqual([delivery.message.to for delivery, _ in failed], [['bad@example.com']])
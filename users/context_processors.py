@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .permissions import get_permission_context
+
+
+def access(request):
+    """Expose the request user's permission context to templates as `access`."""
+    return {'access': SimpleLazyObject(lambda: get_permission_context(getattr(request, 'user', None)))}
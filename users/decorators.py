@@ -5,6 +5,8 @@ from functools import wraps
 from django.contrib import messages
 from django.shortcuts import redirect
 
+from .permissions import get_permission_context
+
 
 def sys_admin_required(view_func):
     """Allow only users with role='sys_admin' to access the view."""
@@ -13,11 +15,8 @@ def sys_admin_required(view_func):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('users:login')
-        try:
-            if request.user.profile.is_sys_admin():
-                return view_func(request, *args, **kwargs)
-        except Exception:
-            pass
+        if get_permission_context(request.user).is_sys_admin:
+            return view_func(request, *args, **kwargs)
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('core:home')
 
@@ -31,11 +30,8 @@ def facility_manager_required(view_func):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('users:login')
-        try:
-            if request.user.profile.is_facility_manager():
-                return view_func(request, *args, **kwargs)
-        except Exception:
-            pass
+        if get_permission_context(request.user).is_facility_manager:
+            return view_func(request, *args, **kwargs)
         messages.error(request, 'Only assigned facility managers can access this page.')
         return redirect('core:home')
 
@@ -49,11 +45,8 @@ def user_required(view_func):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('users:login')
-        try:
-            if request.user.profile.is_user():
-                return view_func(request, *args, **kwargs)
-        except Exception:
-            pass
+        if get_permission_context(request.user).is_user:
+            return view_func(request, *args, **kwargs)
         messages.error(request, 'This page is for regular users only.')
         return redirect('core:home')
 
@@ -89,6 +89,16 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Keep the profile in sync when the User is saved."""
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Save a profile that was edited through `user.profile` along with the User.
+
+    Partial saves such as the `last_login` update made on every login never
+    carry profile changes, and a profile that was never loaded has nothing to
+    save, so neither costs a query.
+    """
+    if created or update_fields is not None:
+        return
+    if not User.profile.is_cached(instance):
+        return
     instance.profile.save()
@@ -0,0 +1,94 @@
+"""
+Request-scoped permission context.
+
+Role checks used to go through `user.profile` and `user.managed_facilities`,
+costing a query or two every time a template or decorator asked. The context
+resolves role, department and managed facility ids together in one query and
+is memoized on the user object, so a request pays for it at most once.
+
+The memo is for read paths (templates, decorators, listings) and lives as long
+as the user instance. Services that change data authorize with
+`load_permission_context`, which always reads the current rights.
+"""
+
+from collections import namedtuple
+
+from .models import UserProfile
+
+ROLE_USER = 'user'
+ROLE_DEPT_ADMIN = 'dept_admin'
+ROLE_SYS_ADMIN = 'sys_admin'
+
+_ROLE_DISPLAY = dict(UserProfile.ROLE_CHOICES)
+
+
+class PermissionContext(namedtuple('PermissionContext', ['user_id', 'role', 'department_id', 'managed_facility_ids'])):
+    """What the current user may do, mirroring the `UserProfile` role helpers."""
+
+    __slots__ = ()
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def role_display(self):
+        return _ROLE_DISPLAY.get(self.role, '')
+
+    @property
+    def is_user(self):
+        return self.role == ROLE_USER
+
+    @property
+    def is_sys_admin(self):
+        return self.role == ROLE_SYS_ADMIN
+
+    @property
+    def is_dept_admin(self):
+        return self.role == ROLE_DEPT_ADMIN
+
+    @property
+    def is_facility_manager(self):
+        return self.is_sys_admin or self.is_dept_admin or bool(self.managed_facility_ids)
+
+    @property
+    def can_view_analytics(self):
+        return self.is_facility_manager
+
+    def manages(self, facility):
+        """Mirror `Facility.is_managed_by` without touching the database."""
+        if self.is_sys_admin:
+            return True
+        if self.is_dept_admin and facility.department_id == self.department_id:
+            return True
+        return facility.pk in self.managed_facility_ids
+
+
+ANONYMOUS_CONTEXT = PermissionContext(None, None, None, frozenset())
+
+
+def load_permission_context(user):
+    """Return a fresh, unmemoized permission context for `user`."""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_CONTEXT
+    rows = list(
+        UserProfile.objects
+        .filter(user_id=user.pk)
+        .values_list('role', 'department_id', 'user__managed_facilities')
+    )
+    if not rows:
+        return PermissionContext(user.pk, None, None, frozenset())
+    role, department_id, _ = rows[0]
+    managed_ids = frozenset(facility_id for *_, facility_id in rows if facility_id is not None)
+    return PermissionContext(user.pk, role, department_id, managed_ids)
+
+
+def get_permission_context(user):
+    """Return the memoized permission context for `user` (anonymous users included)."""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_CONTEXT
+    context = getattr(user, '_permission_context', None)
+    if context is None:
+        context = load_permission_context(user)
+        user._permission_context = context
+    return context
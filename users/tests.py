@@ -1,2 +1,90 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from facilities.models import Facility
+
+from .models import save_user_profile
+from .permissions import get_permission_context
+
+
+class PermissionContextTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='test123')
+        self.facility = Facility.objects.create(name='Seminar Hall', facility_type='hall', capacity=100)
+        self.facility.managers.add(self.manager)
+
+    def test_context_resolves_role_and_managed_facilities_in_one_query(self):
+        manager = User.objects.get(pk=self.manager.pk)
+
+        with self.assertNumQueries(1):
+            access = get_permission_context(manager)
+            self.assertTrue(access.is_facility_manager)
+            self.assertTrue(access.can_view_analytics)
+            self.assertEqual(access.managed_facility_ids, {self.facility.pk})
+            self.assertIs(get_permission_context(manager), access)
+
+    def test_pages_pay_for_at_most_one_permission_query(self):
+        self.client.force_login(self.manager)
+
+        for url in (reverse('core:home'), reverse('bookings:admin_dashboard')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            permission_queries = [
+                query for query in queries.captured_queries
+                # The dashboard joins requester profiles into its listing; only lookups from these tables count.
+                if 'FROM "users_userprofile"' in query['sql'] or 'FROM "facilities_facility_managers"' in query['sql']
+            ]
+            self.assertEqual(len(permission_queries), 1, url)
+
+
+class ProfileSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='test123')
+
+    def login_statements(self):
+        self.client.logout()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('users:login'), {'username': 'student', 'password': 'test123'})
+        self.assertEqual(response.status_code, 302)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_login_does_not_touch_the_profile(self):
+        statements = self.login_statements()
+
+        writes = [sql for sql in statements if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        # Session insert, last_login update and session update.
+        self.assertEqual(len(writes), 3)
+        self.assertFalse(any('users_userprofile' in sql for sql in statements))
+
+    def test_login_costs_a_profile_select_and_update_less_than_before(self):
+        def old_save_user_profile(sender, instance, **kwargs):
+            instance.profile.save()
+
+        post_save.disconnect(save_user_profile, sender=User)
+        post_save.connect(old_save_user_profile, sender=User)
+        try:
+            before = self.login_statements()
+        finally:
+            post_save.disconnect(old_save_user_profile, sender=User)
+            post_save.connect(save_user_profile, sender=User)
+        after = self.login_statements()
+
+        def profile_queries(statements):
+            return [sql.split()[0] for sql in statements if 'users_userprofile' in sql]
+
+        self.assertEqual(profile_queries(before), ['SELECT', 'UPDATE'])
+        self.assertEqual(profile_queries(after), [])
+        self.assertEqual(len(before) - len(after), 2)
+
+    def test_profile_edited_through_user_is_saved_with_it(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile.role = 'dept_admin'
+        user.first_name = 'Asha'
+        user.save()
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile.role, 'dept_admin')